@@ -0,0 +1 @@
+"""pytestの設定（リポジトリのルートをインポートパスに含め、toolsパッケージをインポートできるようにする）"""
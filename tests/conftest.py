@@ -0,0 +1,38 @@
+"""テスト共通のフィクスチャ（ランダムウォークの株価データの作成）"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+
+def _random_walk_closes(length: int, seed: int = 0) -> np.ndarray:
+    """1000円から日次の対数収益率（標準偏差2%）で動くランダムウォークの終値"""
+    return 1000 * np.exp(np.cumsum(np.random.default_rng(seed).normal(0, 0.02, length)))
+
+
+def _price_history_from_closes(close: np.ndarray, seed: int = 0) -> pd.DataFrame:
+    """終値から株価データを作成（始値は終値と同じ、高値・安値は終値の±1%、出来高は乱数）"""
+    volume = np.random.default_rng(seed).integers(10_000, 100_000, len(close)).astype(float)
+    return pd.DataFrame({
+        'price_date': pd.date_range('2000-01-01', periods=len(close)),
+        'open_price': close, 'close_price': close, 'high_price': close * 1.01, 'low_price': close * 0.99,
+        'volume': volume
+    })
+
+
+@pytest.fixture
+def random_walk_closes():
+    """ランダムウォークの終値を作成する関数（length, seed）"""
+    return _random_walk_closes
+
+
+@pytest.fixture
+def price_history_from_closes():
+    """終値から株価データを作成する関数（close, seed）"""
+    return _price_history_from_closes
+
+
+@pytest.fixture
+def random_walk_prices():
+    """ランダムウォークの株価データを作成する関数（length, seed）"""
+    return lambda length, seed=0: _price_history_from_closes(_random_walk_closes(length, seed), seed)
@@ -0,0 +1,109 @@
+"""分析結果のDB保存（トランザクション）のテスト"""
+
+import asyncio
+
+import numpy as np
+import pytest
+from sqlalchemy import text
+
+from tools import batch_save_analysis_data
+from tools.batch_save_analysis_data import BatchDataSaver
+from tools.report_generator.analyzer import AnalysisResult, StockAnalyzer
+from tools.report_generator.database_manager import AnalysisDataManager
+
+
+def _count(manager: AnalysisDataManager, table: str) -> int:
+    with manager.engine.connect() as conn:
+        return conn.execute(text(f"SELECT COUNT(*) FROM {table}")).scalar()
+
+
+@pytest.fixture
+def manager(tmp_path):
+    return AnalysisDataManager(f"sqlite:///{tmp_path / 'analysis.db'}")
+
+
+@pytest.fixture
+def stock_data(random_walk_prices):
+    """銘柄コードを乱数のシードにした300日分の銘柄データを作成する関数"""
+    return lambda stock_code: {'stock_code': stock_code, 'basic_info': {},
+                               'price_history': random_walk_prices(300, int(stock_code))}
+
+
+@pytest.fixture
+def analysis_result(manager, stock_data):
+    return StockAnalyzer(manager).analyze_stock_by_style(stock_data('1'), 'long_term', save_to_database=False)
+
+
+def test_save_commits_indicators_and_decision(manager, analysis_result):
+    assert StockAnalyzer(manager)._save_analysis_to_database(analysis_result)
+    assert _count(manager, 'technical_indicators') == 1
+    assert _count(manager, 'investment_decisions') == 1
+
+
+def test_failed_decision_rolls_back_indicators(manager, analysis_result, monkeypatch):
+    monkeypatch.setattr(manager, 'save_investment_decision', lambda *args, **kwargs: False)
+    assert not StockAnalyzer(manager)._save_analysis_to_database(analysis_result)
+    assert _count(manager, 'technical_indicators') == 0
+    assert _count(manager, 'investment_decisions') == 0
+
+
+def test_failure_inside_caller_transaction_keeps_other_rows(manager, analysis_result, monkeypatch):
+    analyzer = StockAnalyzer(manager)
+    failing = dict(analysis_result, stock_code='2')
+    original = manager.save_investment_decision
+    monkeypatch.setattr(
+        manager, 'save_investment_decision',
+        lambda stock_code, *args, **kwargs: stock_code != '2' and original(stock_code, *args, **kwargs)
+    )
+    with manager.transaction() as conn:
+        assert analyzer._save_analysis_to_database(analysis_result, conn)
+        assert not analyzer._save_analysis_to_database(failing, conn)
+    assert _count(manager, 'technical_indicators') == 1
+    assert _count(manager, 'investment_decisions') == 1
+
+
+def test_indicator_rows_match_between_batch_and_single_analysis(manager, stock_data):
+    stocks = {code: stock_data(code) for code in ('1', '2', '3')}
+    analyzer = StockAnalyzer(manager)
+    batch_results = analyzer.analyze_batch(stocks, 'long_term')
+    for stock_code, data in stocks.items():
+        single = analyzer.analyze_stock_by_style(data, 'long_term', save_to_database=False)
+        batch_row = manager.build_technical_indicator_row(stock_code, batch_results[stock_code].indicators, 'long_term')
+        single_row = manager.build_technical_indicator_row(stock_code, single['indicators'], 'long_term')
+        batch_row.pop('created_at'), single_row.pop('created_at')
+        assert batch_row == single_row
+
+
+def test_indicator_row_rounds_to_column_scale(manager):
+    row = manager.build_technical_indicator_row('1', {'rsi_14': np.float32(55.123456), 'volume_ratio': 1.23456789,
+                                                      'sma_5': np.float64(1234.5678)}, 'long_term')
+    assert (row['rsi_14'], row['volume_ratio'], row['sma_5']) == (55.12, 1.2346, 1234.57)
+
+
+def test_write_stage_commits_each_batch_and_fails_only_the_failed_one(tmp_path, analysis_result, monkeypatch):
+    monkeypatch.setattr(batch_save_analysis_data, 'WRITE_BATCH_SIZE', 1)
+    saver = BatchDataSaver(f"sqlite:///{tmp_path / 'batch.db'}")
+    manager = saver.data_manager
+    original = manager.bulk_save_investment_decisions
+    monkeypatch.setattr(
+        manager, 'bulk_save_investment_decisions',
+        lambda rows, **kwargs: rows[0]['stock_code'] != '2' and original(rows, **kwargs)
+    )
+    result = AnalysisResult.from_dict(analysis_result)
+
+    async def run():
+        write_q = asyncio.Queue()
+        for stock_code in ('1', '2', '3'):
+            rows = (manager.build_technical_indicator_row(stock_code, result.indicators, 'long_term'),
+                    manager.build_investment_decision_row(stock_code, result.to_decision_data(), 'long_term'))
+            write_q.put_nowait(([rows], []))
+        write_q.put_nowait(None)
+        failed_set = set()
+        return await saver._write_stage(write_q, failed_set), failed_set
+
+    saved, failed_set = asyncio.run(run())
+    assert not saved
+    assert failed_set == {'2'}
+    # 失敗したバッチだけがロールバックされ、前後のバッチはコミットされている
+    assert _count(manager, 'technical_indicators') == 2
+    assert _count(manager, 'investment_decisions') == 2
@@ -0,0 +1,173 @@
+"""indicator_kernelsの各関数が、置き換え前のpandasの式と同じ値を返すことのテスト"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from tools.report_generator import indicator_kernels as kernels
+from tools.report_generator.indicator_kernels import (ANNUALIZATION_FACTOR, ewm_mean, latest_ewm_mean,
+                                                      latest_macd_values, latest_price_changes, latest_smas,
+                                                      latest_volatilities, macd, rolling_mean, rolling_mean_std,
+                                                      stochastic)
+
+
+@pytest.fixture
+def closes(random_walk_closes):
+    """欠損値・値動きのない区間を含む終値"""
+    values = random_walk_closes(300)
+    values[100:130] = values[99]
+    values[[10, 200, 201]] = np.nan
+    return pd.Series(values, index=pd.RangeIndex(5, 305), name='close_price')
+
+
+@pytest.fixture
+def complete_closes(closes):
+    return closes.ffill().bfill().to_numpy()
+
+
+@pytest.fixture
+def high_low(closes):
+    rng = np.random.default_rng(1)
+    high = closes * (1 + rng.uniform(0, 0.02, len(closes)))
+    low = closes * (1 - rng.uniform(0, 0.02, len(closes)))
+    return high.rename('high_price'), low.rename('low_price')
+
+
+@pytest.fixture(params=['kernel', 'fallback'])
+def without_numba(request, monkeypatch):
+    """Numba・bottleneckを使う経路と、利用できない場合の経路の両方で実行"""
+    if request.param == 'fallback':
+        for name in ('ema_series', 'macd_series', 'rolling_mean_std_arrays', 'NUMBA_AVAILABLE', 'bn'):
+            monkeypatch.setattr(kernels, name, None)
+    return request.param
+
+
+def assert_series_equal(actual, expected, rtol=1e-10, atol=1e-9):
+    assert actual.index.equals(expected.index)
+    np.testing.assert_allclose(actual.to_numpy(dtype=float), expected.to_numpy(dtype=float),
+                               rtol=rtol, atol=atol, equal_nan=True)
+
+
+# pandasのrolling().std()は累積和の桁落ちで、値動きのない区間でも0にならない（株価1000円に対して1e-5程度）
+PANDAS_STD_ATOL = 1e-4
+
+
+# EMA・MACD
+
+def test_ewm_mean_matches_pandas(closes, without_numba):
+    for span in (9, 12, 26):
+        assert_series_equal(ewm_mean(closes, span), closes.ewm(span=span).mean())
+
+
+def test_macd_matches_pandas_ewm(closes, without_numba):
+    ema_12 = closes.ewm(span=12).mean()
+    ema_26 = closes.ewm(span=26).mean()
+    macd_line = ema_12 - ema_26
+    macd_signal = macd_line.ewm(span=9).mean()
+    expected = (macd_line, macd_signal, macd_line - macd_signal)
+    for actual, expected_series in zip(macd(closes, 12, 26, 9), expected):
+        assert_series_equal(actual, expected_series)
+
+
+def test_macd_of_dataframe_matches_columnwise(closes, complete_closes, without_numba):
+    frame = pd.DataFrame({'a': closes, 'b': complete_closes[::-1]}, index=closes.index)
+    for column in frame:
+        for actual, expected in zip(macd(frame), macd(frame[column])):
+            assert_series_equal(actual[column], expected.rename(column))
+
+
+def test_latest_macd_and_ewm_match_pandas(complete_closes, without_numba):
+    series = pd.Series(complete_closes)
+    macd_line = series.ewm(span=12).mean() - series.ewm(span=26).mean()
+    macd_signal = macd_line.ewm(span=9).mean()
+    np.testing.assert_allclose(latest_macd_values(complete_closes),
+                               (macd_line.iloc[-1], macd_signal.iloc[-1], macd_line.iloc[-1] - macd_signal.iloc[-1]),
+                               rtol=1e-10)
+    assert latest_ewm_mean(complete_closes, 50) == pytest.approx(series.ewm(span=50).mean().iloc[-1], rel=1e-10)
+
+
+# ボリンジャーバンドの移動平均・移動標準偏差
+
+def test_rolling_mean_std_matches_pandas(closes, without_numba):
+    for window in (5, 20):
+        means, stds = rolling_mean_std(closes, window)
+        assert_series_equal(means, closes.rolling(window=window).mean())
+        assert_series_equal(stds, closes.rolling(window=window).std(), rtol=1e-7, atol=PANDAS_STD_ATOL)
+    # 値動きのない区間の標準偏差は0
+    np.testing.assert_allclose(rolling_mean_std(closes, 20)[1].loc[123:134], 0.0, atol=1e-9)
+
+
+def test_rolling_mean_std_of_dataframe_matches_pandas(closes, complete_closes, without_numba):
+    frame = pd.DataFrame({'a': closes, 'b': complete_closes[::-1]}, index=closes.index)
+    means, stds = rolling_mean_std(frame, 20)
+    for column in frame:
+        assert_series_equal(means[column], frame[column].rolling(20).mean())
+        assert_series_equal(stds[column], frame[column].rolling(20).std(), rtol=1e-7, atol=PANDAS_STD_ATOL)
+
+
+def test_rolling_mean_matches_pandas(closes):
+    for window in (5, 20, 400):
+        assert_series_equal(rolling_mean(closes, window), closes.rolling(window=window).mean())
+    frame = closes.to_frame()
+    assert_series_equal(rolling_mean(frame, 20)['close_price'], closes.rolling(20).mean())
+    assert_series_equal(rolling_mean(closes.astype(np.float32), 20), closes.rolling(20).mean(), rtol=1e-5)
+
+
+# ストキャスティクス
+
+def _pandas_stochastic(high, low, close, k_period=14, d_period=3):
+    lowest_low = low.rolling(window=k_period).min()
+    highest_high = high.rolling(window=k_period).max()
+    stoch_k = 100 * ((close - lowest_low) / (highest_high - lowest_low))
+    return stoch_k, stoch_k.rolling(window=d_period).mean()
+
+
+def test_stochastic_matches_pandas(closes, high_low, without_numba):
+    high, low = high_low
+    for actual, expected in zip(stochastic(high, low, closes), _pandas_stochastic(high, low, closes)):
+        assert_series_equal(actual, expected)
+
+
+def test_stochastic_short_and_float32_series_match_pandas(closes, high_low):
+    high, low = high_low
+    short = slice(0, 10)
+    for actual, expected in zip(stochastic(high.iloc[short], low.iloc[short], closes.iloc[short]),
+                                _pandas_stochastic(high.iloc[short], low.iloc[short], closes.iloc[short])):
+        assert_series_equal(actual, expected)
+    as_float32 = [series.astype(np.float32) for series in (high, low, closes)]
+    for actual, expected in zip(stochastic(*as_float32), _pandas_stochastic(high, low, closes)):
+        # float32の精度（0〜100の指標に対して1e-3程度）
+        assert_series_equal(actual, expected, rtol=1e-4, atol=1e-3)
+
+
+def test_stochastic_with_unaligned_labels_matches_pandas(closes, high_low):
+    high, low = high_low
+    shifted_low = low.set_axis(low.index + 1)
+    for actual, expected in zip(stochastic(high, shifted_low, closes), _pandas_stochastic(high, shifted_low, closes)):
+        assert_series_equal(actual, expected)
+
+
+# 価格変動率
+
+def test_latest_price_changes_match_shifted_series(complete_closes):
+    series = pd.Series(complete_closes)
+    periods = (1, 5, 20, 299, 300)
+    expected = [((series / series.shift(period)) - 1).iloc[-1] * 100 for period in periods]
+    np.testing.assert_allclose(latest_price_changes(complete_closes, periods), expected, rtol=1e-12, equal_nan=True)
+
+
+# 複数期間の単純移動平均
+
+def test_latest_smas_match_tail_means(complete_closes):
+    periods = (5, 10, 20, 50, 300, 301)
+    expected = [complete_closes[-period:].mean() if period <= len(complete_closes) else np.nan for period in periods]
+    np.testing.assert_allclose(latest_smas(complete_closes, periods), expected, rtol=1e-12, equal_nan=True)
+
+
+# 複数期間のボラティリティ
+
+def test_latest_volatilities_match_pandas_rolling_std(complete_closes):
+    series = pd.Series(complete_closes)
+    periods = (20, 50, 100, 200, 299, 300)
+    expected = [series.pct_change().rolling(period).std().iloc[-1] * ANNUALIZATION_FACTOR for period in periods]
+    np.testing.assert_allclose(latest_volatilities(complete_closes, periods), expected, rtol=1e-9, equal_nan=True)
@@ -0,0 +1,64 @@
+"""テクニカル指標の最新値の3つの実装（銘柄単位・Numbaの行列版・2次元DataFrame版）が一致することのテスト"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from tools.report_generator.analyzer import FLOAT32_INDICATORS, StockAnalyzer
+from tools.report_generator.indicator_kernels import (LATEST_INDICATOR_NAMES, latest_indicators_matrix,
+                                                      latest_wilder_rsi)
+
+
+@pytest.fixture
+def price_histories(random_walk_prices, price_history_from_closes):
+    histories = {}
+    # 各指標の期間の前後の長さ（移動平均50日・ボラティリティ21本・MACD26日など）
+    for length in (20, 21, 26, 34, 49, 50, 51, 300):
+        histories[f'random_{length}'] = random_walk_prices(length, length)
+    histories['all_gains'] = price_history_from_closes(np.linspace(1000.0, 1300.0, 60), 1)
+    flat = price_history_from_closes(np.full(60, 1000.0), 2)
+    flat['high_price'] = flat['low_price'] = 1000.0
+    histories['flat'] = flat
+    return histories
+
+
+def _single_latest(price_histories) -> pd.DataFrame:
+    analyzer = StockAnalyzer()
+    rows = {code: analyzer.calculate_technical_indicators(history) for code, history in price_histories.items()}
+    return pd.DataFrame.from_dict(rows, orient='index')[list(LATEST_INDICATOR_NAMES)]
+
+
+def _assert_same_latest(actual: pd.DataFrame, expected: pd.DataFrame, rtol: float = 1e-9):
+    for name in LATEST_INDICATOR_NAMES:
+        tolerance = 1e-6 if name in FLOAT32_INDICATORS else rtol
+        np.testing.assert_allclose(actual.loc[expected.index, name].to_numpy(dtype=float),
+                                   expected[name].to_numpy(dtype=float),
+                                   rtol=tolerance, atol=1e-9, equal_nan=True, err_msg=name)
+
+
+def test_wide_dataframe_matches_single_stock(price_histories):
+    _assert_same_latest(StockAnalyzer()._calculate_latest_indicators_wide(price_histories),
+                        _single_latest(price_histories))
+
+
+@pytest.mark.skipif(latest_indicators_matrix is None, reason='Numbaが利用できない')
+def test_matrix_kernel_matches_single_stock(price_histories):
+    _assert_same_latest(StockAnalyzer()._calculate_latest_indicators_batch(price_histories),
+                        _single_latest(price_histories))
+
+
+def test_batch_without_numba_matches_single_stock(price_histories, monkeypatch):
+    monkeypatch.setattr('tools.report_generator.analyzer.latest_indicators_matrix', None)
+    _assert_same_latest(StockAnalyzer()._calculate_latest_indicators_batch(price_histories),
+                        _single_latest(price_histories))
+
+
+@pytest.mark.skipif(latest_indicators_matrix is None, reason='Numbaが利用できない')
+@pytest.mark.parametrize('length', [14, 15, 16])
+def test_rsi_period_boundary_matches_between_kernel_and_single_stock(length):
+    close = 1000 + np.cumsum(np.random.default_rng(length).normal(0, 5, length))
+    out = latest_indicators_matrix(close[None, :], close[None, :] + 1, close[None, :] - 1,
+                                   np.ones((1, length)), np.array([length]))
+    rsi = out[0, LATEST_INDICATOR_NAMES.index('rsi_14')]
+    np.testing.assert_allclose(rsi, latest_wilder_rsi(close, 14), equal_nan=True)
+    assert np.isnan(rsi) == (length <= 14)
@@ -0,0 +1,36 @@
+"""ロギング設定（ワーカープロセスからのログ転送）のテスト"""
+
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from tools.report_generator.logging_setup import (init_worker_logging, setup_queue_logging,
+                                                  start_worker_log_listener)
+
+
+def _log_in_worker(message: str) -> bool:
+    logging.getLogger('worker_logging_test').info(message)
+    # ワーカーではファイル出力を設定しない
+    return setup_queue_logging('worker.log') is None
+
+
+def test_worker_logs_are_forwarded_to_parent_loggers(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    records = []
+    handler = logging.Handler()
+    handler.emit = records.append
+    logger = logging.getLogger('worker_logging_test')
+    logger.addHandler(handler)
+
+    context = multiprocessing.get_context('spawn')
+    listener = start_worker_log_listener(context)
+    try:
+        with ProcessPoolExecutor(max_workers=1, mp_context=context, initializer=init_worker_logging,
+                                 initargs=(listener.queue,)) as executor:
+            assert executor.submit(_log_in_worker, 'ワーカーからのログ').result()
+    finally:
+        listener.stop()
+        logger.removeHandler(handler)
+
+    assert [record.getMessage() for record in records] == ['ワーカーからのログ']
+    assert not (tmp_path / 'worker.log').exists()
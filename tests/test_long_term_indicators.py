@@ -0,0 +1,21 @@
+"""長期分析のテクニカル指標（LongTermStockAnalyzer.calculate_long_term_indicators）のテスト"""
+
+import numpy as np
+
+from tools.report_generator.long_term_analyzer import LongTermStockAnalyzer
+
+
+def test_bar_with_missing_column_is_dropped_from_all_columns(random_walk_prices):
+    prices = random_walk_prices(400)
+    with_gaps = prices.copy()
+    with_gaps.loc[[50, 300], 'volume'] = np.nan
+    with_gaps.loc[390, 'high_price'] = np.nan
+
+    actual = LongTermStockAnalyzer().calculate_long_term_indicators(with_gaps)
+    expected = LongTermStockAnalyzer().calculate_long_term_indicators(
+        prices.drop(index=[50, 300, 390]).reset_index(drop=True)
+    )
+    assert actual.keys() == expected.keys()
+    for name, value in expected.items():
+        if isinstance(value, float):
+            np.testing.assert_allclose(actual[name], value, rtol=1e-12, equal_nan=True, err_msg=name)
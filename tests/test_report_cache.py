@@ -0,0 +1,77 @@
+"""レポート分析結果キャッシュのテスト"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from tools.report_generator.analyzer import compute_data_fingerprint
+from tools.report_generator.report_cache import SUMMARY_PRICE_ROWS, ReportCache
+
+
+@pytest.fixture
+def price_history():
+    close = np.linspace(1000.0, 1100.0, 30)
+    return pd.DataFrame({
+        'price_date': pd.date_range('2024-01-01', periods=30),
+        'open_price': close, 'high_price': close + 5, 'low_price': close - 5,
+        'close_price': close, 'volume': np.full(30, 1e4)
+    })
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ReportCache(str(tmp_path / 'cache'))
+
+
+def test_load_returns_saved_data_for_same_prices(cache, price_history):
+    assert cache.save('1301', 'short_term', price_history, {'signals': {'overall_signal': '買い推奨'}})
+    assert cache.load('1301', 'short_term', price_history.copy()) == {'signals': {'overall_signal': '買い推奨'}}
+
+
+def test_load_misses_when_not_saved(cache, price_history):
+    assert cache.load('1301', 'short_term', price_history) is None
+
+
+def test_load_misses_when_new_bar_is_added(cache, price_history):
+    cache.save('1301', 'short_term', price_history, {'signals': {}})
+    next_bar = price_history.iloc[[-1]].assign(price_date=price_history['price_date'].iloc[-1] + pd.Timedelta(days=1))
+    assert cache.load('1301', 'short_term', pd.concat([price_history, next_bar], ignore_index=True)) is None
+
+
+def test_load_misses_when_earlier_bar_is_corrected(cache, price_history):
+    cache.save('1301', 'short_term', price_history, {'signals': {}})
+    adjusted = price_history.copy()
+    adjusted.loc[5, 'close_price'] *= 0.5  # 株式分割の調整など、最新行以外の修正
+    assert cache.load('1301', 'short_term', adjusted) is None
+
+
+def test_price_key_matches_analysis_cache_fingerprint(price_history):
+    assert ReportCache.price_key(price_history) == compute_data_fingerprint(price_history)
+
+
+def test_load_analysis_hit_and_version_miss(cache, price_history):
+    result = {'stock_code': '1301', 'indicators': {'rsi_14': np.float64(np.nan)}}
+    assert cache.save_analysis('1301', 'short_term_analysis', price_history, '1', result)
+    loaded = cache.load_analysis('1301', 'short_term_analysis', price_history, '1')
+    assert loaded['stock_code'] == '1301' and np.isnan(loaded['indicators']['rsi_14'])
+    assert cache.load_analysis('1301', 'short_term_analysis', price_history, '2') is None
+
+
+def test_long_term_entry_saved_from_report_window_hits_from_index_window(cache):
+    # 長期レポートは5年分（1260件）、一覧ページは直近SUMMARY_PRICE_ROWS件の株価データを読み込む
+    close = np.linspace(1000.0, 1500.0, 1260)
+    report_history = pd.DataFrame({
+        'price_date': pd.date_range('2020-01-01', periods=1260),
+        'open_price': close, 'high_price': close + 5, 'low_price': close - 5,
+        'close_price': close, 'volume': np.full(1260, 1e4)
+    })
+    index_history = report_history.iloc[-SUMMARY_PRICE_ROWS:].reset_index(drop=True)
+    cache.save('1301', 'long_term', report_history, {'signals': {'overall_signal': '買い推奨'}},
+               key_rows=SUMMARY_PRICE_ROWS)
+    assert cache.load('1301', 'long_term', index_history, key_rows=SUMMARY_PRICE_ROWS) == {
+        'signals': {'overall_signal': '買い推奨'}
+    }
+    # 一覧ページの範囲内の足が変わった場合は再分析させる
+    corrected = index_history.copy()
+    corrected.loc[10, 'close_price'] *= 0.5
+    assert cache.load('1301', 'long_term', corrected, key_rows=SUMMARY_PRICE_ROWS) is None
@@ -0,0 +1,90 @@
+"""銘柄ごとの逐次計算（calculate_technical_indicatorsのstock_code指定）のテスト"""
+
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from tools.report_generator import analyzer as analyzer_module
+from tools.report_generator.analyzer import STREAMING_TAIL_LENGTH, StockAnalyzer
+
+
+@pytest.fixture
+def price_history(random_walk_prices):
+    prices = random_walk_prices(300, 1)
+    prices.loc[100, 'volume'] = np.nan
+    prices.loc[290, 'high_price'] = np.nan
+    return prices
+
+
+def assert_same_indicators(actual, expected):
+    assert actual.keys() == expected.keys()
+    for name, value in expected.items():
+        np.testing.assert_allclose(actual[name], value, rtol=1e-9, equal_nan=True, err_msg=name)
+
+
+def test_incremental_bars_match_full_recalculation(price_history):
+    analyzer = StockAnalyzer()
+    analyzer.calculate_technical_indicators(price_history.iloc[:250], '1301')
+    for end in range(251, len(price_history) + 1):
+        assert_same_indicators(analyzer.calculate_technical_indicators(price_history.iloc[:end], '1301'),
+                               StockAnalyzer().calculate_technical_indicators(price_history.iloc[:end]))
+
+
+def test_corrected_recent_bar_rebuilds_state(price_history):
+    analyzer = StockAnalyzer()
+    analyzer.calculate_technical_indicators(price_history.iloc[:280], '1301')
+    corrected = price_history.copy()
+    corrected.loc[280 - STREAMING_TAIL_LENGTH, 'close_price'] *= 1.5
+    assert_same_indicators(analyzer.calculate_technical_indicators(corrected, '1301'),
+                           StockAnalyzer().calculate_technical_indicators(corrected))
+
+
+def test_shifted_window_rebuilds_state(price_history):
+    analyzer = StockAnalyzer()
+    analyzer.calculate_technical_indicators(price_history.iloc[:280], '1301')
+    assert_same_indicators(analyzer.calculate_technical_indicators(price_history.iloc[30:], '1301'),
+                           StockAnalyzer().calculate_technical_indicators(price_history.iloc[30:]))
+
+
+def test_dropped_bars_rebuild_state(price_history):
+    analyzer = StockAnalyzer()
+    analyzer.calculate_technical_indicators(price_history.iloc[:280], '1301')
+    thinned = price_history.drop(index=[10, 11]).reset_index(drop=True)
+    assert_same_indicators(analyzer.calculate_technical_indicators(thinned, '1301'),
+                           StockAnalyzer().calculate_technical_indicators(thinned))
+
+
+def _seconds_per_bar(prices: pd.DataFrame, length: int) -> float:
+    """length本の履歴から株価データの末尾まで足を1本ずつ追加したときの1本あたりの計算時間（5回の最小値）"""
+    new_bars = len(prices) - length
+    timings = []
+    for _ in range(5):
+        analyzer = StockAnalyzer()
+        analyzer.calculate_technical_indicators(prices.iloc[:length], '1301')
+        start = time.perf_counter()
+        for end in range(length + 1, length + new_bars + 1):
+            analyzer.calculate_technical_indicators(prices.iloc[:end], '1301')
+        timings.append((time.perf_counter() - start) / new_bars)
+    return min(timings)
+
+
+def test_cost_per_bar_does_not_grow_with_history_length(random_walk_prices):
+    # 全期間の再計算は履歴の長さに比例するため、100倍の履歴では数倍以上かかる
+    prices = random_walk_prices(50_050, 2)
+    assert _seconds_per_bar(prices, 50_000) < 2 * _seconds_per_bar(prices.iloc[:550], 500)
+
+
+def test_state_count_is_bounded(price_history, monkeypatch):
+    monkeypatch.setattr(analyzer_module, 'STREAMING_STATE_LIMIT', 2)
+    analyzer = StockAnalyzer()
+    for stock_code in ('1301', '1332', '1333'):
+        analyzer.calculate_technical_indicators(price_history, stock_code)
+    assert list(analyzer._state) == ['1332', '1333']
+
+
+def test_analyze_stock_keeps_no_state(price_history):
+    analyzer = StockAnalyzer()
+    analyzer.analyze_stock({'stock_code': '1301', 'price_history': price_history, 'basic_info': {}})
+    assert not analyzer._state
@@ -0,0 +1,100 @@
+"""Wilderの平滑化によるRSIの各実装（Numbaのループ・NumPyのベクトル演算・pandasのewm）が一致することのテスト"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from tools.report_generator.indicator_kernels import (_latest_wilder_rsi_numpy, _wilder_rsi, _wilder_rsi_pandas,
+                                                      new_rsi_state, wilder_rsi_arrays)
+
+# Wilderの教科書的な例でよく使われる終値
+WILDER_EXAMPLE_CLOSES = np.array([
+    44.34, 44.09, 44.15, 43.61, 44.33, 44.83, 45.10, 45.42, 45.84, 46.08,
+    45.89, 46.03, 45.61, 46.28, 46.28, 46.00, 46.03, 46.41, 46.22, 45.64
+])
+
+
+def _reference_rsi(values: np.ndarray, period: int = 14) -> np.ndarray:
+    """TA-LibのRSIと同じ手順（最初のperiod個の差分の単純平均を初期値とし、以降は(平均 * (period - 1) + 値) / period）"""
+    result = np.full(len(values), np.nan)
+    deltas = np.diff(values)
+    avg_gain = sum(max(delta, 0.0) for delta in deltas[:period]) / period
+    avg_loss = sum(max(-delta, 0.0) for delta in deltas[:period]) / period
+    for i in range(period, len(values)):
+        if i > period:
+            delta = deltas[i - 1]
+            avg_gain = (avg_gain * (period - 1) + max(delta, 0.0)) / period
+            avg_loss = (avg_loss * (period - 1) + max(-delta, 0.0)) / period
+        result[i] = 100.0 * avg_gain / (avg_gain + avg_loss)
+    return result
+
+
+def _all_implementations(values: np.ndarray, period: int = 14):
+    return {
+        'numba': wilder_rsi_arrays(values, period, new_rsi_state()),
+        'python': _wilder_rsi(values, period, new_rsi_state()),
+        'pandas': _wilder_rsi_pandas(pd.Series(values), period).to_numpy(),
+    }
+
+
+@pytest.fixture
+def random_closes(random_walk_closes):
+    return random_walk_closes(300)
+
+
+def test_wilder_example_matches_reference():
+    expected = _reference_rsi(WILDER_EXAMPLE_CLOSES)
+    np.testing.assert_allclose(np.round(expected[14:], 2), [70.46, 66.25, 66.48, 69.35, 66.29, 57.92])
+    for name, rsi in _all_implementations(WILDER_EXAMPLE_CLOSES).items():
+        np.testing.assert_allclose(rsi, expected, rtol=1e-12, equal_nan=True, err_msg=name)
+    assert _latest_wilder_rsi_numpy(WILDER_EXAMPLE_CLOSES, 14) == pytest.approx(expected[-1], rel=1e-12)
+
+
+def test_implementations_agree_on_random_series(random_closes):
+    expected = _reference_rsi(random_closes)
+    for name, rsi in _all_implementations(random_closes).items():
+        np.testing.assert_allclose(rsi, expected, rtol=1e-9, equal_nan=True, err_msg=name)
+    assert _latest_wilder_rsi_numpy(random_closes, 14) == pytest.approx(expected[-1], rel=1e-9)
+
+
+def test_all_gains_series_is_100():
+    closes = np.linspace(100.0, 200.0, 40)
+    for name, rsi in _all_implementations(closes).items():
+        np.testing.assert_array_equal(rsi[14:], 100.0, err_msg=name)
+        assert np.isnan(rsi[:14]).all(), name
+    assert _latest_wilder_rsi_numpy(closes, 14) == 100.0
+
+
+def test_flat_series_is_nan():
+    closes = np.full(40, 100.0)
+    for name, rsi in _all_implementations(closes).items():
+        assert np.isnan(rsi).all(), name
+    assert np.isnan(_latest_wilder_rsi_numpy(closes, 14))
+
+
+def test_nan_gaps_are_skipped_consistently(random_closes):
+    closes = random_closes.copy()
+    closes[[5, 40, 41, 150]] = np.nan
+    results = _all_implementations(closes)
+    for name in ('python', 'pandas'):
+        np.testing.assert_allclose(results[name], results['numba'], rtol=1e-9, equal_nan=True, err_msg=name)
+    # 欠損値の前後の差分は除外し、除外した位置はNaN
+    assert np.isnan(results['numba'][[5, 6, 40, 41, 42, 150, 151]]).all()
+    # 欠損値を含まない差分だけを並べた系列と同じRSIになる
+    deltas = np.diff(closes)
+    gapless = np.concatenate([[0.0], np.cumsum(deltas[~np.isnan(deltas)])])
+    np.testing.assert_allclose(results['numba'][-1], _reference_rsi(gapless)[-1], rtol=1e-9)
+
+
+def test_incremental_state_matches_full_series(random_closes):
+    state = new_rsi_state()
+    head = wilder_rsi_arrays(random_closes[:100], 14, state)
+    tail = wilder_rsi_arrays(random_closes[100:], 14, state)
+    np.testing.assert_allclose(np.concatenate([head, tail]), _reference_rsi(random_closes),
+                               rtol=1e-9, equal_nan=True)
+
+
+def test_matches_talib_when_installed(random_closes):
+    talib = pytest.importorskip('talib')
+    np.testing.assert_allclose(wilder_rsi_arrays(random_closes, 14, new_rsi_state()),
+                               talib.RSI(random_closes, timeperiod=14), rtol=1e-9, equal_nan=True)
@@ -0,0 +1 @@
+"""株式投資支援ツール群"""
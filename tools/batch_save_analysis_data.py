@@ -7,46 +7,74 @@
 import sys
 import os
 import logging
-import json
-from datetime import datetime, date
-from typing import Dict, List
+import argparse
+import asyncio
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
 
-# モジュールのパスを追加
-current_dir = os.path.dirname(os.path.abspath(__file__))
-sys.path.append(current_dir)
+import numpy as np
+from sqlalchemy import Connection
 
-# 直接インポート
-from report_generator.data_fetcher import DataFetcher
-from report_generator.analyzer import StockAnalyzer
-from report_generator.database_manager import AnalysisDataManager
+from tools.report_generator.data_fetcher import DataFetcher
+from tools.report_generator.analyzer import StockAnalyzer, AnalysisResult, compute_data_fingerprint
+from tools.report_generator.database_manager import AnalysisDataManager, create_shared_engine
+from tools.report_generator.json_writer import write_json
+from tools.report_generator.logging_setup import init_worker_logging, setup_queue_logging, start_worker_log_listener
 
-# ロギング設定
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(sys.stdout),
-        logging.FileHandler('batch_save_analysis.log', encoding='utf-8')
-    ]
-)
+# ロギング設定（ファイル書き込みはバックグラウンドスレッドで実行）
+log_listener = setup_queue_logging('batch_save_analysis.log')
 logger = logging.getLogger(__name__)
 
+# 銘柄単位の同時処理数（DB接続数の上限を超えない範囲で設定）
+DEFAULT_CONCURRENCY = 10
+
+# プロセスプールで分析する最小銘柄数（これ未満ではプロセス起動・データ転送の方が高くつく）
+MIN_STOCKS_FOR_PROCESS_POOL = 1000
+
+# パイプラインで受け渡す銘柄チャンクの大きさとキューの上限
+PIPELINE_CHUNK_SIZE = 100
+PIPELINE_QUEUE_SIZE = 50
+
+# 書き込みステージで1回にINSERTする行数
+WRITE_BATCH_SIZE = 1000
+
 class BatchDataSaver:
     """分析データバッチ保存クラス"""
     
-    def __init__(self, database_url: str = None):
-        self.data_fetcher = DataFetcher()
-        self.analyzer = StockAnalyzer()
-        self.data_manager = AnalysisDataManager(database_url)
+    def __init__(self, database_url: str = None, max_workers: int = DEFAULT_CONCURRENCY,
+                 analysis_processes: int = None, use_cache: bool = True):
+        """
+        Args:
+            database_url: データベース接続URL（Noneの場合は既存設定を使用）
+            max_workers: 同時に実行するデータ取得の上限（セマフォで制御）
+            analysis_processes: 分析に使うプロセス数（Noneの場合はCPUコア数）
+            use_cache: 株価データが変わっていない銘柄は分析キャッシュを再利用するか
+        """
+        # 接続プールを1つにまとめ、取得・保存で共有する
+        self.engine = create_shared_engine(database_url)
+        self.data_fetcher = DataFetcher(engine=self.engine)
+        self.data_manager = AnalysisDataManager(engine=self.engine)
+        self.analyzer = StockAnalyzer(db_manager=self.data_manager)
+        self.max_workers = max(1, max_workers)
+        self.analysis_processes = max(1, analysis_processes or os.cpu_count() or 1)
+        self.use_cache = use_cache
     
-    def save_all_analysis_data(self, investment_styles: List[str] = None) -> Dict:
-        """すべての対象銘柄の分析データを保存"""
+    async def save_all_analysis_data(self, investment_styles: List[str] = None) -> Dict:
+        """すべての対象銘柄の分析データを保存
+        
+        取得→分析→書き込みをasyncio.Queueでつないだパイプラインで実行し、
+        DB待ちの間にも分析を進める。書き込みはWRITE_BATCH_SIZE件ごとにコミットし、
+        失敗したバッチの銘柄だけを失敗として扱う。
+        """
         logger.info("=== 分析データバッチ保存開始 ===")
-        start_time = datetime.now()
+        start_time = time.perf_counter()
         
         try:
             # 対象銘柄の取得
-            target_stocks = self.data_fetcher.get_target_stock_codes()
+            target_stocks = await asyncio.to_thread(self.data_fetcher.get_target_stock_codes)
             if not target_stocks:
                 logger.error("対象銘柄が見つかりません")
                 return {'success': False, 'message': '対象銘柄が見つかりません'}
@@ -57,59 +85,69 @@ class BatchDataSaver:
             if investment_styles is None:
                 investment_styles = ['short_term', 'long_term']
             
-            # 各銘柄の分析データを保存
-            total_success = 0
-            total_failed = 0
-            failed_stocks = []
+            # 取得→分析→書き込みのパイプラインを構築
+            failed_set = set()
+            chunks = [target_stocks[i:i + PIPELINE_CHUNK_SIZE]
+                      for i in range(0, len(target_stocks), PIPELINE_CHUNK_SIZE)]
+            fetch_q: asyncio.Queue = asyncio.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+            write_q: asyncio.Queue = asyncio.Queue(maxsize=PIPELINE_QUEUE_SIZE)
             
-            for stock_code in target_stocks:
-                logger.info(f"銘柄 {stock_code} の分析データ保存開始")
-                
-                stock_success = True
-                for style in investment_styles:
-                    try:
-                        # データ取得
-                        stock_data = self.data_fetcher.get_all_stock_data(stock_code)
-                        
-                        # 分析実行
-                        analysis_result = self.analyzer.analyze_stock_by_style(stock_data, style)
-                        
-                        if not analysis_result:
-                            logger.warning(f"銘柄 {stock_code} の分析に失敗しました（スタイル: {style}）")
-                            stock_success = False
-                            continue
-                        
-                        # データベース保存
-                        indicators_saved = self._save_technical_indicators(
-                            stock_code, analysis_result, style
-                        )
-                        
-                        decision_saved = self._save_investment_decision(
-                            stock_code, analysis_result, style
+            # CPU処理の分析は銘柄数が十分な場合のみプロセスプールで実行
+            # （ロギング・to_threadのスレッドが動いている状態でforkしないようspawnで起動）
+            # （ワーカーのログは親プロセスへ転送して書き出す）
+            use_pool = self.analysis_processes > 1 and len(target_stocks) >= MIN_STOCKS_FOR_PROCESS_POOL
+            pool = None
+            if use_pool:
+                context = multiprocessing.get_context('spawn')
+                worker_log_listener = start_worker_log_listener(context)
+                pool = ProcessPoolExecutor(max_workers=self.analysis_processes, mp_context=context,
+                                           initializer=init_worker_logging,
+                                           initargs=(worker_log_listener.queue,))
+            
+            async def analyze_all():
+                async with asyncio.TaskGroup() as analyzers:
+                    for _ in range(self.analysis_processes):
+                        analyzers.create_task(
+                            self._analyze_stage(investment_styles, fetch_q, write_q, failed_set, pool)
                         )
-                        
-                        if indicators_saved and decision_saved:
-                            logger.info(f"銘柄 {stock_code} の分析データを保存しました（スタイル: {style}）")
-                        else:
-                            logger.warning(f"銘柄 {stock_code} の一部データ保存に失敗しました（スタイル: {style}）")
-                            stock_success = False
-                            
-                    except Exception as e:
-                        logger.error(f"銘柄 {stock_code} の分析データ保存中にエラー（スタイル: {style}）: {e}")
-                        stock_success = False
-                
-                if stock_success:
-                    total_success += 1
-                else:
-                    total_failed += 1
-                    failed_stocks.append(stock_code)
+                await write_q.put(None)  # 書き込みステージへの終了通知
+            
+            # いずれかのステージが例外で終了した場合、TaskGroupが他のステージをキャンセルする
+            # （キューの受け渡しで待ち続けるステージを残さず、書き込み接続はステージ内で閉じる）
+            try:
+                async with asyncio.TaskGroup() as stages:
+                    stages.create_task(self._fetch_stage(chunks, fetch_q, failed_set))
+                    stages.create_task(analyze_all())
+                    write_task = stages.create_task(self._write_stage(write_q, failed_set))
+                saved = write_task.result()
+            except ExceptionGroup as group:
+                # 最初に失敗したステージの例外として扱う（分析ステージはTaskGroupが入れ子になる）
+                error = group
+                while isinstance(error, ExceptionGroup):
+                    error = error.exceptions[0]
+                raise error from group
+            finally:
+                if pool is not None:
+                    await asyncio.to_thread(pool.shutdown, cancel_futures=True)
+                    worker_log_listener.stop()
+            
+            if not saved:
+                logger.error("一部の分析データの保存に失敗しました")
+            
+            # 成否をブールマスクで集計（保存に失敗したバッチの銘柄は書き込みステージがfailed_setへ追加済み）
+            codes = np.array(target_stocks, dtype=object)
+            ok = np.fromiter((code not in failed_set for code in target_stocks),
+                             dtype=bool, count=len(target_stocks))
+            total_success = int(ok.sum())
+            total_failed = int((~ok).sum())
+            failed_stocks = codes[~ok].tolist()
             
             # 実行結果のサマリー
-            end_time = datetime.now()
-            execution_time = (end_time - start_time).total_seconds()
+            execution_time = time.perf_counter() - start_time
             
             summary = {
-                'success': True,
+                'success': saved,
+                'message': '保存完了' if saved else '一部の分析データの保存に失敗しました',
                 'total_stocks': len(target_stocks),
                 'success_count': total_success,
                 'failed_count': total_failed,
@@ -129,8 +167,7 @@ class BatchDataSaver:
             
             # サマリーファイルを保存
             summary_file = "batch_save_summary.json"
-            with open(summary_file, 'w', encoding='utf-8') as f:
-                json.dump(summary, f, ensure_ascii=False, indent=2)
+            write_json(summary_file, summary)
             
             logger.info(f"サマリーファイルを保存: {summary_file}")
             
@@ -140,41 +177,273 @@ class BatchDataSaver:
             logger.error(f"バッチ保存中にエラー: {e}")
             return {'success': False, 'message': str(e)}
     
+    async def _fetch_stage(self, chunks: List[List[str]], fetch_q: asyncio.Queue, failed_set: set):
+        """取得ステージ: 銘柄チャンクを並行に一括取得して分析キューへ流す"""
+        semaphore = asyncio.Semaphore(self.max_workers)
+        
+        async def fetch_chunk(chunk: List[str]):
+            try:
+                chunk_data = await self._fetch_stocks_data_async(chunk, semaphore)
+            except Exception as e:
+                logger.error(f"銘柄データの一括取得中にエラー: {e}")
+                failed_set.update(chunk)
+                return
+            await fetch_q.put(chunk_data)
+        
+        await asyncio.gather(*(fetch_chunk(chunk) for chunk in chunks))
+        
+        # 分析ワーカーへの終了通知
+        for _ in range(self.analysis_processes):
+            await fetch_q.put(None)
+    
+    async def _fetch_stocks_data_async(self, stock_codes: List[str],
+                                       semaphore: asyncio.Semaphore) -> Dict[str, Dict]:
+        """セマフォで同時実行数を制限しつつ銘柄チャンクのデータを一括取得"""
+        async with semaphore:
+            return await asyncio.to_thread(self._fetch_stocks_data, stock_codes)
+    
+    def _fetch_stocks_data(self, stock_codes: List[str]) -> Dict[str, Dict]:
+        """銘柄チャンクのデータを取得し、ワーカースレッドのセッションを破棄"""
+        try:
+            return self.data_fetcher.get_all_stocks_data_bulk(stock_codes)
+        finally:
+            self.data_fetcher.SessionLocal.remove()
+    
+    async def _analyze_stage(self, investment_styles: List[str], fetch_q: asyncio.Queue,
+                             write_q: asyncio.Queue, failed_set: set,
+                             pool: Optional[ProcessPoolExecutor]):
+        """分析ステージ: チャンクを投資スタイルごとに分析し、保存用の行を書き込みキューへ流す"""
+        while True:
+            chunk_data = await fetch_q.get()
+            if chunk_data is None:
+                break
+            
+            fingerprints = self._compute_fingerprints(chunk_data) if self.use_cache else {}
+            
+            for style in investment_styles:
+                analysis_results, cache_rows = await self._analyze_chunk_with_cache(
+                    chunk_data, style, fingerprints, pool
+                )
+                
+                chunk_rows = []
+                for stock_code, rows in self._build_style_rows(analysis_results, style).items():
+                    if rows is None:
+                        failed_set.add(stock_code)
+                    else:
+                        chunk_rows.append(rows)
+                
+                if chunk_rows or cache_rows:
+                    await write_q.put((chunk_rows, cache_rows))
+    
+    def _compute_fingerprints(self, chunk_data: Dict[str, Dict]) -> Dict[str, str]:
+        """チャンク内の銘柄ごとに株価データのフィンガープリントを計算"""
+        fingerprints = {}
+        for stock_code, stock_data in chunk_data.items():
+            price_history = stock_data.get('price_history')
+            if price_history is None or price_history.empty:
+                continue
+            try:
+                fingerprints[stock_code] = compute_data_fingerprint(price_history)
+            except Exception as e:
+                logger.warning(f"銘柄 {stock_code} のフィンガープリント計算に失敗しました: {e}")
+        return fingerprints
+    
+    async def _analyze_chunk_with_cache(self, chunk_data: Dict[str, Dict], investment_style: str,
+                                        fingerprints: Dict[str, str],
+                                        pool: Optional[ProcessPoolExecutor]) -> Tuple[Dict[str, Optional[AnalysisResult]], List[Dict]]:
+        """キャッシュに一致する銘柄は分析を省略し、残りの銘柄だけを一括分析
+        
+        Returns:
+            (銘柄コード → 分析結果, 新たに保存するキャッシュ行のリスト)
+        """
+        analysis_results: Dict[str, Optional[AnalysisResult]] = {}
+        cached = await asyncio.to_thread(self.data_manager.get_cached_analysis, investment_style, fingerprints)
+        for stock_code, result_json in cached.items():
+            try:
+                analysis_results[stock_code] = AnalysisResult.from_cache_json(stock_code, investment_style, result_json)
+            except Exception as e:
+                logger.warning(f"銘柄 {stock_code} の分析キャッシュを読み込めませんでした: {e}")
+        
+        if analysis_results:
+            logger.info(f"分析キャッシュを利用: {len(analysis_results)}銘柄（スタイル: {investment_style}）")
+        
+        pending = {code: data for code, data in chunk_data.items() if code not in analysis_results}
+        if not pending:
+            return analysis_results, []
+        
+        fresh_results = await self._analyze_chunk(pending, investment_style, pool)
+        analysis_results.update(fresh_results)
+        
+        cache_rows = []
+        for stock_code, analysis_result in fresh_results.items():
+            if analysis_result is None or stock_code not in fingerprints:
+                continue
+            try:
+                cache_rows.append(self.data_manager.build_analysis_cache_row(
+                    stock_code, investment_style, fingerprints[stock_code], analysis_result.to_cache_json()
+                ))
+            except Exception as e:
+                logger.warning(f"銘柄 {stock_code} の分析キャッシュ作成に失敗しました: {e}")
+        
+        return analysis_results, cache_rows
+    
+    async def _analyze_chunk(self, chunk_data: Dict[str, Dict], investment_style: str,
+                             pool: Optional[ProcessPoolExecutor]) -> Dict[str, Optional[AnalysisResult]]:
+        """チャンクを一括分析（プロセスプールが使えない場合はスレッドで実行）"""
+        if pool is not None:
+            try:
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(pool, self.analyzer.analyze_batch, chunk_data, investment_style)
+            except Exception as e:
+                logger.warning(f"プロセスプールでの分析に失敗したため、スレッドで分析します: {e}")
+        
+        return await asyncio.to_thread(self.analyzer.analyze_batch, chunk_data, investment_style)
+    
+    def _build_style_rows(self, analysis_results: Dict[str, Optional[AnalysisResult]],
+                          investment_style: str) -> Dict[str, Optional[Tuple[Dict, Dict]]]:
+        """分析結果から銘柄ごとの保存用の行を作成（失敗した銘柄はNone）"""
+        style_rows = {}
+        # 分析日・登録日時はチャンク内の全行で共有（行ごとに時刻を取得しない）
+        created_at = datetime.now()
+        analysis_date = created_at.date()
+        
+        for stock_code, analysis_result in analysis_results.items():
+            if analysis_result is None:
+                logger.warning(f"銘柄 {stock_code} の分析に失敗しました（スタイル: {investment_style}）")
+                style_rows[stock_code] = None
+                continue
+            
+            try:
+                style_rows[stock_code] = (
+                    self.data_manager.build_technical_indicator_row(
+                        stock_code, analysis_result.indicators, investment_style, analysis_date, created_at
+                    ),
+                    self.data_manager.build_investment_decision_row(
+                        stock_code, analysis_result.to_decision_data(), investment_style, analysis_date, created_at
+                    )
+                )
+            except Exception as e:
+                logger.error(f"保存データ作成中にエラー（銘柄: {stock_code}, スタイル: {investment_style}）: {e}")
+                style_rows[stock_code] = None
+        
+        return style_rows
+    
+    async def _write_stage(self, write_q: asyncio.Queue, failed_set: set) -> bool:
+        """書き込みステージ: 行をWRITE_BATCH_SIZE件ごとにINSERTしてコミット
+        
+        バッチごとにコミットするため、失敗時はそのバッチだけをロールバックし、バッチの銘柄をfailed_setへ追加する
+        （コミット済みのバッチと以降のバッチは保存される）。接続できない場合は受け取った全銘柄を失敗とする。
+        上流のステージを詰まらせないよう、終了通知までキューは消費し続ける。
+        
+        Returns:
+            すべてのバッチの保存に成功した場合はTrue
+        """
+        conn = None
+        saved = True
+        # 実行中のDB操作（キャンセルされても完了を待ってから接続を閉じる。接続は複数スレッドで同時に使えない）
+        pending: Optional[asyncio.Future] = None
+        
+        async def run_db(func, *args):
+            nonlocal pending
+            pending = asyncio.ensure_future(asyncio.to_thread(func, *args))
+            return await asyncio.shield(pending)
+        
+        async def write_batch(indicator_rows: List[Dict], decision_rows: List[Dict], cache_rows: List[Dict]) -> bool:
+            """1バッチ分をINSERTしてコミット（失敗時はロールバックし、バッチの銘柄を失敗として記録）"""
+            try:
+                await run_db(conn.begin)
+                if await run_db(self._insert_rows, conn, indicator_rows, decision_rows, cache_rows):
+                    await run_db(conn.commit)
+                    return True
+            except Exception as e:
+                logger.error(f"分析データのバッチ保存中にエラー: {e}")
+            try:
+                await run_db(conn.rollback)
+            except Exception as e:
+                logger.error(f"分析データのバッチ保存のロールバックに失敗しました: {e}")
+            failed_set.update(row['stock_code'] for row in indicator_rows)
+            return False
+        
+        try:
+            try:
+                conn = await run_db(self.engine.connect)
+            except Exception as e:
+                logger.error(f"分析データ保存用の接続に失敗しました: {e}")
+                saved = False
+            
+            indicator_batch: List[Dict] = []
+            decision_batch: List[Dict] = []
+            cache_batch: List[Dict] = []
+            while True:
+                item = await write_q.get()
+                if item is None:
+                    break
+                
+                chunk_rows, cache_rows = item
+                if conn is None:
+                    failed_set.update(indicator_row['stock_code'] for indicator_row, _ in chunk_rows)
+                    continue
+                
+                for indicator_row, decision_row in chunk_rows:
+                    indicator_batch.append(indicator_row)
+                    decision_batch.append(decision_row)
+                cache_batch.extend(cache_rows)
+                
+                if len(indicator_batch) >= WRITE_BATCH_SIZE or len(cache_batch) >= WRITE_BATCH_SIZE:
+                    saved = await write_batch(indicator_batch, decision_batch, cache_batch) and saved
+                    indicator_batch, decision_batch, cache_batch = [], [], []
+            
+            if conn is None:
+                return False
+            
+            if indicator_batch or cache_batch:
+                saved = await write_batch(indicator_batch, decision_batch, cache_batch) and saved
+            return saved
+            
+        except Exception as e:
+            logger.error(f"分析データの保存中にエラー: {e}")
+            return False
+        finally:
+            if pending is not None:
+                await asyncio.wait([pending])
+                if conn is None and not pending.cancelled() and pending.exception() is None:
+                    # 接続の取得中にキャンセルされた場合
+                    conn = pending.result()
+            # コミットされていないトランザクションはcloseでロールバックされる
+            if conn is not None:
+                await asyncio.to_thread(conn.close)
+    
+    def _insert_rows(self, conn: Connection, indicator_rows: List[Dict], decision_rows: List[Dict],
+                     cache_rows: List[Dict] = None) -> bool:
+        """テクニカル指標と投資判断を呼び出し側のトランザクション内でINSERT
+        
+        分析キャッシュは再計算で復元できるため、保存に失敗しても全体の成否には含めない。
+        """
+        saved = (self.data_manager.bulk_save_technical_indicators(indicator_rows, conn=conn)
+                 and self.data_manager.bulk_save_investment_decisions(decision_rows, conn=conn))
+        if saved and cache_rows:
+            self.data_manager.save_analysis_cache(cache_rows, conn=conn)
+        return saved
+    
     def _save_technical_indicators(self, stock_code: str, analysis_result: Dict, 
-                                 investment_style: str) -> bool:
+                                 investment_style: str, conn: Optional[Connection] = None) -> bool:
         """テクニカル指標を保存"""
         try:
-            indicators = analysis_result.get('indicators', {})
+            indicators = analysis_result['indicators']
             return self.data_manager.save_technical_indicators(
-                stock_code, indicators, investment_style
+                stock_code, indicators, investment_style, conn=conn
             )
         except Exception as e:
             logger.error(f"テクニカル指標保存中にエラー（銘柄: {stock_code}, スタイル: {investment_style}）: {e}")
             return False
     
     def _save_investment_decision(self, stock_code: str, analysis_result: Dict, 
-                                investment_style: str) -> bool:
+                                investment_style: str, conn: Optional[Connection] = None) -> bool:
         """投資判断を保存"""
         try:
-            signals = analysis_result.get('signals', {})
-            decision_data = {
-                'decision_type': 'analyze',
-                'target_price': analysis_result.get('target_price'),
-                'stop_loss': analysis_result.get('stop_loss'),
-                'confidence_score': analysis_result.get('confidence_score'),
-                'rsi_signal': signals.get('rsi_signal'),
-                'macd_signal': signals.get('macd_signal'),
-                'bb_signal': signals.get('bb_signal'),
-                'stoch_signal': signals.get('stoch_signal'),
-                'overall_signal': signals.get('overall_signal'),
-                'buy_count': signals.get('buy_count'),
-                'sell_count': signals.get('sell_count'),
-                'ai_reasoning': analysis_result.get('ai_reasoning'),
-                'risk_assessment': analysis_result.get('risk_assessment')
-            }
-            
             return self.data_manager.save_investment_decision(
-                stock_code, decision_data, investment_style
+                stock_code, AnalysisResult.from_dict(analysis_result).to_decision_data(),
+                investment_style, conn=conn
             )
         except Exception as e:
             logger.error(f"投資判断保存中にエラー（銘柄: {stock_code}, スタイル: {investment_style}）: {e}")
@@ -195,29 +464,33 @@ class BatchDataSaver:
                 return {'success': False, 'message': f'銘柄 {stock_code} のデータ取得に失敗'}
             
             results = {}
-            for style in investment_styles:
-                try:
-                    # 分析実行
-                    analysis_result = self.analyzer.analyze_stock_by_style(stock_data, style)
-                    
-                    if not analysis_result:
-                        results[style] = {'success': False, 'message': '分析失敗'}
-                        continue
-                    
-                    # データベース保存
-                    indicators_saved = self._save_technical_indicators(stock_code, analysis_result, style)
-                    decision_saved = self._save_investment_decision(stock_code, analysis_result, style)
-                    
-                    if indicators_saved and decision_saved:
-                        results[style] = {'success': True, 'message': '保存成功'}
-                    else:
-                        results[style] = {'success': False, 'message': '一部保存失敗'}
+            # 全スタイルの保存を単一トランザクションで実行（例外時はロールバック）
+            with self.data_manager.engine.begin() as conn:
+                for style in investment_styles:
+                    try:
+                        # 分析実行
+                        analysis_result = self.analyzer.analyze_stock_by_style(
+                            stock_data, style, save_to_database=False
+                        )
+                        
+                        if not analysis_result:
+                            results[style] = {'success': False, 'message': '分析失敗'}
+                            continue
+                        
+                        # データベース保存
+                        indicators_saved = self._save_technical_indicators(stock_code, analysis_result, style, conn)
+                        decision_saved = self._save_investment_decision(stock_code, analysis_result, style, conn)
                         
-                except Exception as e:
-                    results[style] = {'success': False, 'message': str(e)}
+                        if indicators_saved and decision_saved:
+                            results[style] = {'success': True, 'message': '保存成功'}
+                        else:
+                            results[style] = {'success': False, 'message': '一部保存失敗'}
+                            
+                    except Exception as e:
+                        results[style] = {'success': False, 'message': str(e)}
             
             # 結果の集計
-            success_count = sum(1 for result in results.values() if result.get('success', False))
+            success_count = sum(result['success'] for result in results.values())
             total_count = len(results)
             
             summary = {
@@ -237,16 +510,29 @@ class BatchDataSaver:
             logger.error(f"単一銘柄保存中にエラー: {e}")
             return {'success': False, 'message': str(e)}
 
-def main():
+def parse_args(argv: List[str] = None) -> argparse.Namespace:
+    """コマンドライン引数を解析"""
+    parser = argparse.ArgumentParser(description='分析データのバッチ保存')
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY,
+                        help=f'同時に処理する銘柄数（デフォルト: {DEFAULT_CONCURRENCY}）')
+    parser.add_argument('--processes', type=int, default=None,
+                        help='分析に使うプロセス数（デフォルト: CPUコア数）')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='分析キャッシュを使わずに全銘柄を再分析する')
+    return parser.parse_args(argv)
+
+def main(argv: List[str] = None):
     """メイン処理"""
     try:
+        args = parse_args(argv)
         print("=== 分析データバッチ保存システム ===")
         
         # バッチ保存器の初期化
-        saver = BatchDataSaver()
+        saver = BatchDataSaver(max_workers=args.concurrency, analysis_processes=args.processes,
+                               use_cache=not args.no_cache)
         
         # すべての分析データを保存
-        result = saver.save_all_analysis_data()
+        result = asyncio.run(saver.save_all_analysis_data())
         
         if result['success']:
             print(f"\n✅ 分析データ保存完了")
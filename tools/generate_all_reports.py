@@ -1,39 +1,37 @@
 #!/usr/bin/env python3
 """
 すべてのレポートを一括生成する統合スクリプト
-短期レポート、長期レポート、一覧ページを順次生成
+短期レポートと長期レポートを順に生成し、その後一覧ページを生成
 """
 
+import argparse
 import sys
 import os
+import asyncio
 import logging
-import json
+import time
 from datetime import datetime
-from typing import Dict
-# モジュールのパスを追加
-current_dir = os.path.dirname(os.path.abspath(__file__))
-sys.path.append(current_dir)
+from typing import Dict, List
+from tools.report_generator.json_writer import write_json
+from tools.report_generator.logging_setup import setup_queue_logging
 
-from generate_stock_reports import StockReportGenerator
-
-# ロギング設定
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(sys.stdout),
-        logging.FileHandler('all_reports_generation.log', encoding='utf-8')
-    ]
-)
+# ロギング設定（ファイル書き込みはバックグラウンドスレッドで実行）
+# 各生成スクリプトのログ設定より先に設定し、このスクリプトのログ設定を優先する
+log_listener = setup_queue_logging('all_reports_generation.log')
 logger = logging.getLogger(__name__)
 
+from tools.generate_stock_reports import StockReportGenerator
+from tools.generate_long_term_reports import LongTermStockReportGenerator
+from tools.generate_report_index import ReportIndexGenerator
+from tools.batch_save_analysis_data import BatchDataSaver
+
 class AllReportsGenerator:
     """全レポート一括生成クラス"""
     
-    def __init__(self):
+    def __init__(self, skip_unchanged: bool = True):
         """
         Args:
-            report_type: "traditional" (従来型) または "style_based" (投資スタイル別)
+            skip_unchanged: 株価履歴の登録後に生成済みの短期・長期レポートは再生成しない
         """
         self.output_dir = "reports"
         
@@ -44,16 +42,18 @@ class AllReportsGenerator:
         self.long_term_dir = os.path.join(self.output_dir, "long_term")
         os.makedirs(self.short_term_dir, exist_ok=True)
         os.makedirs(self.long_term_dir, exist_ok=True)
+        
+        # 各生成器は一度だけ生成し、DB接続プールを使い回す
+        self._short_gen = StockReportGenerator(output_dir=self.short_term_dir, skip_unchanged=skip_unchanged)
+        self._long_gen = LongTermStockReportGenerator(output_dir=self.long_term_dir, skip_unchanged=skip_unchanged)
+        self._index_gen = ReportIndexGenerator(output_dir=self.output_dir)
     
     def generate_short_term_reports(self) -> Dict:
         """短期レポートを生成"""
         try:
             logger.info("=== 短期レポート生成開始 ===")
             
-            # 短期レポート生成スクリプトをインポートして実行
-            
-            generator = StockReportGenerator(output_dir=self.short_term_dir)
-            result = generator.generate_all_reports()
+            result = self._short_gen.generate_all_reports()
             
             logger.info("=== 短期レポート生成完了 ===")
             return result
@@ -67,11 +67,7 @@ class AllReportsGenerator:
         try:
             logger.info("=== 長期レポート生成開始 ===")
             
-            # 長期レポート生成スクリプトをインポートして実行
-            from generate_long_term_reports import LongTermStockReportGenerator
-            
-            generator = LongTermStockReportGenerator(output_dir=self.long_term_dir)
-            result = generator.generate_all_reports()
+            result = self._long_gen.generate_all_reports()
             
             logger.info("=== 長期レポート生成完了 ===")
             return result
@@ -85,11 +81,7 @@ class AllReportsGenerator:
         try:
             logger.info("=== 一覧ページ生成開始 ===")
             
-            # 一覧ページ生成スクリプトをインポートして実行
-            from generate_report_index import ReportIndexGenerator
-            
-            generator = ReportIndexGenerator(output_dir=self.output_dir)
-            result = generator.generate_index_page()
+            result = self._index_gen.generate_index_page()
             
             logger.info("=== 一覧ページ生成完了 ===")
             return result
@@ -102,21 +94,23 @@ class AllReportsGenerator:
     def generate_all(self, save_to_database: bool = True) -> Dict:
         """すべてのレポートを生成"""
         logger.info("=== 全レポート一括生成開始 ===")
-        start_time = datetime.now()
+        start_time = time.perf_counter()
         
         try:
-            # 従来型レポート生成
+            # 短期・長期レポートは順に生成する
+            # （各生成器が自身のプロセスプールで銘柄を並列処理するため、同じプロセス内で2つを重ねて動かさない）
             short_term_result = self.generate_short_term_reports()
-            if not short_term_result.get('success', False):
+            if not short_term_result['success']:
                 logger.error("短期レポート生成に失敗しました")
                 return {'success': False, 'message': '短期レポート生成に失敗'}
             
             long_term_result = self.generate_long_term_reports()
-            if not long_term_result.get('success', False):
+            if not long_term_result['success']:
                 logger.warning("長期レポート生成に失敗しましたが、処理を継続します")
             
+            # 一覧ページは両方のレポート完了後に生成
             index_result = self.generate_index_page()
-            if not index_result.get('success', False):
+            if not index_result['success']:
                 logger.error("一覧ページ生成に失敗しました")
                 return {'success': False, 'message': '一覧ページ生成に失敗'}
             
@@ -124,10 +118,9 @@ class AllReportsGenerator:
             database_result = None
             if save_to_database:
                 try:
-                    from batch_save_analysis_data import BatchDataSaver
                     saver = BatchDataSaver()
-                    database_result = saver.save_all_analysis_data()
-                    if database_result.get('success', False):
+                    database_result = asyncio.run(saver.save_all_analysis_data())
+                    if database_result['success']:
                         logger.info("分析データのデータベース保存が完了しました")
                     else:
                         logger.warning(f"分析データのデータベース保存に失敗: {database_result.get('message', '不明なエラー')}")
@@ -137,12 +130,12 @@ class AllReportsGenerator:
             
             summary = {
                 'success': True,
-                'execution_time': (datetime.now() - start_time).total_seconds(),
+                'execution_time': time.perf_counter() - start_time,
                 'short_term': short_term_result,
                 'long_term': long_term_result,
                 'index': index_result,
                 'database': database_result,
-                'generation_date': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                'generation_date': datetime.now().isoformat(timespec='seconds')
             }
             
             logger.info("=== 全レポート一括生成完了 ===")
@@ -150,8 +143,7 @@ class AllReportsGenerator:
             
             # サマリーファイルを保存
             summary_file = os.path.join(self.output_dir, "all_reports_summary.json")
-            with open(summary_file, 'w', encoding='utf-8') as f:
-                json.dump(summary, f, ensure_ascii=False, indent=2)
+            write_json(summary_file, summary)
             
             logger.info(f"サマリーファイルを保存: {summary_file}")
             
@@ -161,13 +153,21 @@ class AllReportsGenerator:
             logger.error(f"全レポート生成中にエラー: {e}")
             return {'success': False, 'message': str(e)}
 
-def main():
+def parse_args(argv: List[str] = None) -> argparse.Namespace:
+    """コマンドライン引数を解析"""
+    parser = argparse.ArgumentParser(description='全レポート一括生成')
+    parser.add_argument('--force', action='store_true',
+                        help='生成済みで最新の短期・長期レポートも再生成する')
+    return parser.parse_args(argv)
+
+def main(argv: List[str] = None):
     """メイン処理"""
     try:
+        args = parse_args(argv)
         print("=== 全レポート生成システム ===")
         
         # 全レポート生成器の初期化
-        generator = AllReportsGenerator()
+        generator = AllReportsGenerator(skip_unchanged=not args.force)
         
         # すべてのレポートを生成
         result = generator.generate_all()
@@ -185,7 +185,7 @@ def main():
             print(f"   失敗: {short_term.get('failed_count', 0)}銘柄")
             
             long_term = result['long_term']
-            if long_term.get('success', False):
+            if long_term['success']:
                 print(f"\n📈 長期レポート:")
                 print(f"   対象銘柄数: {long_term.get('total_stocks', 0)}")
                 print(f"   成功: {long_term.get('success_count', 0)}銘柄")
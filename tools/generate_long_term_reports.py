@@ -4,37 +4,83 @@
 portfolio_holdingsとtrading_plansにある銘柄を対象に長期投資向け分析レポートを生成
 """
 
+import argparse
 import sys
 import os
 import logging
-import json
-from datetime import datetime
-from typing import List, Dict
+import time
+from typing import List, Dict, Optional, Tuple
 import jinja2
 
-# モジュールのパスを追加
-sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from tools.report_generator.data_fetcher import DataFetcher
+from tools.report_generator.long_term_analyzer import LongTermStockAnalyzer
+from tools.report_generator.visualizer import StockVisualizer
+from tools.report_generator.report_cache import ReportCache, REPORT_CACHE_DIR, SUMMARY_PRICE_ROWS
+from tools.report_generator.template_env import create_template_env
+from tools.report_generator.file_writer import find_fresh_reports, is_report_fresh, write_text_file
+from tools.report_generator.css_classes import SignalClassifier, sign_classes, threshold_classes
+from tools.report_generator.formatters import format_fields, format_number, format_percentage
+from tools.report_generator.json_writer import write_json
+from tools.report_generator.logging_setup import setup_queue_logging
+from tools.report_generator.worker_pool import generate_reports
 
-from report_generator.data_fetcher import DataFetcher
-from report_generator.long_term_analyzer import LongTermStockAnalyzer
-from report_generator.visualizer import StockVisualizer
+# ロギング設定（ファイルへはバックグラウンドスレッドからまとめて書き出す）
+log_listener = setup_queue_logging('long_term_stock_report_generation.log')
+logger = logging.getLogger(__name__)
+
+# 長期分析に使う株価履歴の年数（約252営業日/年）
+LONG_TERM_YEARS = 5
 
-# ロギング設定
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(sys.stdout),
-        logging.FileHandler('long_term_stock_report_generation.log', encoding='utf-8')
-    ]
+# 長期分析に必要な最低データ数（1年分）
+LONG_TERM_MIN_ROWS = 252
+
+# 長期指標値の表示項目（キー, 書式種別, 小数桁数）
+_INDICATOR_FIELDS = (
+    # 長期価格変動
+    ('price_change_50d', 'percentage', 2),
+    ('price_change_100d', 'percentage', 2),
+    ('price_change_200d', 'percentage', 2),
+    ('price_change_1y', 'percentage', 2),
+    # 長期移動平均
+    ('sma_50', 'number', 0),
+    ('sma_100', 'number', 0),
+    ('sma_200', 'number', 0),
+    ('ema_50', 'number', 0),
+    ('ema_100', 'number', 0),
+    ('ema_200', 'number', 0),
+    # 長期テクニカル指標
+    ('rsi_26', 'number', 2),
+    ('rsi_52', 'number', 2),
+    ('stoch_k_26', 'number', 2),
+    ('stoch_d_26', 'number', 2),
+    ('bb_upper_50', 'number', 0),
+    ('bb_lower_50', 'number', 0),
+    ('volatility_50d', 'percentage', 2),
+    ('volatility_100d', 'percentage', 2),
+    ('volatility_200d', 'percentage', 2),
+    # トレンド分析
+    ('trend_strength', 'number', 1),
 )
-logger = logging.getLogger(__name__)
+
+# 総合評価と長期シグナル（強気・弱気も判定）のCSSクラス判定
+_OVERALL_SIGNAL_CLASSIFIER = SignalClassifier()
+_SIGNAL_CLASSIFIER = SignalClassifier('買い|強気|強い上昇', '売り|弱気|強い下降')
 
 class LongTermStockReportGenerator:
     """長期株式レポート生成クラス"""
     
-    def __init__(self, output_dir: str = "reports/long_term"):
+    def __init__(self, output_dir: str = "reports/long_term", max_workers: Optional[int] = None,
+                 cache_dir: str = REPORT_CACHE_DIR, skip_unchanged: bool = True):
+        """
+        Args:
+            output_dir: レポートの出力先
+            max_workers: レポート生成に使うプロセス数（Noneの場合はCPUコア数、1以下は逐次実行）
+            cache_dir: 一覧ページと共有する分析結果キャッシュの保存先
+            skip_unchanged: 株価履歴の登録後に生成済みのレポートは再生成しない
+        """
         self.output_dir = output_dir
+        self.skip_unchanged = skip_unchanged
+        self.max_workers = max_workers if max_workers is not None else (os.cpu_count() or 1)
         self.images_dir = os.path.join(output_dir, "images")
         os.makedirs(self.output_dir, exist_ok=True)
         os.makedirs(self.images_dir, exist_ok=True)
@@ -42,43 +88,97 @@ class LongTermStockReportGenerator:
         # コンポーネントの初期化
         self.data_fetcher = DataFetcher()
         self.analyzer = LongTermStockAnalyzer()
-        self.visualizer = StockVisualizer(self.images_dir)
+        self.visualizer = StockVisualizer(self.images_dir, base_dir=output_dir)
+        self.report_cache = ReportCache(cache_dir)
         
-        # Jinja2テンプレート環境の設定
-        template_dir = os.path.join(os.path.dirname(__file__), "report_generator")
-        self.template_env = jinja2.Environment(
-            loader=jinja2.FileSystemLoader(template_dir),
-            autoescape=True
-        )
+        # Jinja2テンプレート環境の設定（テンプレートは一度だけ読み込み、全件のレンダリングで使い回す）
+        self.template_env = create_template_env()
+        try:
+            self._template = self.template_env.get_template('long_term_template.html')
+        except jinja2.TemplateError as e:
+            logger.error(f"HTMLテンプレートの読み込みに失敗しました: {e}")
+            self._template = None
     
-    def generate_single_report(self, stock_code: str) -> bool:
-        """単一銘柄の長期レポートを生成"""
+    def generate_single_report(self, stock_code: str, stock_data: Optional[Dict] = None) -> bool:
+        """単一銘柄の長期レポートを生成
+        
+        Args:
+            stock_code: 銘柄コード
+            stock_data: 一括取得済みの銘柄データ（Noneの場合はこの銘柄のみ取得）
+        """
+        # 株価履歴の登録後に生成済みの場合は分析・チャート描画を省略
+        if self.skip_unchanged and self._is_report_fresh(stock_code):
+            logger.info(f"銘柄 {stock_code} の長期レポートは最新のため再生成しません")
+            return True
+        
+        report = self._build_report(stock_code, stock_data)
+        if report is None:
+            return False
+        
+        report_filename, html_content = report
+        try:
+            write_text_file(report_filename, html_content)
+            logger.info(f"銘柄 {stock_code} の長期レポートを保存: {report_filename}")
+            return True
+        except Exception as e:
+            logger.error(f"銘柄 {stock_code} の長期レポート保存中にエラー: {e}")
+            return False
+    
+    def _report_filename(self, stock_code: str) -> str:
+        """長期レポートの出力ファイル名"""
+        return os.path.join(self.output_dir, f"{stock_code}.html")
+    
+    def _is_report_fresh(self, stock_code: str) -> bool:
+        """長期レポートが株価履歴の最終登録日時より後に生成済みか"""
+        last_updates = self.data_fetcher.get_last_price_updates([stock_code])
+        return is_report_fresh(self._report_filename(stock_code), last_updates.get(stock_code))
+    
+    def _fetch_stock_data(self, stock_code: str) -> Dict:
+        """単一銘柄の長期レポート用データを取得"""
+        return {
+            "stock_code": stock_code,
+            "basic_info": self.data_fetcher.get_stock_basic_info(stock_code),
+            "price_history": self.data_fetcher.get_long_term_stock_price_history(stock_code, years=LONG_TERM_YEARS),
+            "portfolio_info": self.data_fetcher.get_portfolio_holdings_info(stock_code),
+            "trading_plans": self.data_fetcher.get_trading_plans_info(stock_code)
+        }
+    
+    def _fetch_stocks_data_bulk(self, stock_codes: List[str]) -> Dict[str, Dict]:
+        """銘柄チャンクの長期レポート用データを一括取得"""
+        return self.data_fetcher.get_all_stocks_data_bulk(stock_codes, days=LONG_TERM_YEARS * 252)
+    
+    def _build_reports(self, stock_codes: List[str]) -> Dict[str, Optional[Tuple[str, str]]]:
+        """銘柄チャンクのデータを一括取得し、銘柄ごとのレポートHTMLを作成"""
+        bulk_data = self._fetch_stocks_data_bulk(stock_codes)
+        return {code: self._build_report(code, bulk_data.get(code)) for code in stock_codes}
+    
+    def _build_report(self, stock_code: str, stock_data: Optional[Dict] = None) -> Optional[Tuple[str, str]]:
+        """単一銘柄の長期レポートHTMLを作成
+        
+        Returns:
+            (出力ファイル名, HTML)。生成できない場合はNone
+        """
         try:
             logger.info(f"銘柄 {stock_code} の長期レポート生成開始")
             
-            # 1. データ取得（長期分析用に5年分のデータを取得）
-            basic_info = self.data_fetcher.get_stock_basic_info(stock_code)
-            price_history = self.data_fetcher.get_long_term_stock_price_history(stock_code, years=5)
-            portfolio_info = self.data_fetcher.get_portfolio_holdings_info(stock_code)
-            trading_plans = self.data_fetcher.get_trading_plans_info(stock_code)
-            
-            stock_data = {
-                "stock_code": stock_code,
-                "basic_info": basic_info,
-                "price_history": price_history,
-                "portfolio_info": portfolio_info,
-                "trading_plans": trading_plans
-            }
+            # 1. データ取得（長期分析用に5年分のデータを取得、不足する銘柄は関連データを取得せずに終了）
+            if stock_data is None:
+                if not self.data_fetcher.has_sufficient_price_data(stock_code, LONG_TERM_MIN_ROWS):
+                    logger.warning(f"銘柄 {stock_code} のデータが不足しています（1年分以上必要）")
+                    return None
+                stock_data = self._fetch_stock_data(stock_code)
+            basic_info = stock_data.get('basic_info')
+            price_history = stock_data.get('price_history')
             
             # DataFrameの空チェックを修正
             if price_history is None or (hasattr(price_history, 'empty') and price_history.empty):
                 logger.warning(f"銘柄 {stock_code} の株価データがありません")
-                return False
+                return None
             
             # 長期分析には十分なデータが必要（最低1年分）
-            if len(price_history) < 252:
+            if len(price_history) < LONG_TERM_MIN_ROWS:
                 logger.warning(f"銘柄 {stock_code} のデータが不足しています（1年分以上必要）")
-                return False
+                return None
             
             logger.info(f"利用可能なデータ日数: {len(price_history)}日")
             
@@ -92,7 +192,13 @@ class LongTermStockReportGenerator:
             analysis_result = self.analyzer.analyze_long_term_stock(price_history, stock_info)
             if not analysis_result:
                 logger.warning(f"銘柄 {stock_code} の長期分析に失敗しました")
-                return False
+                return None
+            
+            # 一覧ページで再分析しないよう、長期分析のシグナルをキャッシュ
+            # （一覧ページは直近SUMMARY_PRICE_ROWS件だけを読み込むため、キーはその範囲から計算する）
+            self.report_cache.save(stock_code, 'long_term', price_history,
+                                   {'signals': analysis_result.get('signals', {})},
+                                   key_rows=SUMMARY_PRICE_ROWS)
             
             # 3. 可視化
             charts = self.visualizer.generate_all_charts(stock_data, analysis_result)
@@ -101,17 +207,11 @@ class LongTermStockReportGenerator:
             report_data = self._prepare_report_data(stock_data, analysis_result, charts)
             html_content = self._render_html_template(report_data)
             
-            # 5. ファイル保存
-            report_filename = os.path.join(self.output_dir, f"{stock_code}.html")
-            with open(report_filename, 'w', encoding='utf-8') as f:
-                f.write(html_content)
-            
-            logger.info(f"銘柄 {stock_code} の長期レポートを保存: {report_filename}")
-            return True
+            return self._report_filename(stock_code), html_content
             
         except Exception as e:
             logger.error(f"銘柄 {stock_code} の長期レポート生成中にエラー: {e}")
-            return False
+            return None
     
     def _prepare_report_data(self, stock_data: Dict, analysis_result: Dict, charts: Dict) -> Dict:
         """長期レポート用データを準備"""
@@ -130,33 +230,7 @@ class LongTermStockReportGenerator:
             'analysis_type': analysis_result.get('analysis_type', '長期投資'),
             'current_price': self._format_number(analysis_result.get('current_price')),
             
-            # 長期価格変動
-            'price_change_50d': self._format_percentage(indicators.get('price_change_50d')),
-            'price_change_100d': self._format_percentage(indicators.get('price_change_100d')),
-            'price_change_200d': self._format_percentage(indicators.get('price_change_200d')),
-            'price_change_1y': self._format_percentage(indicators.get('price_change_1y')),
-            
-            # 長期移動平均
-            'sma_50': self._format_number(indicators.get('sma_50')),
-            'sma_100': self._format_number(indicators.get('sma_100')),
-            'sma_200': self._format_number(indicators.get('sma_200')),
-            'ema_50': self._format_number(indicators.get('ema_50')),
-            'ema_100': self._format_number(indicators.get('ema_100')),
-            'ema_200': self._format_number(indicators.get('ema_200')),
-            
-            # 長期テクニカル指標
-            'rsi_26': self._format_number(indicators.get('rsi_26'), 2),
-            'rsi_52': self._format_number(indicators.get('rsi_52'), 2),
-            'stoch_k_26': self._format_number(indicators.get('stoch_k_26'), 2),
-            'stoch_d_26': self._format_number(indicators.get('stoch_d_26'), 2),
-            'bb_upper_50': self._format_number(indicators.get('bb_upper_50')),
-            'bb_lower_50': self._format_number(indicators.get('bb_lower_50')),
-            'volatility_50d': self._format_percentage(indicators.get('volatility_50d'), 2),
-            'volatility_100d': self._format_percentage(indicators.get('volatility_100d'), 2),
-            'volatility_200d': self._format_percentage(indicators.get('volatility_200d'), 2),
-            
             # トレンド分析
-            'trend_strength': self._format_number(indicators.get('trend_strength'), 1),
             'trend_direction': indicators.get('trend_direction', '不明'),
             
             # 長期シグナル
@@ -171,16 +245,21 @@ class LongTermStockReportGenerator:
             
             # ポートフォリオ情報
             'portfolio_info': stock_data.get('portfolio_info', []),
-            'trading_plans': stock_data.get('trading_plans', []),
-            
-            # チャートパス（相対パスで指定）
-            'price_chart_path': f"images/{charts.get('price_chart', '').split('/')[-1]}" if charts.get('price_chart') else '',
-            'technical_chart_path': f"images/{charts.get('technical_chart', '').split('/')[-1]}" if charts.get('technical_chart') else '',
-            'signal_summary_path': f"images/{charts.get('signal_summary', '').split('/')[-1]}" if charts.get('signal_summary') else ''
+            'trading_plans': stock_data.get('trading_plans', [])
         }
         
+        # 長期価格変動・移動平均・テクニカル指標
+        report_data.update(format_fields(indicators, _INDICATOR_FIELDS))
+        
+        # チャートパス（visualizerがレポートからの相対パスで返す）
+        report_data.update({
+            f'{name}_path': charts.get(name, '')
+            for name in ('price_chart', 'technical_chart', 'signal_summary')
+        })
+        
         # CSSクラスの設定
-        report_data.update(self._get_css_classes(report_data))
+        # （整形前の数値で判定する。整形済みの文字列では常に中立になるため）
+        report_data.update(self._get_css_classes(indicators, signals))
         
         # 長期RSIの解釈
         rsi_26_value = indicators.get('rsi_26')
@@ -214,103 +293,63 @@ class LongTermStockReportGenerator:
         
         return report_data
     
-    def _get_css_classes(self, report_data: Dict) -> Dict:
-        """CSSクラスを設定"""
+    def _get_css_classes(self, indicators: Dict, signals: Dict) -> Dict:
+        """分析結果の指標値・シグナルからCSSクラスを設定"""
         classes = {}
         
         # 総合評価クラス
-        overall_signal = report_data.get('overall_signal', '')
-        if '買い' in overall_signal:
-            classes['overall_signal_class'] = 'signal-buy'
-        elif '売り' in overall_signal:
-            classes['overall_signal_class'] = 'signal-sell'
-        else:
-            classes['overall_signal_class'] = 'signal-neutral'
+        classes['overall_signal_class'] = _OVERALL_SIGNAL_CLASSIFIER(signals.get('overall_signal', ''))
         
         # 長期価格変動クラス
-        for period in ['50d', '100d', '200d', '1y']:
-            change = report_data.get(f'price_change_{period}', 0)
-            if isinstance(change, (int, float)):
-                if change > 0:
-                    classes[f'price_change_{period}_class'] = 'signal-buy'
-                elif change < 0:
-                    classes[f'price_change_{period}_class'] = 'signal-sell'
-                else:
-                    classes[f'price_change_{period}_class'] = 'signal-neutral'
-            else:
-                classes[f'price_change_{period}_class'] = 'signal-neutral'
+        periods = ['50d', '100d', '200d', '1y']
+        changes = (indicators.get(f'price_change_{period}') for period in periods)
+        for period, css_class in zip(periods, sign_classes(changes)):
+            classes[f'price_change_{period}_class'] = css_class
         
-        # 長期RSIクラス
-        rsi_26 = report_data.get('rsi_26')
-        if isinstance(rsi_26, (int, float)):
-            if rsi_26 > 70:
-                classes['rsi_class'] = 'signal-sell'
-            elif rsi_26 < 30:
-                classes['rsi_class'] = 'signal-buy'
-            else:
-                classes['rsi_class'] = 'signal-neutral'
-        else:
-            classes['rsi_class'] = 'signal-neutral'
-        
-        # 長期ストキャスティクスクラス
-        for indicator in ['stoch_k_26', 'stoch_d_26']:
-            value = report_data.get(indicator)
-            if isinstance(value, (int, float)):
-                if value > 80:
-                    classes[f'{indicator}_class'] = 'signal-sell'
-                elif value < 20:
-                    classes[f'{indicator}_class'] = 'signal-buy'
-                else:
-                    classes[f'{indicator}_class'] = 'signal-neutral'
-            else:
-                classes[f'{indicator}_class'] = 'signal-neutral'
+        # 長期RSI（30/70）・ストキャスティクス（20/80）クラス
+        oscillators = ['rsi_26', 'stoch_k_26', 'stoch_d_26']
+        oscillator_classes = threshold_classes(
+            (indicators.get(indicator) for indicator in oscillators), (30, 20, 20), (70, 80, 80)
+        )
+        classes['rsi_class'], classes['stoch_k_26_class'], classes['stoch_d_26_class'] = oscillator_classes
         
         # 長期シグナルクラス
         for signal in ['trend_signal', 'rsi_signal', 'macd_signal', 'bb_signal', 'trend_strength_signal']:
-            value = report_data.get(signal, '')
-            if '買い' in str(value) or '強気' in str(value) or '強い上昇' in str(value):
-                classes[f'{signal}_class'] = 'signal-buy'
-            elif '売り' in str(value) or '弱気' in str(value) or '強い下降' in str(value):
-                classes[f'{signal}_class'] = 'signal-sell'
-            else:
-                classes[f'{signal}_class'] = 'signal-neutral'
+            classes[f'{signal}_class'] = _SIGNAL_CLASSIFIER(signals.get(signal, ''))
         
         return classes
     
     def _format_number(self, value, decimals: int = 0) -> str:
         """数値をフォーマット"""
-        if value is None:
-            return '不明'
-        try:
-            if decimals == 0:
-                return f"{int(value):,}"
-            else:
-                return f"{float(value):.{decimals}f}"
-        except (ValueError, TypeError):
-            return '不明'
+        return format_number(value, decimals)
     
     def _format_percentage(self, value, decimals: int = 2) -> str:
         """パーセンテージをフォーマット"""
-        if value is None:
-            return '不明'
-        try:
-            return f"{float(value):.{decimals}f}%"
-        except (ValueError, TypeError):
-            return '不明'
+        return format_percentage(value, decimals)
     
     def _render_html_template(self, report_data: Dict) -> str:
         """HTMLテンプレートをレンダリング"""
         try:
-            template = self.template_env.get_template('long_term_template.html')
+            template = self._template or self.template_env.get_template('long_term_template.html')
             return template.render(**report_data)
         except Exception as e:
             logger.error(f"HTMLテンプレートのレンダリング中にエラー: {e}")
             return f"<html><body><h1>エラー: テンプレートのレンダリングに失敗しました</h1><p>{e}</p></body></html>"
     
+    def _generate_reports(self, target_stocks: List[str]) -> Dict[str, bool]:
+        """対象銘柄の長期レポートを生成し、銘柄ごとの成否を返す（チャンクごとにワーカープロセスで並列に生成）"""
+        return generate_reports(
+            self, target_stocks,
+            worker_kwargs={'output_dir': self.output_dir, 'cache_dir': self.report_cache.cache_dir, 'max_workers': 1},
+            fetch_bulk=self._fetch_stocks_data_bulk,
+            generate_single=self.generate_single_report,
+            label='長期レポート'
+        )
+    
     def generate_all_reports(self) -> Dict:
         """すべての対象銘柄の長期レポートを生成"""
         logger.info("=== 長期銘柄レポート生成開始 ===")
-        start_time = datetime.now()
+        start_time = time.perf_counter()
         
         try:
             # 対象銘柄の取得
@@ -321,19 +360,23 @@ class LongTermStockReportGenerator:
             
             logger.info(f"対象銘柄数: {len(target_stocks)}")
             
-            # 各銘柄の長期レポート生成
-            success_count = 0
-            failed_stocks = []
+            # 株価が更新されていない銘柄は既存のレポートをそのまま使う
+            fresh_stocks = set()
+            if self.skip_unchanged:
+                fresh_stocks = find_fresh_reports(
+                    self.output_dir, self.data_fetcher.get_last_price_updates(target_stocks)
+                )
+                if fresh_stocks:
+                    logger.info(f"株価が更新されていないため長期レポート生成をスキップ: {len(fresh_stocks)}銘柄")
             
-            for stock_code in target_stocks:
-                if self.generate_single_report(stock_code):
-                    success_count += 1
-                else:
-                    failed_stocks.append(stock_code)
+            # 各銘柄の長期レポート生成（銘柄ごとに独立しているためプロセス並列で実行）
+            results = dict.fromkeys(fresh_stocks, True)
+            results.update(self._generate_reports([code for code in target_stocks if code not in fresh_stocks]))
+            success_count = sum(results.values())
+            failed_stocks = [code for code in target_stocks if not results[code]]
             
             # 実行結果のサマリー
-            end_time = datetime.now()
-            execution_time = (end_time - start_time).total_seconds()
+            execution_time = time.perf_counter() - start_time
             
             summary = {
                 'success': True,
@@ -356,8 +399,7 @@ class LongTermStockReportGenerator:
             
             # サマリーファイルを保存
             summary_file = os.path.join(self.output_dir, "generation_summary.json")
-            with open(summary_file, 'w', encoding='utf-8') as f:
-                json.dump(summary, f, ensure_ascii=False, indent=2)
+            write_json(summary_file, summary)
             
             logger.info(f"サマリーファイルを保存: {summary_file}")
             
@@ -367,11 +409,20 @@ class LongTermStockReportGenerator:
             logger.error(f"長期レポート生成中にエラー: {e}")
             return {'success': False, 'message': str(e)}
 
-def main():
+def parse_args(argv: List[str] = None) -> argparse.Namespace:
+    """コマンドライン引数を解析"""
+    parser = argparse.ArgumentParser(description='長期レポート生成')
+    parser.add_argument('--force', action='store_true',
+                        help='生成済みで最新のレポートも再生成する')
+    return parser.parse_args(argv)
+
+def main(argv: List[str] = None):
     """メイン処理"""
     try:
+        args = parse_args(argv)
+        
         # 長期レポート生成器の初期化
-        generator = LongTermStockReportGenerator()
+        generator = LongTermStockReportGenerator(skip_unchanged=not args.force)
         
         # すべての長期レポートを生成
         result = generator.generate_all_reports()
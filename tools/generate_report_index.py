@@ -7,34 +7,78 @@
 import sys
 import os
 import logging
-import json
+import time
+from dataclasses import asdict, dataclass
 from datetime import datetime
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 import jinja2
+import numpy as np
+import pandas as pd
 
-# モジュールのパスを追加
-sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from tools.report_generator.data_fetcher import DataFetcher
+from tools.report_generator.analyzer import StockAnalyzer
+from tools.report_generator.long_term_analyzer import LongTermStockAnalyzer
+from tools.report_generator.report_cache import ReportCache, REPORT_CACHE_DIR, SUMMARY_PRICE_ROWS
+from tools.report_generator.template_env import create_template_env
+from tools.report_generator.css_classes import SignalClassifier, sign_classes
+from tools.report_generator.file_writer import write_text_file
+from tools.report_generator.formatters import format_number, format_percentage
+from tools.report_generator.logging_setup import setup_queue_logging
+from tools.report_generator.worker_pool import run_chunks_in_processes, split_chunks
 
-from report_generator.data_fetcher import DataFetcher
-from report_generator.analyzer import StockAnalyzer
-from report_generator.long_term_analyzer import LongTermStockAnalyzer
-
-# ロギング設定
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(sys.stdout),
-        logging.FileHandler('report_index_generation.log', encoding='utf-8')
-    ]
-)
+# ロギング設定（ファイルへはバックグラウンドスレッドからまとめて書き出す）
+log_listener = setup_queue_logging('report_index_generation.log')
 logger = logging.getLogger(__name__)
 
+# 短期・長期シグナルのCSSクラス判定
+_SIGNAL_CLASSIFIER = SignalClassifier()
+
+@dataclass(slots=True)
+class StockSummary:
+    """一覧ページに表示する銘柄ごとのサマリー"""
+    stock_code: str
+    stock_name: str
+    industry: str
+    market: str
+    current_price: Optional[float]
+    price_change_1d: Optional[float]
+    price_change_5d: Optional[float]
+    price_change_20d: Optional[float]
+    short_term_signal: str
+    long_term_signal: str
+    short_term_buy_count: int
+    short_term_sell_count: int
+    long_term_buy_count: int
+    long_term_sell_count: int
+    has_long_term_analysis: bool
+    data_points: int
+    
+    # CSSクラス
+    short_term_signal_class: str = ''
+    long_term_signal_class: str = ''
+    price_change_1d_class: str = ''
+    price_change_5d_class: str = ''
+    price_change_20d_class: str = ''
+    
+    # 表示用にフォーマットした値
+    current_price_formatted: str = ''
+    price_change_1d_formatted: str = ''
+    price_change_5d_formatted: str = ''
+    price_change_20d_formatted: str = ''
+
 class ReportIndexGenerator:
     """レポート一覧ページ生成クラス"""
     
-    def __init__(self, output_dir: str = "reports"):
+    def __init__(self, output_dir: str = "reports", cache_dir: str = REPORT_CACHE_DIR,
+                 max_workers: Optional[int] = None):
+        """
+        Args:
+            output_dir: 一覧ページの出力先
+            cache_dir: レポート生成時の分析結果キャッシュの保存先
+            max_workers: サマリー作成に使うプロセス数（Noneの場合はCPUコア数、1以下は逐次実行）
+        """
         self.output_dir = output_dir
+        self.max_workers = max_workers if max_workers is not None else (os.cpu_count() or 1)
         self.short_term_dir = os.path.join(output_dir, "short_term")
         self.long_term_dir = os.path.join(output_dir, "long_term")
         
@@ -42,18 +86,23 @@ class ReportIndexGenerator:
         self.data_fetcher = DataFetcher()
         self.short_term_analyzer = StockAnalyzer()
         self.long_term_analyzer = LongTermStockAnalyzer()
+        self.report_cache = ReportCache(cache_dir)
         
-        # Jinja2テンプレート環境の設定
-        template_dir = os.path.join(os.path.dirname(__file__), "report_generator")
-        self.template_env = jinja2.Environment(
-            loader=jinja2.FileSystemLoader(template_dir),
-            autoescape=True
-        )
+        # Jinja2テンプレート環境の設定（テンプレートは一度だけ読み込み、全件のレンダリングで使い回す）
+        self.template_env = create_template_env()
+        try:
+            self._template = self.template_env.get_template('index_template.html')
+        except jinja2.TemplateError as e:
+            logger.error(f"HTMLテンプレートの読み込みに失敗しました: {e}")
+            self._template = None
     
-    def get_stock_summary_data(self, stock_code: str) -> Optional[Dict]:
+    def get_stock_summary_data(self, stock_code: str) -> Optional[StockSummary]:
         """銘柄のサマリーデータを取得"""
         try:
-            # データ取得
+            # データ取得（株価履歴がない銘柄は関連データを取得せずに終了）
+            if not self.data_fetcher.has_sufficient_price_data(stock_code):
+                logger.warning(f"銘柄 {stock_code} の株価データがありません")
+                return None
             stock_data = self.data_fetcher.get_all_stock_data(stock_code)
             
             # 基本情報
@@ -64,17 +113,31 @@ class ReportIndexGenerator:
                 logger.warning(f"銘柄 {stock_code} の株価データがありません")
                 return None
             
+            # 終値配列（現在価格と価格変動率で共有し、pandasの位置参照を繰り返さない）
+            closes = price_history['close_price'].to_numpy(dtype=float)
+            
             # 現在価格
-            current_price = price_history['close_price'].iloc[-1] if len(price_history) > 0 else None
+            current_price = closes[-1] if len(closes) > 0 else None
             
-            # 短期分析
-            short_term_analysis = self.short_term_analyzer.analyze_stock(stock_data)
-            short_term_signals = short_term_analysis.get('signals', {}) if short_term_analysis else {}
+            # 短期分析（レポート生成時のキャッシュがあれば再分析しない）
+            cached = self.report_cache.load(stock_code, 'short_term', price_history)
+            if cached is not None:
+                short_term_signals = cached.get('signals', {})
+            else:
+                short_term_analysis = self.short_term_analyzer.analyze_stock(stock_data)
+                short_term_signals = short_term_analysis.get('signals', {}) if short_term_analysis else {}
+                if short_term_analysis:
+                    self.report_cache.save(stock_code, 'short_term', price_history, {'signals': short_term_signals})
             
             # 長期分析（データが十分な場合のみ）
             long_term_analysis = None
             long_term_signals = {}
-            if len(price_history) >= 200:
+            # （長期レポートの5年分のデータによる分析結果を、直近SUMMARY_PRICE_ROWS件のキーで照合）
+            cached = self.report_cache.load(stock_code, 'long_term', price_history, key_rows=SUMMARY_PRICE_ROWS)
+            if cached is not None:
+                long_term_analysis = cached
+                long_term_signals = cached.get('signals', {})
+            elif len(price_history) >= 200:
                 # stock_infoを準備
                 stock_info = {
                     'stock_code': stock_code,
@@ -84,11 +147,13 @@ class ReportIndexGenerator:
                 }
                 long_term_analysis = self.long_term_analyzer.analyze_long_term_stock(price_history, stock_info)
                 long_term_signals = long_term_analysis.get('signals', {}) if long_term_analysis else {}
+                if long_term_analysis:
+                    # 長期レポート生成時に5年分のデータで上書きされる
+                    self.report_cache.save(stock_code, 'long_term', price_history, {'signals': long_term_signals},
+                                           key_rows=SUMMARY_PRICE_ROWS)
             
             # 価格変動計算
-            price_change_1d = self._calculate_price_change(price_history, 1)
-            price_change_5d = self._calculate_price_change(price_history, 5)
-            price_change_20d = self._calculate_price_change(price_history, 20)
+            price_changes = self._calculate_price_changes_bulk(closes)
             
             summary_data = {
                 'stock_code': stock_code,
@@ -96,9 +161,9 @@ class ReportIndexGenerator:
                 'industry': basic_info.get('industry', '不明'),
                 'market': basic_info.get('market', '不明'),
                 'current_price': current_price,
-                'price_change_1d': price_change_1d,
-                'price_change_5d': price_change_5d,
-                'price_change_20d': price_change_20d,
+                'price_change_1d': price_changes[1],
+                'price_change_5d': price_changes[5],
+                'price_change_20d': price_changes[20],
                 'short_term_signal': short_term_signals.get('overall_signal', '不明'),
                 'long_term_signal': long_term_signals.get('overall_signal', '不明'),
                 'short_term_buy_count': short_term_signals.get('buy_count', 0),
@@ -112,90 +177,89 @@ class ReportIndexGenerator:
             # CSSクラスの設定
             summary_data.update(self._get_summary_css_classes(summary_data))
             
-            return summary_data
+            return StockSummary(**summary_data)
             
         except Exception as e:
             logger.error(f"銘柄 {stock_code} のサマリーデータ取得中にエラー: {e}")
             return None
     
-    def _calculate_price_change(self, price_history, period: int) -> Optional[float]:
-        """価格変動率を計算"""
+    def _collect_summaries(self, target_stocks: List[str]) -> Dict[str, Optional[StockSummary]]:
+        """銘柄をチャンクごとにワーカープロセスに割り当ててサマリーを作成
+        
+        銘柄ごとの分析は独立しているため、複数プロセスで並列に実行する。
+        """
+        chunks = split_chunks(target_stocks)
+        
+        workers = min(self.max_workers, len(chunks))
+        if workers <= 1:
+            return {stock_code: self.get_stock_summary_data(stock_code) for stock_code in target_stocks}
+        
+        summaries = {}
+        worker_kwargs = {'output_dir': self.output_dir, 'cache_dir': self.report_cache.cache_dir, 'max_workers': 1}
+        for _, chunk_summaries in run_chunks_in_processes(ReportIndexGenerator, worker_kwargs,
+                                                          '_collect_summary_dicts', chunks, workers):
+            for stock_code, summary_data in chunk_summaries.items():
+                summaries[stock_code] = StockSummary(**summary_data) if summary_data else None
+        return summaries
+    
+    def _collect_summary_dicts(self, stock_codes: List[str]) -> Dict[str, Optional[Dict]]:
+        """銘柄チャンクのサマリーを作成（ワーカープロセスから親プロセスへは辞書で返す）"""
+        summaries = {}
+        for stock_code in stock_codes:
+            summary = self.get_stock_summary_data(stock_code)
+            summaries[stock_code] = asdict(summary) if summary else None
+        return summaries
+    
+    def _calculate_price_changes_bulk(self, closes: np.ndarray,
+                                      periods: Tuple[int, ...] = (1, 5, 20)) -> Dict[int, Optional[float]]:
+        """複数期間の価格変動率を終値配列から一括計算（データ不足・基準価格0の期間はNone）"""
+        changes = dict.fromkeys(periods)
         try:
-            if len(price_history) < period + 1:
-                return None
+            period_array = np.asarray(periods)
+            available = period_array < len(closes)
+            if not available.any():
+                return changes
             
-            current_price = price_history['close_price'].iloc[-1]
-            past_price = price_history['close_price'].iloc[-period-1]
+            past_prices = closes[-period_array[available] - 1]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                pcts = np.where(past_prices == 0, np.nan, (closes[-1] - past_prices) / past_prices * 100)
             
-            if past_price == 0:
-                return None
-            
-            return ((current_price - past_price) / past_price) * 100
+            for period, pct in zip(period_array[available].tolist(), pcts.tolist()):
+                changes[period] = None if np.isnan(pct) else pct
+            return changes
         except Exception:
-            return None
+            return changes
     
     def _get_summary_css_classes(self, summary_data: Dict) -> Dict:
         """サマリーデータ用CSSクラスを設定"""
         classes = {}
         
         # 短期シグナルクラス
-        short_term_signal = summary_data.get('short_term_signal', '')
-        if '買い' in short_term_signal:
-            classes['short_term_signal_class'] = 'signal-buy'
-        elif '売り' in short_term_signal:
-            classes['short_term_signal_class'] = 'signal-sell'
-        else:
-            classes['short_term_signal_class'] = 'signal-neutral'
+        classes['short_term_signal_class'] = _SIGNAL_CLASSIFIER(summary_data.get('short_term_signal', ''))
         
         # 長期シグナルクラス
-        long_term_signal = summary_data.get('long_term_signal', '')
-        if '買い' in long_term_signal:
-            classes['long_term_signal_class'] = 'signal-buy'
-        elif '売り' in long_term_signal:
-            classes['long_term_signal_class'] = 'signal-sell'
-        else:
-            classes['long_term_signal_class'] = 'signal-neutral'
+        classes['long_term_signal_class'] = _SIGNAL_CLASSIFIER(summary_data.get('long_term_signal', ''))
         
         # 価格変動クラス
-        for period in ['1d', '5d', '20d']:
-            change = summary_data.get(f'price_change_{period}')
-            if change is not None:
-                if change > 0:
-                    classes[f'price_change_{period}_class'] = 'signal-buy'
-                elif change < 0:
-                    classes[f'price_change_{period}_class'] = 'signal-sell'
-                else:
-                    classes[f'price_change_{period}_class'] = 'signal-neutral'
-            else:
-                classes[f'price_change_{period}_class'] = 'signal-neutral'
+        periods = ['1d', '5d', '20d']
+        changes = (summary_data.get(f'price_change_{period}') for period in periods)
+        for period, css_class in zip(periods, sign_classes(changes)):
+            classes[f'price_change_{period}_class'] = css_class
         
         return classes
     
     def _format_number(self, value, decimals: int = 0) -> str:
         """数値をフォーマット"""
-        if value is None:
-            return '不明'
-        try:
-            if decimals == 0:
-                return f"{int(value):,}"
-            else:
-                return f"{float(value):.{decimals}f}"
-        except (ValueError, TypeError):
-            return '不明'
+        return format_number(value, decimals)
     
     def _format_percentage(self, value, decimals: int = 2) -> str:
         """パーセンテージをフォーマット"""
-        if value is None:
-            return '不明'
-        try:
-            return f"{float(value):.{decimals}f}%"
-        except (ValueError, TypeError):
-            return '不明'
+        return format_percentage(value, decimals)
     
     def _render_html_template(self, index_data: Dict) -> str:
         """HTMLテンプレートをレンダリング"""
         try:
-            template = self.template_env.get_template('index_template.html')
+            template = self._template or self.template_env.get_template('index_template.html')
             return template.render(**index_data)
         except Exception as e:
             logger.error(f"HTMLテンプレートのレンダリング中にエラー: {e}")
@@ -204,7 +268,7 @@ class ReportIndexGenerator:
     def generate_index_page(self) -> Dict:
         """一覧ページを生成"""
         logger.info("=== レポート一覧ページ生成開始 ===")
-        start_time = datetime.now()
+        start_time = time.perf_counter()
         
         try:
             # 対象銘柄の取得
@@ -219,26 +283,33 @@ class ReportIndexGenerator:
             stock_summaries = []
             failed_stocks = []
             
+            summaries = self._collect_summaries(target_stocks)
             for stock_code in target_stocks:
-                summary_data = self.get_stock_summary_data(stock_code)
-                if summary_data:
+                summary = summaries.get(stock_code)
+                if summary:
                     # 数値フォーマット
-                    summary_data['current_price_formatted'] = self._format_number(summary_data['current_price'])
-                    summary_data['price_change_1d_formatted'] = self._format_percentage(summary_data['price_change_1d'])
-                    summary_data['price_change_5d_formatted'] = self._format_percentage(summary_data['price_change_5d'])
-                    summary_data['price_change_20d_formatted'] = self._format_percentage(summary_data['price_change_20d'])
+                    summary.current_price_formatted = self._format_number(summary.current_price)
+                    summary.price_change_1d_formatted = self._format_percentage(summary.price_change_1d)
+                    summary.price_change_5d_formatted = self._format_percentage(summary.price_change_5d)
+                    summary.price_change_20d_formatted = self._format_percentage(summary.price_change_20d)
                     
-                    stock_summaries.append(summary_data)
+                    stock_summaries.append(summary)
                 else:
                     failed_stocks.append(stock_code)
             
             # 統計情報の計算
             total_stocks = len(target_stocks)
             successful_stocks = len(stock_summaries)
-            short_term_buy_signals = sum(1 for s in stock_summaries if '買い' in s.get('short_term_signal', ''))
-            short_term_sell_signals = sum(1 for s in stock_summaries if '売り' in s.get('short_term_signal', ''))
-            long_term_buy_signals = sum(1 for s in stock_summaries if '買い' in s.get('long_term_signal', ''))
-            long_term_sell_signals = sum(1 for s in stock_summaries if '売り' in s.get('long_term_signal', ''))
+            signals_df = pd.DataFrame({
+                'short_term_signal': [summary.short_term_signal for summary in stock_summaries],
+                'long_term_signal': [summary.long_term_signal for summary in stock_summaries]
+            }, dtype=object)
+            short_term = signals_df['short_term_signal'].fillna('').astype(str)
+            long_term = signals_df['long_term_signal'].fillna('').astype(str)
+            short_term_buy_signals = int(short_term.str.contains('買い', regex=False).sum())
+            short_term_sell_signals = int(short_term.str.contains('売り', regex=False).sum())
+            long_term_buy_signals = int(long_term.str.contains('買い', regex=False).sum())
+            long_term_sell_signals = int(long_term.str.contains('売り', regex=False).sum())
             
             # 一覧ページデータの準備
             index_data = {
@@ -260,12 +331,10 @@ class ReportIndexGenerator:
             
             # ファイル保存
             index_filename = os.path.join(self.output_dir, "index.html")
-            with open(index_filename, 'w', encoding='utf-8') as f:
-                f.write(html_content)
+            write_text_file(index_filename, html_content)
             
             # 実行結果のサマリー
-            end_time = datetime.now()
-            execution_time = (end_time - start_time).total_seconds()
+            execution_time = time.perf_counter() - start_time
             
             summary = {
                 'success': True,
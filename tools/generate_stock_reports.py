@@ -4,37 +4,75 @@
 portfolio_holdingsとtrading_plansにある銘柄を対象に短期トレード向け分析レポートを生成
 """
 
+import argparse
 import sys
 import os
 import logging
-import json
-from datetime import datetime
-from typing import Dict
+import time
+from typing import Dict, List, Optional, Tuple
 import jinja2
-# モジュールのパスを追加
-current_dir = os.path.dirname(os.path.abspath(__file__))
-sys.path.append(current_dir)
 
-from report_generator.data_fetcher import DataFetcher
-from report_generator.analyzer import StockAnalyzer
-from report_generator.visualizer import StockVisualizer
+from tools.report_generator.data_fetcher import DataFetcher
+from tools.report_generator.analyzer import StockAnalyzer, ANALYSIS_CACHE_VERSION
+from tools.report_generator.visualizer import StockVisualizer
+from tools.report_generator.report_cache import ReportCache, REPORT_CACHE_DIR
+from tools.report_generator.template_env import create_template_env
+from tools.report_generator.file_writer import find_fresh_reports, is_report_fresh, write_text_file
+from tools.report_generator.css_classes import SignalClassifier, sign_classes, threshold_classes
+from tools.report_generator.formatters import format_fields, format_number, format_percentage
+from tools.report_generator.json_writer import write_json
+from tools.report_generator.logging_setup import setup_queue_logging
+from tools.report_generator.worker_pool import generate_reports
 
-# ロギング設定
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(sys.stdout),
-        logging.FileHandler('stock_report_generation.log', encoding='utf-8')
-    ]
-)
+# ロギング設定（ファイルへはバックグラウンドスレッドからまとめて書き出す）
+log_listener = setup_queue_logging('stock_report_generation.log')
 logger = logging.getLogger(__name__)
 
+# 投資スタイル → レポートテンプレート（Noneは標準分析）
+STYLE_TEMPLATES = {
+    'day_trading': 'day_trading_template.html',
+    'swing_trading': 'swing_trading_template.html',
+    'long_term': 'long_term_investment_template.html',
+    None: 'template.html'
+}
+
+# 指標値の表示項目（キー, 書式種別, 小数桁数）
+_INDICATOR_FIELDS = (
+    # 価格変動
+    ('price_change_1d', 'percentage', 2),
+    ('price_change_5d', 'percentage', 2),
+    ('price_change_20d', 'percentage', 2),
+    # テクニカル指標
+    ('sma_5', 'number', 0),
+    ('sma_10', 'number', 0),
+    ('sma_20', 'number', 0),
+    ('sma_50', 'number', 0),
+    ('rsi_14', 'number', 2),
+    ('stoch_k', 'number', 2),
+    ('stoch_d', 'number', 2),
+    ('bb_upper', 'number', 0),
+    ('bb_lower', 'number', 0),
+    ('volatility_20d', 'percentage', 2),
+)
+
+# シグナルのCSSクラス判定
+_SIGNAL_CLASSIFIER = SignalClassifier()
+
 class StockReportGenerator:
     """株式レポート生成クラス"""
     
-    def __init__(self, output_dir: str = "reports"):
+    def __init__(self, output_dir: str = "reports", cache_dir: str = REPORT_CACHE_DIR,
+                 skip_unchanged: bool = True, max_workers: Optional[int] = None):
+        """
+        Args:
+            output_dir: レポートの出力先
+            cache_dir: 一覧ページと共有する分析結果キャッシュの保存先
+            skip_unchanged: 株価履歴の登録後に生成済みのレポートは再生成しない
+            max_workers: レポート生成に使うプロセス数（Noneの場合はCPUコア数、1以下は逐次実行）
+        """
         self.output_dir = output_dir
+        self.skip_unchanged = skip_unchanged
+        self.max_workers = max_workers if max_workers is not None else (os.cpu_count() or 1)
         self.images_dir = os.path.join(output_dir, "images")
         os.makedirs(self.output_dir, exist_ok=True)
         os.makedirs(self.images_dir, exist_ok=True)
@@ -42,38 +80,101 @@ class StockReportGenerator:
         # コンポーネントの初期化
         self.data_fetcher = DataFetcher()
         self.analyzer = StockAnalyzer()
-        self.visualizer = StockVisualizer(self.images_dir)
+        self.visualizer = StockVisualizer(self.images_dir, base_dir=output_dir)
+        self.report_cache = ReportCache(cache_dir)
         
-        # Jinja2テンプレート環境の設定
-        template_dir = os.path.join(os.path.dirname(__file__), "report_generator")
-        self.template_env = jinja2.Environment(
-            loader=jinja2.FileSystemLoader(template_dir),
-            autoescape=True
-        )
+        # Jinja2テンプレート環境の設定（読み込んだテンプレートは投資スタイルごとに使い回す）
+        self.template_env = create_template_env()
+        self._templates: Dict[Optional[str], jinja2.Template] = {}
     
-    def generate_single_report(self, stock_code: str, investment_style: str = None) -> bool:
-        """単一銘柄のレポートを生成"""
+    def generate_single_report(self, stock_code: str, investment_style: str = None,
+                               stock_data: Optional[Dict] = None) -> bool:
+        """単一銘柄のレポートを生成
+        
+        Args:
+            stock_code: 銘柄コード
+            investment_style: 投資スタイル（Noneの場合は標準分析）
+            stock_data: 一括取得済みの銘柄データ（Noneの場合はこの銘柄のみ取得）
+        """
+        # 株価履歴の登録後に生成済みの場合は分析・チャート描画を省略
+        if self.skip_unchanged and self._is_report_fresh(stock_code, investment_style):
+            logger.info(f"銘柄 {stock_code} のレポートは最新のため再生成しません")
+            return True
+        
+        report = self._build_report(stock_code, investment_style, stock_data)
+        if report is None:
+            return False
+        
+        report_filename, html_content = report
+        try:
+            write_text_file(report_filename, html_content)
+            logger.info(f"銘柄 {stock_code} のレポートを保存: {report_filename}")
+            return True
+        except Exception as e:
+            logger.error(f"銘柄 {stock_code} のレポート保存中にエラー: {e}")
+            return False
+    
+    def _report_filename(self, stock_code: str, investment_style: str = None) -> str:
+        """レポートの出力ファイル名（投資スタイル別はスタイルのサブディレクトリ）"""
+        if investment_style:
+            return os.path.join(self.output_dir, investment_style, f"{stock_code}.html")
+        return os.path.join(self.output_dir, f"{stock_code}.html")
+    
+    def _is_report_fresh(self, stock_code: str, investment_style: str = None) -> bool:
+        """レポートが株価履歴の最終登録日時より後に生成済みか"""
+        last_updates = self.data_fetcher.get_last_price_updates([stock_code])
+        return is_report_fresh(self._report_filename(stock_code, investment_style), last_updates.get(stock_code))
+    
+    def _build_reports(self, stock_codes: List[str]) -> Dict[str, Optional[Tuple[str, str]]]:
+        """銘柄チャンクのデータを一括取得し、銘柄ごとのレポートHTMLを作成"""
+        bulk_data = self.data_fetcher.get_all_stocks_data_bulk(stock_codes)
+        return {code: self._build_report(code, stock_data=bulk_data.get(code)) for code in stock_codes}
+    
+    def _build_report(self, stock_code: str, investment_style: str = None,
+                      stock_data: Optional[Dict] = None) -> Optional[Tuple[str, str]]:
+        """単一銘柄のレポートHTMLを作成
+        
+        Returns:
+            (出力ファイル名, HTML)。生成できない場合はNone
+        """
         try:
             logger.info(f"銘柄 {stock_code} のレポート生成開始（スタイル: {investment_style or '標準'}）")
             
-            # 1. データ取得
-            stock_data = self.data_fetcher.get_all_stock_data(stock_code)
+            # 1. データ取得（株価履歴がない銘柄は関連データを取得せずに終了）
+            if stock_data is None:
+                if not self.data_fetcher.has_sufficient_price_data(stock_code):
+                    logger.warning(f"銘柄 {stock_code} の株価データがありません")
+                    return None
+                stock_data = self.data_fetcher.get_all_stock_data(stock_code)
             
             # DataFrameの空チェックを修正
             price_history = stock_data.get('price_history')
             if price_history is None or (hasattr(price_history, 'empty') and price_history.empty):
                 logger.warning(f"銘柄 {stock_code} の株価データがありません")
-                return False
+                return None
             
             # 2. 分析実行（投資スタイル別または標準分析）
+            #    標準分析は最新の株価が前回と同じなら指標計算を省略してキャッシュを使う
+            #    （投資スタイル別分析は結果をDBへ保存するため毎回実行する）
+            cached_analysis = None
             if investment_style:
                 analysis_result = self.analyzer.analyze_stock_by_style(stock_data, investment_style)
             else:
-                analysis_result = self.analyzer.analyze_stock(stock_data)
+                cached_analysis = self.report_cache.load_analysis(
+                    stock_code, 'short_term_analysis', price_history, ANALYSIS_CACHE_VERSION
+                )
+                analysis_result = cached_analysis or self.analyzer.analyze_stock(stock_data)
                 
             if not analysis_result:
                 logger.warning(f"銘柄 {stock_code} の分析に失敗しました")
-                return False
+                return None
+            
+            # 一覧ページ・次回実行で再分析しないよう、標準分析の結果とシグナルをキャッシュ
+            if not investment_style and cached_analysis is None:
+                self.report_cache.save_analysis(stock_code, 'short_term_analysis', price_history,
+                                                ANALYSIS_CACHE_VERSION, analysis_result)
+                self.report_cache.save(stock_code, 'short_term', price_history,
+                                       {'signals': analysis_result.get('signals', {})})
             
             # 3. 可視化
             charts = self.visualizer.generate_all_charts(stock_data, analysis_result)
@@ -82,23 +183,16 @@ class StockReportGenerator:
             report_data = self._prepare_report_data(stock_data, analysis_result, charts)
             html_content = self._render_html_template(report_data, investment_style)
             
-            # 5. ファイル保存
+            # 5. 出力ファイル名
+            report_filename = self._report_filename(stock_code, investment_style)
             if investment_style:
-                style_dir = os.path.join(self.output_dir, investment_style)
-                os.makedirs(style_dir, exist_ok=True)
-                report_filename = os.path.join(style_dir, f"{stock_code}.html")
-            else:
-                report_filename = os.path.join(self.output_dir, f"{stock_code}.html")
-                
-            with open(report_filename, 'w', encoding='utf-8') as f:
-                f.write(html_content)
+                os.makedirs(os.path.dirname(report_filename), exist_ok=True)
             
-            logger.info(f"銘柄 {stock_code} のレポートを保存: {report_filename}")
-            return True
+            return report_filename, html_content
             
         except Exception as e:
             logger.error(f"銘柄 {stock_code} のレポート生成中にエラー: {e}")
-            return False
+            return None
     
     def _prepare_report_data(self, stock_data: Dict, analysis_result: Dict, charts: Dict) -> Dict:
         """レポート用データを準備"""
@@ -116,23 +210,6 @@ class StockReportGenerator:
             'analysis_date': analysis_result.get('analysis_date', '不明'),
             'current_price': self._format_number(analysis_result.get('current_price')),
             
-            # 価格変動
-            'price_change_1d': self._format_percentage(indicators.get('price_change_1d')),
-            'price_change_5d': self._format_percentage(indicators.get('price_change_5d')),
-            'price_change_20d': self._format_percentage(indicators.get('price_change_20d')),
-            
-            # テクニカル指標
-            'sma_5': self._format_number(indicators.get('sma_5')),
-            'sma_10': self._format_number(indicators.get('sma_10')),
-            'sma_20': self._format_number(indicators.get('sma_20')),
-            'sma_50': self._format_number(indicators.get('sma_50')),
-            'rsi_14': self._format_number(indicators.get('rsi_14'), 2),
-            'stoch_k': self._format_number(indicators.get('stoch_k'), 2),
-            'stoch_d': self._format_number(indicators.get('stoch_d'), 2),
-            'bb_upper': self._format_number(indicators.get('bb_upper')),
-            'bb_lower': self._format_number(indicators.get('bb_lower')),
-            'volatility_20d': self._format_percentage(indicators.get('volatility_20d'), 2),
-            
             # シグナル
             'rsi_signal': signals.get('rsi_signal', '不明'),
             'rsi_strength': signals.get('rsi_strength', '不明'),
@@ -145,16 +222,21 @@ class StockReportGenerator:
             
             # ポートフォリオ情報
             'portfolio_info': stock_data.get('portfolio_info', []),
-            'trading_plans': stock_data.get('trading_plans', []),
-            
-            # チャートパス（相対パスで指定）
-            'price_chart_path': f"images/{charts.get('price_chart', '').split('/')[-1]}" if charts.get('price_chart') else '',
-            'technical_chart_path': f"images/{charts.get('technical_chart', '').split('/')[-1]}" if charts.get('technical_chart') else '',
-            'signal_summary_path': f"images/{charts.get('signal_summary', '').split('/')[-1]}" if charts.get('signal_summary') else ''
+            'trading_plans': stock_data.get('trading_plans', [])
         }
         
+        # 価格変動・テクニカル指標
+        report_data.update(format_fields(indicators, _INDICATOR_FIELDS))
+        
+        # チャートパス（visualizerがレポートからの相対パスで返す）
+        report_data.update({
+            f'{name}_path': charts.get(name, '')
+            for name in ('price_chart', 'technical_chart', 'signal_summary')
+        })
+        
         # CSSクラスの設定
-        report_data.update(self._get_css_classes(report_data))
+        # （整形前の数値で判定する。整形済みの文字列では常に中立になるため）
+        report_data.update(self._get_css_classes(indicators, signals))
         
         # RSIの解釈
         rsi_value = indicators.get('rsi_14')
@@ -170,113 +252,66 @@ class StockReportGenerator:
         
         return report_data
     
-    def _get_css_classes(self, report_data: Dict) -> Dict:
-        """CSSクラスを設定"""
+    def _get_css_classes(self, indicators: Dict, signals: Dict) -> Dict:
+        """分析結果の指標値・シグナルからCSSクラスを設定"""
         classes = {}
         
         # 総合評価クラス
-        overall_signal = report_data.get('overall_signal', '')
-        if '買い' in overall_signal:
-            classes['overall_signal_class'] = 'signal-buy'
-        elif '売り' in overall_signal:
-            classes['overall_signal_class'] = 'signal-sell'
-        else:
-            classes['overall_signal_class'] = 'signal-neutral'
+        classes['overall_signal_class'] = _SIGNAL_CLASSIFIER(signals.get('overall_signal', ''))
         
         # 価格変動クラス
-        for period in ['1d', '5d', '20d']:
-            change = report_data.get(f'price_change_{period}', 0)
-            if isinstance(change, (int, float)):
-                if change > 0:
-                    classes[f'price_change_{period}_class'] = 'signal-buy'
-                elif change < 0:
-                    classes[f'price_change_{period}_class'] = 'signal-sell'
-                else:
-                    classes[f'price_change_{period}_class'] = 'signal-neutral'
-            else:
-                classes[f'price_change_{period}_class'] = 'signal-neutral'
-        
-        # RSIクラス
-        rsi = report_data.get('rsi_14')
-        if isinstance(rsi, (int, float)):
-            if rsi > 70:
-                classes['rsi_class'] = 'signal-sell'
-            elif rsi < 30:
-                classes['rsi_class'] = 'signal-buy'
-            else:
-                classes['rsi_class'] = 'signal-neutral'
-        else:
-            classes['rsi_class'] = 'signal-neutral'
+        periods = ['1d', '5d', '20d']
+        changes = (indicators.get(f'price_change_{period}') for period in periods)
+        for period, css_class in zip(periods, sign_classes(changes)):
+            classes[f'price_change_{period}_class'] = css_class
         
-        # ストキャスティクスクラス
-        for indicator in ['stoch_k', 'stoch_d']:
-            value = report_data.get(indicator)
-            if isinstance(value, (int, float)):
-                if value > 80:
-                    classes[f'{indicator}_class'] = 'signal-sell'
-                elif value < 20:
-                    classes[f'{indicator}_class'] = 'signal-buy'
-                else:
-                    classes[f'{indicator}_class'] = 'signal-neutral'
-            else:
-                classes[f'{indicator}_class'] = 'signal-neutral'
+        # RSI（30/70）・ストキャスティクス（20/80）クラス
+        oscillators = ['rsi_14', 'stoch_k', 'stoch_d']
+        oscillator_classes = threshold_classes(
+            (indicators.get(indicator) for indicator in oscillators), (30, 20, 20), (70, 80, 80)
+        )
+        classes['rsi_class'], classes['stoch_k_class'], classes['stoch_d_class'] = oscillator_classes
         
         # シグナルクラス
         for signal in ['rsi_signal', 'macd_signal', 'bb_signal', 'stoch_signal']:
-            value = report_data.get(signal, '')
-            if '買い' in str(value):
-                classes[f'{signal}_class'] = 'signal-buy'
-            elif '売り' in str(value):
-                classes[f'{signal}_class'] = 'signal-sell'
-            else:
-                classes[f'{signal}_class'] = 'signal-neutral'
+            classes[f'{signal}_class'] = _SIGNAL_CLASSIFIER(signals.get(signal, ''))
         
         return classes
     
     def _format_number(self, value, decimals: int = 0) -> str:
         """数値をフォーマット"""
-        if value is None:
-            return '不明'
-        try:
-            if decimals == 0:
-                return f"{int(value):,}"
-            else:
-                return f"{float(value):.{decimals}f}"
-        except (ValueError, TypeError):
-            return '不明'
+        return format_number(value, decimals)
     
     def _format_percentage(self, value, decimals: int = 2) -> str:
         """パーセンテージをフォーマット"""
-        if value is None:
-            return '不明'
-        try:
-            return f"{float(value):.{decimals}f}%"
-        except (ValueError, TypeError):
-            return '不明'
+        return format_percentage(value, decimals)
     
     def _render_html_template(self, report_data: Dict, investment_style: str = None) -> str:
         """HTMLテンプレートをレンダリング"""
         try:
-            # 投資スタイルに応じたテンプレートを選択
-            if investment_style == 'day_trading':
-                template_name = 'day_trading_template.html'
-            elif investment_style == 'swing_trading':
-                template_name = 'swing_trading_template.html'
-            elif investment_style == 'long_term':
-                template_name = 'long_term_investment_template.html'
-            else:
-                template_name = 'template.html'
-            
-            template = self.template_env.get_template(template_name)
+            # 投資スタイルに応じたテンプレートを選択（初回のみ読み込み）
+            template = self._templates.get(investment_style)
+            if template is None:
+                template_name = STYLE_TEMPLATES.get(investment_style, STYLE_TEMPLATES[None])
+                template = self._templates[investment_style] = self.template_env.get_template(template_name)
             return template.render(**report_data)
         except Exception as e:
             logger.error(f"HTMLテンプレートのレンダリング中にエラー: {e}")
             return f"<html><body><h1>エラー: テンプレートのレンダリングに失敗しました</h1><p>{e}</p></body></html>"
     
+    def _generate_reports(self, target_stocks: List[str]) -> Dict[str, bool]:
+        """対象銘柄のレポートを生成し、銘柄ごとの成否を返す（チャンクごとにワーカープロセスで並列に生成）"""
+        return generate_reports(
+            self, target_stocks,
+            worker_kwargs={'output_dir': self.output_dir, 'cache_dir': self.report_cache.cache_dir, 'max_workers': 1},
+            fetch_bulk=self.data_fetcher.get_all_stocks_data_bulk,
+            generate_single=lambda code, stock_data: self.generate_single_report(code, stock_data=stock_data)
+        )
+    
     def generate_all_reports(self) -> Dict:
         """すべての対象銘柄のレポートを生成"""
         logger.info("=== 銘柄レポート生成開始 ===")
-        start_time = datetime.now()
+        start_time = time.perf_counter()
         
         try:
             # 対象銘柄の取得
@@ -287,19 +322,23 @@ class StockReportGenerator:
             
             logger.info(f"対象銘柄数: {len(target_stocks)}")
             
-            # 各銘柄のレポート生成
-            success_count = 0
-            failed_stocks = []
+            # 株価が更新されていない銘柄は既存のレポートをそのまま使う
+            fresh_stocks = set()
+            if self.skip_unchanged:
+                fresh_stocks = find_fresh_reports(
+                    self.output_dir, self.data_fetcher.get_last_price_updates(target_stocks)
+                )
+                if fresh_stocks:
+                    logger.info(f"株価が更新されていないためレポート生成をスキップ: {len(fresh_stocks)}銘柄")
+            pending_stocks = [code for code in target_stocks if code not in fresh_stocks]
             
-            for stock_code in target_stocks:
-                if self.generate_single_report(stock_code):
-                    success_count += 1
-                else:
-                    failed_stocks.append(stock_code)
+            # 各銘柄のレポート生成（銘柄ごとに独立しているためプロセス並列で実行）
+            results = self._generate_reports(pending_stocks)
+            failed_stocks = [code for code in pending_stocks if not results.get(code)]
+            success_count = len(target_stocks) - len(failed_stocks)
             
             # 実行結果のサマリー
-            end_time = datetime.now()
-            execution_time = (end_time - start_time).total_seconds()
+            execution_time = time.perf_counter() - start_time
             
             summary = {
                 'success': True,
@@ -322,8 +361,7 @@ class StockReportGenerator:
             
             # サマリーファイルを保存
             summary_file = os.path.join(self.output_dir, "generation_summary.json")
-            with open(summary_file, 'w', encoding='utf-8') as f:
-                json.dump(summary, f, ensure_ascii=False, indent=2)
+            write_json(summary_file, summary)
             
             logger.info(f"サマリーファイルを保存: {summary_file}")
             
@@ -333,11 +371,20 @@ class StockReportGenerator:
             logger.error(f"レポート生成中にエラー: {e}")
             return {'success': False, 'message': str(e)}
 
-def main():
+def parse_args(argv: List[str] = None) -> argparse.Namespace:
+    """コマンドライン引数を解析"""
+    parser = argparse.ArgumentParser(description='短期レポート生成')
+    parser.add_argument('--force', action='store_true',
+                        help='生成済みで最新のレポートも再生成する')
+    return parser.parse_args(argv)
+
+def main(argv: List[str] = None):
     """メイン処理"""
     try:
+        args = parse_args(argv)
+        
         # レポート生成器の初期化
-        generator = StockReportGenerator()
+        generator = StockReportGenerator(skip_unchanged=not args.force)
         
         # すべてのレポートを生成
         result = generator.generate_all_reports()
@@ -5,15 +5,25 @@ portfolio_holdingsとtrading_plansの対象銘柄の株価履歴情報を取得
 
 import sys
 import os
+import csv
+import io
 import logging
 from datetime import datetime
-from typing import List, Optional
-from sqlalchemy import create_engine, Column, String, Integer, Numeric, Date, Text, TIMESTAMP, BigInteger
+from typing import Dict, List, Optional
+from sqlalchemy import create_engine, case, insert, update, text, Column, String, Integer, Numeric, Date, Text, TIMESTAMP, BigInteger, UniqueConstraint
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.orm import declarative_base, sessionmaker
 from sqlalchemy.orm import Session
 import yfinance as yf
+import numpy as np
 import pandas as pd
 
+try:
+    # yfinanceの依存パッケージ（yfinanceはrequests.Sessionを受け付けないためcurl_cffiのセッションを使う）
+    from curl_cffi import requests as curl_requests
+except ImportError:
+    curl_requests = None
+
 # ロギング設定
 logging.basicConfig(
     level=logging.INFO,
@@ -25,6 +35,23 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# yf.downloadで一度に取得する銘柄数
+DOWNLOAD_BATCH_SIZE = 50
+
+# 保存に使用する株価履歴の列
+PRICE_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+# 銘柄・日付の重複を防ぐユニークインデックス
+PRICE_HISTORY_UNIQUE_INDEX = 'uq_stock_prices_history_code_date'
+
+# 株価履歴の保存（COPY）対象の列
+PRICE_HISTORY_COLUMNS = (
+    'stock_code', 'price_date', 'open_price', 'high_price', 'low_price', 'close_price', 'volume', 'created_at'
+)
+
+# ON CONFLICTで重複を除外する場合のCOPY先（コミット時に空になる一時テーブル）
+PRICE_HISTORY_STAGING_TABLE = 'stock_prices_history_staging'
+
 # SQLAlchemy モデル定義
 Base = declarative_base()
 
@@ -60,6 +87,7 @@ class TradingPlan(Base):
 class StockPriceHistory(Base):
     """stock_prices_historyテーブルのORMモデル"""
     __tablename__ = 'stock_prices_history'
+    __table_args__ = (UniqueConstraint('stock_code', 'price_date', name=PRICE_HISTORY_UNIQUE_INDEX),)
     
     price_id = Column(Integer, primary_key=True)
     stock_code = Column(String(10))
@@ -84,23 +112,42 @@ def get_database_engine():
     engine = create_engine(database_url)
     return engine
 
+def ensure_price_history_unique_index(engine) -> bool:
+    """stock_prices_historyに(stock_code, price_date)のユニークインデックスを作成
+    
+    PostgreSQLでインデックスが利用できる場合のみTrueを返す
+    （既存データに重複がある場合などは作成に失敗し、既存日付の確認で重複を防ぐ）。
+    """
+    if engine.dialect.name != 'postgresql':
+        return False
+    
+    try:
+        with engine.begin() as conn:
+            conn.execute(text(
+                f"CREATE UNIQUE INDEX IF NOT EXISTS {PRICE_HISTORY_UNIQUE_INDEX} "
+                "ON stock_prices_history (stock_code, price_date)"
+            ))
+        return True
+    except Exception as e:
+        logger.warning(f"株価履歴のユニークインデックスを作成できないため、既存日付の確認で重複を防ぎます: {e}")
+        return False
+
 def get_unique_stock_codes(session: Session) -> List[str]:
     """portfolio_holdingsとtrading_plansからユニークな銘柄コードを取得"""
     try:
-        # portfolio_holdingsから銘柄コードを取得
-        portfolio_codes = session.query(PortfolioHolding.stock_code).distinct().all()
-        portfolio_codes = [code[0] for code in portfolio_codes]
-        
-        # trading_plansから銘柄コードを取得
-        trading_codes = session.query(TradingPlan.stock_code).distinct().all()
-        trading_codes = [code[0] for code in trading_codes]
-        
-        # 両方のリストを結合して重複を除去
-        all_codes = list(set(portfolio_codes + trading_codes))
+        # 両テーブルの銘柄コードをUNIONで結合し、重複除去はデータベース側で行う
+        rows = session.query(PortfolioHolding.stock_code).union(
+            session.query(TradingPlan.stock_code)
+        ).all()
+        all_codes = [row[0] for row in rows if row[0]]
         
         logger.info(f"ユニーク銘柄数: {len(all_codes)}")
-        logger.info(f"portfolio_holdings銘柄: {portfolio_codes}")
-        logger.info(f"trading_plans銘柄: {trading_codes}")
+        if logger.isEnabledFor(logging.DEBUG):
+            # テーブルごとの内訳はデバッグ時のみ取得
+            portfolio_codes = [code[0] for code in session.query(PortfolioHolding.stock_code).distinct()]
+            trading_codes = [code[0] for code in session.query(TradingPlan.stock_code).distinct()]
+            logger.debug(f"portfolio_holdings銘柄: {portfolio_codes}")
+            logger.debug(f"trading_plans銘柄: {trading_codes}")
         logger.info(f"処理対象銘柄: {all_codes}")
         return all_codes
         
@@ -113,14 +160,28 @@ def convert_to_yfinance_symbol(stock_code: str) -> str:
     # 日本株の場合、".T"を追加
     return f"{stock_code}.T"
 
-def get_stock_price_history(stock_code: str, period: str = "max") -> Optional[pd.DataFrame]:
-    """yfinanceを使用して株価履歴を取得（最大可能期間）"""
+def create_http_session():
+    """銘柄間でTCP/TLS接続を使い回すHTTPセッションを作成（作成できない場合はNoneでyfinanceの既定を使う）"""
+    if curl_requests is None:
+        return None
+    try:
+        return curl_requests.Session(impersonate="chrome")
+    except Exception as e:
+        logger.warning(f"HTTPセッションを作成できないため、yfinanceの既定のセッションを使用します: {e}")
+        return None
+
+def get_stock_price_history(stock_code: str, period: str = "max", http_session=None) -> Optional[pd.DataFrame]:
+    """yfinanceを使用して株価履歴を取得（最大可能期間）
+    
+    Args:
+        http_session: 銘柄間で共有するHTTPセッション（create_http_session）
+    """
     try:
         yfinance_symbol = convert_to_yfinance_symbol(stock_code)
         logger.info(f"株価履歴取得中: {stock_code} -> {yfinance_symbol} (期間: {period})")
         
         # yfinanceで株価履歴を取得（最大可能期間）
-        ticker = yf.Ticker(yfinance_symbol)
+        ticker = yf.Ticker(yfinance_symbol, session=http_session)
         hist_data = ticker.history(period=period)
         
         if hist_data.empty:
@@ -134,58 +195,164 @@ def get_stock_price_history(stock_code: str, period: str = "max") -> Optional[pd
         logger.error(f"{stock_code}の株価履歴取得中にエラー: {e}")
         return None
 
-def save_price_history(session: Session, stock_code: str, hist_data: pd.DataFrame) -> int:
-    """株価履歴データをデータベースに保存"""
-    try:
-        saved_count = 0
+def get_stock_price_histories(stock_codes: List[str], period: str = "max",
+                              http_session=None) -> Dict[str, pd.DataFrame]:
+    """yf.downloadで複数銘柄の株価履歴をまとめて取得（リクエストはyfinance内部のスレッドで並列実行）
+    
+    Args:
+        http_session: 銘柄間で共有するHTTPセッション（create_http_session）
+    
+    Returns:
+        銘柄コード → 株価履歴（取得できなかった銘柄は含まない）
+    """
+    histories = {}
+    for start in range(0, len(stock_codes), DOWNLOAD_BATCH_SIZE):
+        batch = stock_codes[start:start + DOWNLOAD_BATCH_SIZE]
+        symbols = {convert_to_yfinance_symbol(stock_code): stock_code for stock_code in batch}
+        try:
+            logger.info(f"株価履歴一括取得中: {len(symbols)}銘柄 (期間: {period})")
+            # Ticker.historyと同じく調整済み価格を取得
+            data = yf.download(list(symbols), period=period, group_by='ticker',
+                               threads=True, auto_adjust=True, progress=False, session=http_session)
+        except Exception as e:
+            logger.error(f"株価履歴の一括取得中にエラー: {e}")
+            continue
         
+        if data is None or data.empty:
+            continue
+        
+        for symbol, stock_code in symbols.items():
+            try:
+                if isinstance(data.columns, pd.MultiIndex):
+                    if symbol not in data.columns.get_level_values(0):
+                        continue
+                    hist_data = data[symbol]
+                else:
+                    hist_data = data
+                
+                # 他銘柄のみ取引のあった日付は全列が欠損になるため除外
+                hist_data = hist_data[PRICE_COLUMNS].dropna(how='all')
+                if hist_data.empty:
+                    continue
+                
+                histories[stock_code] = hist_data
+                logger.info(f"{stock_code}の株価履歴取得完了: {len(hist_data)}日分（{hist_data.index[0].date()} 〜 {hist_data.index[-1].date()}）")
+            except Exception as e:
+                logger.warning(f"{stock_code}の一括取得結果を読み込めませんでした: {e}")
+    
+    return histories
+
+def copy_price_rows(session: Session, rows: List[tuple], use_on_conflict: bool = False) -> int:
+    """株価履歴の行をPostgreSQLのCOPY FROM STDINで一括保存
+    
+    行はCSVにまとめて1回のCOPYで送る（psycopg・psycopg2のどちらのドライバでも利用可能）。
+    use_on_conflictがTrueの場合は一時テーブルにCOPYし、INSERT ... SELECT ... ON CONFLICT DO NOTHINGで移す。
+    コミットは呼び出し側で行う。
+    
+    Args:
+        rows: PRICE_HISTORY_COLUMNSの順の値のタプル
+    
+    Returns:
+        保存した件数
+    """
+    columns = ', '.join(PRICE_HISTORY_COLUMNS)
+    target_table = PRICE_HISTORY_STAGING_TABLE if use_on_conflict else StockPriceHistory.__tablename__
+    
+    if use_on_conflict:
+        session.execute(text(
+            f"CREATE TEMP TABLE IF NOT EXISTS {PRICE_HISTORY_STAGING_TABLE} ON COMMIT DELETE ROWS "
+            f"AS SELECT {columns} FROM {StockPriceHistory.__tablename__} WITH NO DATA"
+        ))
+    
+    # NoneはCSVの空欄（NULL）として書き出される
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    copy_sql = f"COPY {target_table} ({columns}) FROM STDIN WITH (FORMAT csv)"
+    
+    cursor = session.connection().connection.cursor()
+    try:
+        if hasattr(cursor, 'copy'):
+            # psycopg（バージョン3）
+            with cursor.copy(copy_sql) as copy:
+                copy.write(buffer.getvalue())
+        else:
+            # psycopg2
+            buffer.seek(0)
+            cursor.copy_expert(copy_sql, buffer)
+    finally:
+        cursor.close()
+    
+    if not use_on_conflict:
+        return len(rows)
+    
+    result = session.execute(text(
+        f"INSERT INTO {StockPriceHistory.__tablename__} ({columns}) "
+        f"SELECT {columns} FROM {PRICE_HISTORY_STAGING_TABLE} "
+        "ON CONFLICT (stock_code, price_date) DO NOTHING"
+    ))
+    # ON CONFLICTで除外された行は件数に含まれない
+    return result.rowcount
+
+def save_price_history(session: Session, stock_code: str, hist_data: pd.DataFrame,
+                       use_on_conflict: bool = False, use_copy: bool = False,
+                       created_at: Optional[datetime] = None) -> int:
+    """株価履歴データをデータベースに保存
+    
+    use_on_conflictがTrueの場合はON CONFLICT DO NOTHINGで重複をデータベース側で除外する。
+    それ以外は既存の日付を1回のクエリでまとめて取得し、新しい日付の行だけを保存する。
+    
+    Args:
+        use_on_conflict: ユニークインデックス（ensure_price_history_unique_index）が利用可能か
+        use_copy: PostgreSQLのCOPYで保存するか（FalseはINSERTで保存）
+        created_at: 保存する行の作成日時（Noneの場合は現在日時、インポート全体で共通の値を渡せる）
+    """
+    try:
         # 最新の日付と終値を取得
         latest_date = hist_data.index[-1].date()
         latest_close_price = float(hist_data.iloc[-1]['Close']) if pd.notna(hist_data.iloc[-1]['Close']) else None
         logger.info(f"{stock_code}の最新日付: {latest_date}, 最新終値: {latest_close_price}")
         
-        for date, row in hist_data.iterrows():
-            try:
-                # 既存データの確認（重複防止）
-                existing = session.query(StockPriceHistory).filter(
-                    StockPriceHistory.stock_code == stock_code,
-                    StockPriceHistory.price_date == date.date()
-                ).first()
-                
-                if existing:
-                    continue  # 既存データはスキップ
-                
-                # 新しいレコードを作成
-                price_record = StockPriceHistory(
-                    stock_code=stock_code,
-                    price_date=date.date(),
-                    open_price=float(row['Open']) if pd.notna(row['Open']) else None,
-                    high_price=float(row['High']) if pd.notna(row['High']) else None,
-                    low_price=float(row['Low']) if pd.notna(row['Low']) else None,
-                    close_price=float(row['Close']) if pd.notna(row['Close']) else None,
-                    volume=int(row['Volume']) if pd.notna(row['Volume']) else None,
-                    created_at=datetime.now()
+        # 既存データの日付（重複防止、ON CONFLICTを使う場合はデータベース側で除外）
+        existing_dates = set()
+        if not use_on_conflict:
+            existing_dates = {
+                price_date for (price_date,) in session.query(StockPriceHistory.price_date).filter(
+                    StockPriceHistory.stock_code == stock_code
                 )
-                
-                session.add(price_record)
-                saved_count += 1
-                
-            except Exception as e:
-                logger.error(f"{stock_code} {date.date()}のデータ保存中にエラー: {e}")
-                continue
+            }
         
-        # 最新の株価でportfolio_holdingsのcurrent_priceを更新
-        if latest_close_price is not None:
-            updated_count = session.query(PortfolioHolding).filter(
-                PortfolioHolding.stock_code == stock_code
-            ).update({
-                "current_price": latest_close_price,
-                "updated_at": datetime.now()
-            })
-            if updated_count > 0:
-                logger.info(f"{stock_code}のcurrent_priceを{latest_close_price}に更新しました ({updated_count}件)")
-            else:
-                logger.warning(f"{stock_code}のcurrent_price更新対象が見つかりませんでした")
+        # 欠損値(NaN)→Noneの変換は列単位でまとめて行う
+        prices = hist_data[['Open', 'High', 'Low', 'Close']].to_numpy(dtype=float)
+        volumes = hist_data['Volume'].to_numpy(dtype=float)
+        price_values = np.where(np.isnan(prices), None, prices).tolist()
+        volume_values = np.where(np.isnan(volumes), None, np.nan_to_num(volumes).astype(np.int64)).tolist()
+        
+        # 新しい行を作成（既存データはスキップ、列順はPRICE_HISTORY_COLUMNS）
+        if created_at is None:
+            created_at = datetime.now()
+        price_rows = [
+            (stock_code, price_date, open_price, high_price, low_price, close_price, volume, created_at)
+            for price_date, (open_price, high_price, low_price, close_price), volume
+            in zip(hist_data.index.date, price_values, volume_values)
+            if price_date not in existing_dates
+        ]
+        
+        saved_count = 0
+        if price_rows and use_copy:
+            saved_count = copy_price_rows(session, price_rows, use_on_conflict)
+        elif price_rows and use_on_conflict:
+            stmt = (
+                pg_insert(StockPriceHistory)
+                .on_conflict_do_nothing(index_elements=['stock_code', 'price_date'])
+                .returning(StockPriceHistory.price_date)
+            )
+            # RETURNINGは実際に挿入された行のみを返す
+            price_records = [dict(zip(PRICE_HISTORY_COLUMNS, row)) for row in price_rows]
+            saved_count = len(session.execute(stmt, price_records).all())
+        elif price_rows:
+            price_records = [dict(zip(PRICE_HISTORY_COLUMNS, row)) for row in price_rows]
+            session.execute(insert(StockPriceHistory), price_records)
+            saved_count = len(price_records)
         
         # バッチコミット
         session.commit()
@@ -196,6 +363,41 @@ def save_price_history(session: Session, stock_code: str, hist_data: pd.DataFram
         session.rollback()
         return 0
 
+def update_current_prices(session: Session, latest_prices: Dict[str, float],
+                          updated_at: Optional[datetime] = None) -> int:
+    """全銘柄の最新終値でportfolio_holdingsのcurrent_priceを1回のUPDATEで更新
+    
+    Args:
+        latest_prices: 銘柄コード → 最新終値
+        updated_at: 更新日時（Noneの場合は現在日時）
+    
+    Returns:
+        更新した保有レコード数
+    """
+    if not latest_prices:
+        return 0
+    
+    try:
+        stmt = (
+            update(PortfolioHolding)
+            .where(PortfolioHolding.stock_code.in_(list(latest_prices)))
+            .values(
+                current_price=case(latest_prices, value=PortfolioHolding.stock_code),
+                updated_at=updated_at if updated_at is not None else datetime.now()
+            )
+            .execution_options(synchronize_session=False)
+        )
+        updated_count = session.execute(stmt).rowcount
+        session.commit()
+        
+        logger.info(f"current_priceを更新しました: {updated_count}件（{len(latest_prices)}銘柄）")
+        return updated_count
+        
+    except Exception as e:
+        logger.error(f"current_priceの更新中にエラー: {e}")
+        session.rollback()
+        return 0
+
 def main():
     """メイン処理"""
     logger.info("=== 株価履歴情報インポート開始 ===")
@@ -206,6 +408,9 @@ def main():
         engine = get_database_engine()
         SessionLocal = sessionmaker(bind=engine)
         session = SessionLocal()
+        use_on_conflict = ensure_price_history_unique_index(engine)
+        # PostgreSQLではORMのINSERTではなくCOPYで一括保存
+        use_copy = engine.dialect.name == 'postgresql'
         
         # 1. 保有銘柄一覧の取得
         stock_codes = get_unique_stock_codes(session)
@@ -217,16 +422,33 @@ def main():
         total_saved = 0
         failed_stocks = []
         
+        # 株価履歴はまとめて取得（最大可能期間、接続は全銘柄で使い回す）
+        http_session = create_http_session()
+        histories = get_stock_price_histories(stock_codes, period="max", http_session=http_session)
+        
+        # current_price更新用の最新終値（全銘柄の保存後にまとめて更新）
+        latest_prices = {}
+        # 株価履歴の作成日時・current_priceの更新日時はインポート全体で共通
+        imported_at = datetime.now()
+        
         for stock_code in stock_codes:
             try:
-                # 株価履歴の取得（最大可能期間）
-                hist_data = get_stock_price_history(stock_code, period="max")
+                # 一括取得できなかった銘柄は個別に取得
+                hist_data = histories.get(stock_code)
+                if hist_data is None:
+                    hist_data = get_stock_price_history(stock_code, period="max", http_session=http_session)
                 
                 if hist_data is not None:
                     # データベースに保存
-                    saved_count = save_price_history(session, stock_code, hist_data)
+                    saved_count = save_price_history(
+                        session, stock_code, hist_data, use_on_conflict, use_copy, created_at=imported_at
+                    )
                     total_saved += saved_count
                     logger.info(f"{stock_code}: {saved_count}件の株価履歴を保存しました")
+                    
+                    latest_close_price = hist_data['Close'].iloc[-1]
+                    if pd.notna(latest_close_price):
+                        latest_prices[stock_code] = float(latest_close_price)
                 else:
                     failed_stocks.append(stock_code)
                     logger.warning(f"{stock_code}: 株価履歴の取得に失敗")
@@ -235,6 +457,9 @@ def main():
                 failed_stocks.append(stock_code)
                 logger.error(f"{stock_code}の処理中にエラー: {e}")
         
+        # 最新の株価でportfolio_holdingsのcurrent_priceを更新
+        update_current_prices(session, latest_prices, updated_at=imported_at)
+        
         # 3. 実行結果のサマリー
         end_time = datetime.now()
         execution_time = (end_time - start_time).total_seconds()
@@ -254,6 +479,8 @@ def main():
     finally:
         if 'session' in locals():
             session.close()
+        if locals().get('http_session') is not None:
+            http_session.close()
 
 if __name__ == "__main__":
     main()
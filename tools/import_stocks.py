@@ -108,6 +108,8 @@ def import_stocks_data_with_sqlalchemy():
         logger.info("データをデータベースに投入中...")
         batch_size = 1000
         total_inserted = 0
+        # 登録日時は全件で共通（行ごとにdatetime.now()を呼ばない）
+        imported_at = datetime.now()
         
         for i in range(0, len(processed_data), batch_size):
             batch = processed_data[i:i + batch_size]
@@ -125,8 +127,8 @@ def import_stocks_data_with_sqlalchemy():
                     industry_code_17=data['industry_code_17'],
                     scale_code=data['scale_code'],
                     scale_category=data['scale_category'],
-                    created_at=datetime.now(),
-                    updated_at=datetime.now()
+                    created_at=imported_at,
+                    updated_at=imported_at
                 )
                 stock_objects.append(stock)
             
@@ -0,0 +1 @@
+"""レポート生成・分析データ保存の共通モジュール"""
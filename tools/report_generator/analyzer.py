@@ -4,212 +4,581 @@
 短期トレード向けのテクニカル指標を計算
 """
 
+import hashlib
+import json
 import logging
+import threading
 import pandas as pd
 import numpy as np
-from typing import Dict, Optional, Tuple, List
-from datetime import datetime, timedelta
-import sys
-import os
+from sqlalchemy import Connection
+from collections import OrderedDict, deque
+from contextlib import nullcontext
+from dataclasses import asdict, dataclass
+from typing import Dict, NamedTuple, Optional, Tuple
 
-# モジュールのパスを追加
-sys.path.append(os.path.dirname(os.path.abspath(__file__)))
-from database_manager import AnalysisDataManager
+from .database_manager import AnalysisDataManager, INVESTMENT_STYLES
+from .formatters import current_timestamp
+from .indicator_kernels import (ANNUALIZATION_FACTOR, BB_SIGMA, LATEST_INDICATOR_NAMES, MACD_STATE_SIZE,
+                                advance_macd, latest_indicators_matrix, latest_macd_values, latest_price_changes,
+                                latest_smas, latest_wilder_rsi, macd, new_rsi_state, rolling_mean, rolling_mean_std,
+                                stochastic, wilder_rsi, wilder_rsi_arrays)
 
 logger = logging.getLogger(__name__)
 
+# 一括分析で扱う株価列
+PRICE_COLUMNS = ('close_price', 'high_price', 'low_price', 'volume')
+
+# 分析キャッシュのキーに含める株価列とバージョン（分析ロジック変更時に更新して既存キャッシュを無効化）
+FINGERPRINT_COLUMNS = ('open_price',) + PRICE_COLUMNS
+ANALYSIS_CACHE_VERSION = '2'
+
+# 一括計算の結果表でfloat32に丸めて保持する指標（0〜100のオシレーター・比率・変動率は有効数字7桁で十分）
+# 株価水準・出来高の指標は円単位・株数の精度を保つためfloat64のまま
+FLOAT32_INDICATORS = ('rsi_14', 'stoch_k', 'stoch_d', 'volume_ratio',
+                      'price_change_1d', 'price_change_5d', 'price_change_20d', 'volatility_20d')
+
+# シグナルの方向コードと表示名
+SIGNAL_BUY, SIGNAL_NEUTRAL, SIGNAL_SELL = 1, 0, -1
+_SIGNAL_LABELS = {SIGNAL_BUY: '買い', SIGNAL_NEUTRAL: '中立', SIGNAL_SELL: '売り'}
+_BB_SIGNAL_LABELS = {
+    SIGNAL_BUY: '買い（下方ブレイクアウト）', SIGNAL_NEUTRAL: '中立', SIGNAL_SELL: '売り（上方ブレイクアウト）'
+}
+_OVERALL_SIGNAL_LABELS = {SIGNAL_BUY: '買い推奨', SIGNAL_NEUTRAL: '中立', SIGNAL_SELL: '売り推奨'}
+
+# 逐次計算で保持する直近の足の本数（最長の集計期間である50日移動平均に必要な本数）
+STREAMING_TAIL_LENGTH = 50
+
+# 逐次計算の状態を保持する銘柄数の上限（超えた場合は最も長く使われていない銘柄から破棄）
+STREAMING_STATE_LIMIT = 256
+
+def compute_data_fingerprint(price_history: pd.DataFrame) -> str:
+    """株価データ（日付・OHLCV）の内容からキャッシュ照合用のハッシュを計算"""
+    digest = hashlib.blake2b(ANALYSIS_CACHE_VERSION.encode(), digest_size=16)
+    digest.update(price_history['price_date'].to_numpy(dtype='datetime64[ns]').tobytes())
+    digest.update(price_history[list(FINGERPRINT_COLUMNS)].to_numpy(dtype=np.float64).tobytes())
+    return digest.hexdigest()
+
+def _to_cache_value(value):
+    """キャッシュ保存用にJSONで表現できる値へ変換（Seriesは最新値のみ保持）"""
+    if isinstance(value, pd.Series):
+        value = value.iloc[-1] if not value.empty else None
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+@dataclass(slots=True, frozen=True)
+class TradingSignals:
+    """投資判断として保存するトレードシグナル"""
+    rsi_signal: Optional[str] = None
+    macd_signal: Optional[str] = None
+    bb_signal: Optional[str] = None
+    stoch_signal: Optional[str] = None
+    overall_signal: Optional[str] = None
+    buy_count: Optional[int] = None
+    sell_count: Optional[int] = None
+    
+    @classmethod
+    def from_dict(cls, signals: Dict) -> 'TradingSignals':
+        """シグナル辞書から生成"""
+        return cls(
+            rsi_signal=signals.get('rsi_signal'),
+            macd_signal=signals.get('macd_signal'),
+            bb_signal=signals.get('bb_signal'),
+            stoch_signal=signals.get('stoch_signal'),
+            overall_signal=signals.get('overall_signal'),
+            buy_count=signals.get('buy_count'),
+            sell_count=signals.get('sell_count')
+        )
+
+@dataclass(slots=True, frozen=True)
+class AnalysisResult:
+    """一括保存用の分析結果（analyze_batchの戻り値）"""
+    stock_code: str
+    investment_style: str
+    current_price: Optional[float]
+    indicators: Dict
+    signals: TradingSignals
+    confidence_score: Optional[float] = None
+    ai_reasoning: Optional[str] = None
+    risk_assessment: Optional[str] = None
+    target_price: Optional[float] = None
+    stop_loss: Optional[float] = None
+    
+    @classmethod
+    def from_dict(cls, analysis_result: Dict) -> 'AnalysisResult':
+        """analyze_stock_by_styleの戻り値（辞書）から生成"""
+        ai_analysis = analysis_result.get('ai_analysis', {})
+        return cls(
+            stock_code=analysis_result['stock_code'],
+            investment_style=analysis_result['investment_style'],
+            current_price=analysis_result.get('current_price'),
+            indicators=analysis_result.get('indicators', {}),
+            signals=TradingSignals.from_dict(analysis_result.get('signals', {})),
+            confidence_score=ai_analysis.get('confidence_score'),
+            ai_reasoning=ai_analysis.get('reasoning'),
+            risk_assessment=ai_analysis.get('risk_assessment'),
+            target_price=analysis_result.get('target_price'),
+            stop_loss=analysis_result.get('stop_loss')
+        )
+    
+    def to_decision_data(self) -> Dict:
+        """investment_decisionsに保存する判断データに変換"""
+        signals = self.signals
+        return {
+            'decision_type': 'analyze',
+            'target_price': self.target_price,
+            'stop_loss': self.stop_loss,
+            'confidence_score': self.confidence_score,
+            'rsi_signal': signals.rsi_signal,
+            'macd_signal': signals.macd_signal,
+            'bb_signal': signals.bb_signal,
+            'stoch_signal': signals.stoch_signal,
+            'overall_signal': signals.overall_signal,
+            'buy_count': signals.buy_count,
+            'sell_count': signals.sell_count,
+            'ai_reasoning': self.ai_reasoning,
+            'risk_assessment': self.risk_assessment
+        }
+    
+    def to_cache_json(self) -> str:
+        """分析キャッシュ保存用のJSON文字列に変換
+        
+        orjsonはNaNをnullに変換して信頼度スコアが変わるため、NaNを保持できる標準jsonを使用する。
+        """
+        return json.dumps({
+            'current_price': _to_cache_value(self.current_price),
+            'indicators': {key: _to_cache_value(value) for key, value in self.indicators.items()},
+            'signals': asdict(self.signals),
+            'confidence_score': _to_cache_value(self.confidence_score),
+            'ai_reasoning': self.ai_reasoning,
+            'risk_assessment': self.risk_assessment,
+            'target_price': _to_cache_value(self.target_price),
+            'stop_loss': _to_cache_value(self.stop_loss)
+        }, ensure_ascii=False)
+    
+    @classmethod
+    def from_cache_json(cls, stock_code: str, investment_style: str, result_json: str) -> 'AnalysisResult':
+        """分析キャッシュのJSON文字列から生成"""
+        data = json.loads(result_json)
+        return cls(
+            stock_code=stock_code,
+            investment_style=investment_style,
+            current_price=data.get('current_price'),
+            indicators=data.get('indicators', {}),
+            signals=TradingSignals.from_dict(data.get('signals', {})),
+            confidence_score=data.get('confidence_score'),
+            ai_reasoning=data.get('ai_reasoning'),
+            risk_assessment=data.get('risk_assessment'),
+            target_price=data.get('target_price'),
+            stop_loss=data.get('stop_loss')
+        )
+
+@dataclass(slots=True)
+class IndicatorState:
+    """銘柄ごとの逐次計算の状態（新しい足が届くたびに追加分だけを計算する）
+
+    EMA（MACD）は重み付き和、RSIはWilderの平滑化の累積値、それ以外の指標は直近の足のリングバッファから計算する。
+    欠損値を含む足は一括計算と同様に除外する。
+    row_count・tail_fingerprintは状態に反映済みの株価データの行数と末尾STREAMING_TAIL_LENGTH行のハッシュで、
+    期間の変更・直近の足の訂正を履歴の長さによらない手間で検出するために使う。
+    """
+    last_date: Optional[np.datetime64] = None
+    row_count: int = 0
+    tail_fingerprint: str = ''
+    bar_count: int = 0
+    macd_state: np.ndarray = None
+    macd_values: Tuple[float, float, float] = (np.nan, np.nan, np.nan)
+    rsi_state: np.ndarray = None
+    rsi_14: float = np.nan
+    closes: deque = None
+    highs: deque = None
+    lows: deque = None
+    volumes: deque = None
+    
+    def __post_init__(self):
+        if self.macd_state is None:
+            self.macd_state = np.zeros(MACD_STATE_SIZE)
+        if self.rsi_state is None:
+            self.rsi_state = new_rsi_state()
+        for name in ('closes', 'highs', 'lows', 'volumes'):
+            values = getattr(self, name)
+            setattr(self, name, deque(() if values is None else values, maxlen=STREAMING_TAIL_LENGTH))
+
+class PriceArrays(NamedTuple):
+    """株価データの各列（PRICE_COLUMNS）を連続したfloat64配列にまとめたもの
+    
+    分析の入口でDataFrameから一度だけ変換し、列ごとのSeries作成を繰り返さない。
+    """
+    close: np.ndarray
+    high: np.ndarray
+    low: np.ndarray
+    volume: np.ndarray
+
 class StockAnalyzer:
     """株式分析クラス"""
     
-    def __init__(self):
+    def __init__(self, db_manager: Optional[AnalysisDataManager] = None):
+        """
+        Args:
+            db_manager: 共有するデータ管理インスタンス（Noneの場合はDB保存時に作成）
+        """
         self.indicators = {}
-        self.db_manager = AnalysisDataManager()
+        self._db_manager = db_manager
+        # 銘柄コード → 逐次計算の状態（最近使った順。複数スレッドから呼ばれても壊れないようロックで保護）
+        self._state: 'OrderedDict[str, IndicatorState]' = OrderedDict()
+        self._state_lock = threading.Lock()
+    
+    @property
+    def db_manager(self) -> AnalysisDataManager:
+        """データ管理インスタンス（DB保存が必要になるまで接続を作らない）"""
+        if self._db_manager is None:
+            self._db_manager = AnalysisDataManager()
+        return self._db_manager
+    
+    def __getstate__(self) -> Dict:
+        """プロセスプールへ渡す際はDB接続を持ち込まない"""
+        state = self.__dict__.copy()
+        state['_db_manager'] = None
+        del state['_state'], state['_state_lock']
+        return state
     
-    def calculate_technical_indicators(self, price_data: pd.DataFrame) -> Dict:
-        """テクニカル指標を計算"""
+    def __setstate__(self, state: Dict):
+        """逐次計算の状態はプロセスごとに作り直す"""
+        self.__dict__.update(state)
+        self._state = OrderedDict()
+        self._state_lock = threading.Lock()
+    
+    def calculate_technical_indicators(self, price_data: pd.DataFrame, stock_code: Optional[str] = None) -> Dict:
+        """テクニカル指標を計算
+        
+        Args:
+            stock_code: 指定した場合は銘柄ごとの計算状態を保持し、
+                前回の呼び出し以降に追加された足だけを計算する（同じ銘柄へ足が順に届く呼び出し元向け。
+                保持する銘柄数はSTREAMING_STATE_LIMITまで）
+        """
         if price_data is None or price_data.empty:
             return {}
         
         try:
-            # 終値データを取得
-            close_prices = price_data['close_price'].dropna()
-            high_prices = price_data['high_price'].dropna()
-            low_prices = price_data['low_price'].dropna()
-            volumes = price_data['volume'].dropna()
+            if stock_code is not None and 'price_date' in price_data:
+                with self._state_lock:
+                    return self._indicators_from_state(self._sync_state(stock_code, price_data))
+            
+            return self._indicators_from_prices(self._price_arrays(price_data))
+            
+        except Exception as e:
+            logger.error(f"テクニカル指標計算中にエラー: {e}")
+            return {}
+    
+    def _indicators_from_prices(self, prices: PriceArrays) -> Dict:
+        """株価配列からテクニカル指標の最新値を計算"""
+        try:
+            # 最新値のみが必要なため、EMA以外は計算に必要な末尾の期間だけを集計
+            closes, highs, lows, volume_values = self._complete_bars(prices)
             
-            if len(close_prices) < 20:
+            if len(closes) < 20:
                 logger.warning("株価データが少なすぎます（20日以上必要）")
                 return {}
             
-            indicators = {}
-            
-            # 1. 移動平均
-            indicators['sma_5'] = self._calculate_sma(close_prices, 5)
-            indicators['sma_10'] = self._calculate_sma(close_prices, 10)
-            indicators['sma_20'] = self._calculate_sma(close_prices, 20)
-            indicators['sma_50'] = self._calculate_sma(close_prices, 50)
-            
-            # 2. RSI (相対力指数)
-            indicators['rsi_14'] = self._calculate_rsi(close_prices, 14)
-            
-            # 3. MACD (移動平均収束拡散)
-            macd_line, macd_signal, macd_histogram = self._calculate_macd(close_prices)
-            indicators['macd_line'] = macd_line
-            indicators['macd_signal'] = macd_signal
-            indicators['macd_histogram'] = macd_histogram
-            
-            # 4. ボリンジャーバンド
-            bb_upper, bb_middle, bb_lower = self._calculate_bollinger_bands(close_prices, 20)
-            indicators['bb_upper'] = bb_upper
-            indicators['bb_middle'] = bb_middle
-            indicators['bb_lower'] = bb_lower
-            
-            # 5. ストキャスティクス
-            stoch_k, stoch_d = self._calculate_stochastic(high_prices, low_prices, close_prices, 14, 3)
-            indicators['stoch_k'] = stoch_k
-            indicators['stoch_d'] = stoch_d
-            
-            # 6. 出来高分析
-            indicators['volume_sma_20'] = self._calculate_sma(volumes, 20)
-            indicators['volume_ratio'] = self._calculate_volume_ratio(volumes, 20)
-            
-            # 7. 価格変動分析
-            indicators['price_change_1d'] = self._calculate_price_change(close_prices, 1)
-            indicators['price_change_5d'] = self._calculate_price_change(close_prices, 5)
-            indicators['price_change_20d'] = self._calculate_price_change(close_prices, 20)
-            
-            # 8. ボラティリティ
-            indicators['volatility_20d'] = self._calculate_volatility(close_prices, 20)
-            
-            # 最新値のみを返す
-            latest_indicators = {}
-            for key, values in indicators.items():
-                if values is not None and len(values) > 0:
-                    latest_indicators[key] = values.iloc[-1] if hasattr(values, 'iloc') else values[-1]
-                else:
-                    latest_indicators[key] = None
+            # MACD・RSI (EMA・Wilderの平滑化は全期間の履歴に依存するため全期間を走査)
+            macd_values = latest_macd_values(closes, 12, 26, 9)
+            rsi_14 = self._latest_rsi(closes, 14)
             
-            return latest_indicators
+            return self._latest_indicators(closes, highs, lows, volume_values, macd_values, rsi_14)
             
         except Exception as e:
             logger.error(f"テクニカル指標計算中にエラー: {e}")
             return {}
     
+    def _sync_state(self, stock_code: str, price_data: pd.DataFrame) -> IndicatorState:
+        """保持している状態を株価データの最新の足まで進める（_state_lockを取得して呼び出す）
+        
+        前回の最新の足までの行数、または末尾STREAMING_TAIL_LENGTH行の内容が一致しない場合
+        （期間の変更・直近の足の訂正）は全期間から作り直す。
+        照合は行数と末尾の行だけで行うため、それより古い足の訂正は検出しない
+        （株式分割の調整などで過去の足を書き換えた場合は、stock_codeを指定せずに全期間から計算する）。
+        """
+        state = self._state.get(stock_code)
+        row_count = state.row_count if state is not None else 0
+        if 0 < row_count <= len(price_data):
+            # 列ごとの配列（コピーしないビュー）を1回だけ取り出し、照合と新しい足の計算で共用
+            columns = {column: price_data[column].to_numpy() for column in ('price_date', *FINGERPRINT_COLUMNS)}
+            if (columns['price_date'][row_count - 1] == state.last_date
+                    and self._tail_fingerprint(columns, row_count) == state.tail_fingerprint):
+                if row_count < len(price_data):
+                    self._advance_state(state, PriceArrays(*(columns[column][row_count:].astype(np.float64)
+                                                             for column in PRICE_COLUMNS)))
+                    state.last_date = columns['price_date'][-1]
+                    state.row_count = len(price_data)
+                    state.tail_fingerprint = self._tail_fingerprint(columns, len(price_data))
+                self._state.move_to_end(stock_code)
+                return state
+        
+        state = self._build_state(price_data)
+        self._state[stock_code] = state
+        self._state.move_to_end(stock_code)
+        while len(self._state) > STREAMING_STATE_LIMIT:
+            self._state.popitem(last=False)
+        return state
+    
+    @staticmethod
+    def _tail_fingerprint(columns: Dict[str, np.ndarray], end: int) -> str:
+        """先頭からend行目までのうち末尾STREAMING_TAIL_LENGTH行の日付・OHLCVのハッシュ"""
+        start = max(0, end - STREAMING_TAIL_LENGTH)
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(columns['price_date'][start:end].astype('datetime64[ns]').tobytes())
+        for column in FINGERPRINT_COLUMNS:
+            digest.update(columns[column][start:end].astype(np.float64).tobytes())
+        return digest.hexdigest()
+    
+    @staticmethod
+    def _price_arrays(price_data: pd.DataFrame) -> PriceArrays:
+        """株価データの各列を1回のto_numpyでまとめてfloat64配列に変換"""
+        values = price_data[list(PRICE_COLUMNS)].to_numpy(dtype=float)
+        # 転置をコピーして各列を連続したメモリに配置
+        return PriceArrays(*values.T.copy())
+    
+    @staticmethod
+    def _complete_bars(prices: PriceArrays) -> PriceArrays:
+        """終値・高値・安値・出来高のいずれかが欠損した足を除いた各列の配列を返す
+        
+        列ごとに欠損値を除外すると列間で足の位置がずれるため、1つのマスクでまとめて除外する。
+        """
+        complete = ~(np.isnan(prices.close) | np.isnan(prices.high) | np.isnan(prices.low) | np.isnan(prices.volume))
+        if complete.all():
+            return prices
+        return PriceArrays(*(values[complete] for values in prices))
+    
+    def _build_state(self, price_data: pd.DataFrame) -> IndicatorState:
+        """株価データの全期間から逐次計算の状態を作成"""
+        closes, highs, lows, volumes = self._complete_bars(self._price_arrays(price_data))
+        macd_state = np.zeros(MACD_STATE_SIZE)
+        macd_values = advance_macd(closes, 12, 26, 9, macd_state)
+        rsi_state = new_rsi_state()
+        rsi_values = wilder_rsi_arrays(closes, 14, rsi_state)
+        tail = -STREAMING_TAIL_LENGTH
+        columns = {column: price_data[column].to_numpy() for column in ('price_date', *FINGERPRINT_COLUMNS)}
+        return IndicatorState(
+            last_date=columns['price_date'][-1],
+            row_count=len(price_data),
+            tail_fingerprint=self._tail_fingerprint(columns, len(price_data)),
+            bar_count=len(closes),
+            macd_state=macd_state,
+            macd_values=macd_values,
+            rsi_state=rsi_state,
+            rsi_14=rsi_values[-1] if len(rsi_values) > 0 else np.nan,
+            closes=closes[tail:],
+            highs=highs[tail:],
+            lows=lows[tail:],
+            volumes=volumes[tail:]
+        )
+    
+    def _advance_state(self, state: IndicatorState, new_prices: PriceArrays) -> None:
+        """状態を追加された足の分だけ進める（欠損値を含む足は一括計算と同様に除外）"""
+        closes, highs, lows, volumes = self._complete_bars(new_prices)
+        if len(closes) == 0:
+            return
+        state.closes.extend(closes.tolist())
+        state.highs.extend(highs.tolist())
+        state.lows.extend(lows.tolist())
+        state.volumes.extend(volumes.tolist())
+        state.bar_count += len(closes)
+        state.macd_values = advance_macd(closes, 12, 26, 9, state.macd_state)
+        state.rsi_14 = wilder_rsi_arrays(closes, 14, state.rsi_state)[-1]
+    
+    def _indicators_from_state(self, state: IndicatorState) -> Dict:
+        """逐次計算の状態からテクニカル指標の最新値を計算"""
+        if state.bar_count < 20:
+            logger.warning("株価データが少なすぎます（20日以上必要）")
+            return {}
+        return self._latest_indicators(
+            np.array(state.closes), np.array(state.highs), np.array(state.lows),
+            np.array(state.volumes), state.macd_values, state.rsi_14
+        )
+    
+    def _latest_indicators(self, closes: np.ndarray, highs: np.ndarray, lows: np.ndarray,
+                           volume_values: np.ndarray, macd_values: Tuple[float, float, float],
+                           rsi_14: float) -> Dict:
+        """直近の足の配列とMACD・RSIの最新値からテクニカル指標をまとめる"""
+        indicators = {}
+        
+        # 1. 移動平均（末尾の累積和からまとめて計算、20日はボリンジャーバンドの中心線と共通）
+        bb_upper, bb_middle, bb_lower = self._latest_bollinger_bands(closes, 20)
+        sma_5, sma_10, sma_50 = latest_smas(closes, (5, 10, 50)).tolist()
+        indicators['sma_5'] = sma_5
+        indicators['sma_10'] = sma_10
+        indicators['sma_20'] = bb_middle
+        indicators['sma_50'] = sma_50
+        
+        # 2. RSI (相対力指数)
+        indicators['rsi_14'] = rsi_14
+        
+        # 3. MACD (移動平均収束拡散)
+        indicators['macd_line'], indicators['macd_signal'], indicators['macd_histogram'] = macd_values
+        
+        # 4. ボリンジャーバンド
+        indicators['bb_upper'] = bb_upper
+        indicators['bb_middle'] = bb_middle
+        indicators['bb_lower'] = bb_lower
+        
+        # 5. ストキャスティクス
+        stoch_k, stoch_d = self._latest_stochastic(highs, lows, closes, 14, 3)
+        indicators['stoch_k'] = stoch_k
+        indicators['stoch_d'] = stoch_d
+        
+        # 6. 出来高分析
+        # 出来高比率は出来高移動平均を再利用して計算
+        volume_sma_20 = self._latest_sma(volume_values, 20)
+        indicators['volume_sma_20'] = volume_sma_20
+        with np.errstate(divide='ignore', invalid='ignore'):
+            indicators['volume_ratio'] = float(np.float64(volume_values[-1]) / volume_sma_20)
+        
+        # 7. 価格変動分析
+        price_changes = latest_price_changes(closes, (1, 5, 20)).tolist()
+        indicators['price_change_1d'], indicators['price_change_5d'], indicators['price_change_20d'] = price_changes
+        
+        # 8. ボラティリティ
+        indicators['volatility_20d'] = self._latest_volatility(closes, 20)
+        
+        return indicators
+    
     def _calculate_sma(self, prices: pd.Series, period: int) -> pd.Series:
         """単純移動平均を計算"""
-        return prices.rolling(window=period).mean()
+        return rolling_mean(prices, period)
     
     def _calculate_rsi(self, prices: pd.Series, period: int = 14) -> pd.Series:
-        """RSIを計算"""
-        delta = prices.diff()
-        gain = (delta.where(delta > 0, 0)).rolling(window=period).mean()
-        loss = (-delta.where(delta < 0, 0)).rolling(window=period).mean()
-        rs = gain / loss
-        rsi = 100 - (100 / (1 + rs))
-        return rsi
+        """RSIを計算（Wilderの平滑化）"""
+        return wilder_rsi(prices, period)
     
     def _calculate_macd(self, prices: pd.Series) -> Tuple[pd.Series, pd.Series, pd.Series]:
         """MACDを計算"""
-        ema_12 = prices.ewm(span=12).mean()
-        ema_26 = prices.ewm(span=26).mean()
-        macd_line = ema_12 - ema_26
-        macd_signal = macd_line.ewm(span=9).mean()
-        macd_histogram = macd_line - macd_signal
-        return macd_line, macd_signal, macd_histogram
+        return macd(prices, 12, 26, 9)
     
     def _calculate_bollinger_bands(self, prices: pd.Series, period: int = 20) -> Tuple[pd.Series, pd.Series, pd.Series]:
         """ボリンジャーバンドを計算"""
-        sma = prices.rolling(window=period).mean()
-        std = prices.rolling(window=period).std()
-        bb_upper = sma + (std * 2)
-        bb_lower = sma - (std * 2)
+        # 移動平均・標準偏差は1回の走査でまとめて計算
+        sma, std = rolling_mean_std(prices, period)
+        bb_upper = sma + (std * BB_SIGMA)
+        bb_lower = sma - (std * BB_SIGMA)
         return bb_upper, sma, bb_lower
     
     def _calculate_stochastic(self, high: pd.Series, low: pd.Series, close: pd.Series, 
                             k_period: int = 14, d_period: int = 3) -> Tuple[pd.Series, pd.Series]:
         """ストキャスティクスを計算"""
-        lowest_low = low.rolling(window=k_period).min()
-        highest_high = high.rolling(window=k_period).max()
-        stoch_k = 100 * ((close - lowest_low) / (highest_high - lowest_low))
-        stoch_d = stoch_k.rolling(window=d_period).mean()
-        return stoch_k, stoch_d
+        return stochastic(high, low, close, k_period, d_period)
     
     def _calculate_volume_ratio(self, volumes: pd.Series, period: int = 20) -> pd.Series:
         """出来高比率を計算"""
-        volume_sma = volumes.rolling(window=period).mean()
+        volume_sma = rolling_mean(volumes, period)
         return volumes / volume_sma
     
     def _calculate_price_change(self, prices: pd.Series, period: int) -> pd.Series:
         """価格変動率を計算"""
         return ((prices / prices.shift(period)) - 1) * 100
     
-    def _calculate_volatility(self, prices: pd.Series, period: int) -> pd.Series:
-        """ボラティリティ（標準偏差）を計算"""
-        returns = prices.pct_change()
-        return returns.rolling(window=period).std() * np.sqrt(252)  # 年率換算
+    # 以下は最新値のみを返す版（期間に満たない場合は系列版の最新値と同じくNaN）
+    
+    def _latest_sma(self, values: np.ndarray, period: int) -> float:
+        """単純移動平均の最新値を計算"""
+        if len(values) < period:
+            return np.nan
+        return float(values[-period:].mean())
+    
+    def _latest_rsi(self, values: np.ndarray, period: int = 14) -> float:
+        """RSIの最新値を計算（Wilderの平滑化は全期間に依存するため全期間を走査）"""
+        return latest_wilder_rsi(values, period)
+    
+    def _latest_bollinger_bands(self, values: np.ndarray, period: int = 20) -> Tuple[float, float, float]:
+        """ボリンジャーバンドの最新値を計算"""
+        if len(values) < period:
+            return np.nan, np.nan, np.nan
+        window = values[-period:]
+        sma = float(window.mean())
+        std = float(window.std(ddof=1))
+        return sma + (std * BB_SIGMA), sma, sma - (std * BB_SIGMA)
+    
+    def _latest_stochastic(self, high: np.ndarray, low: np.ndarray, close: np.ndarray,
+                           k_period: int = 14, d_period: int = 3) -> Tuple[float, float]:
+        """ストキャスティクス（%K・%D）の最新値を計算"""
+        length = min(len(high), len(low), len(close))
+        if length < k_period:
+            return np.nan, np.nan
+        # %Dの計算に必要な末尾d_period本分の%Kを計算
+        count = min(d_period, length - k_period + 1)
+        window = k_period + count - 1
+        lowest_low = np.lib.stride_tricks.sliding_window_view(low[-window:], k_period).min(axis=1)
+        highest_high = np.lib.stride_tricks.sliding_window_view(high[-window:], k_period).max(axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            stoch_k = 100 * ((close[-count:] - lowest_low) / (highest_high - lowest_low))
+        stoch_d = float(stoch_k.mean()) if count == d_period else np.nan
+        return float(stoch_k[-1]), stoch_d
+    
+    def _latest_volatility_wide(self, close_prices: pd.DataFrame, period: int) -> np.ndarray:
+        """2次元DataFrame（日付位置×銘柄）の各列のボラティリティの最新値を計算"""
+        if len(close_prices) <= period:
+            return np.full(close_prices.shape[1], np.nan)
+        tail = close_prices.to_numpy(dtype=float)[-(period + 1):]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            returns = tail[1:] / tail[:-1] - 1
+            return returns.std(axis=0, ddof=1) * ANNUALIZATION_FACTOR
+    
+    def _latest_volatility(self, values: np.ndarray, period: int) -> float:
+        """ボラティリティ（年率換算した日次リターンの標準偏差）の最新値を計算"""
+        if len(values) <= period:
+            return np.nan
+        tail = values[-(period + 1):]
+        returns = tail[1:] / tail[:-1] - 1
+        return float(returns.std(ddof=1) * ANNUALIZATION_FACTOR)
     
     def generate_trading_signals(self, indicators: Dict, current_price: float) -> Dict:
         """トレードシグナルを生成"""
         signals = {}
         
         try:
+            # 各指標のシグナルは方向コード（買い: 1、売り: -1、中立: 0）で判定し、最後に表示名へ変換
+            codes = {}
+            
             # RSIシグナル
             rsi = indicators.get('rsi_14')
             if rsi is not None:
-                if rsi > 70:
-                    signals['rsi_signal'] = '売り'
-                    signals['rsi_strength'] = '強い'
-                elif rsi < 30:
-                    signals['rsi_signal'] = '買い'
-                    signals['rsi_strength'] = '強い'
-                else:
-                    signals['rsi_signal'] = '中立'
-                    signals['rsi_strength'] = '弱い'
+                codes['rsi_signal'] = SIGNAL_SELL if rsi > 70 else SIGNAL_BUY if rsi < 30 else SIGNAL_NEUTRAL
             
-            # MACDシグナル
+            # MACDシグナル（ヒストグラムはMACD - シグナルのため、符号は大小比較で決まる）
             macd_line = indicators.get('macd_line')
             macd_signal = indicators.get('macd_signal')
             if macd_line is not None and macd_signal is not None:
-                if macd_line > macd_signal and indicators.get('macd_histogram', 0) > 0:
-                    signals['macd_signal'] = '買い'
-                elif macd_line < macd_signal and indicators.get('macd_histogram', 0) < 0:
-                    signals['macd_signal'] = '売り'
-                else:
-                    signals['macd_signal'] = '中立'
+                codes['macd_signal'] = (SIGNAL_BUY if macd_line > macd_signal
+                                        else SIGNAL_SELL if macd_line < macd_signal else SIGNAL_NEUTRAL)
             
             # ボリンジャーバンドシグナル
             bb_upper = indicators.get('bb_upper')
             bb_lower = indicators.get('bb_lower')
             if bb_upper is not None and bb_lower is not None and current_price:
-                if current_price >= bb_upper:
-                    signals['bb_signal'] = '売り（上方ブレイクアウト）'
-                elif current_price <= bb_lower:
-                    signals['bb_signal'] = '買い（下方ブレイクアウト）'
-                else:
-                    signals['bb_signal'] = '中立'
+                codes['bb_signal'] = (SIGNAL_SELL if current_price >= bb_upper
+                                      else SIGNAL_BUY if current_price <= bb_lower else SIGNAL_NEUTRAL)
             
             # ストキャスティクスシグナル
             stoch_k = indicators.get('stoch_k')
             stoch_d = indicators.get('stoch_d')
             if stoch_k is not None and stoch_d is not None:
-                if stoch_k > 80 and stoch_d > 80:
-                    signals['stoch_signal'] = '売り'
-                elif stoch_k < 20 and stoch_d < 20:
-                    signals['stoch_signal'] = '買い'
-                else:
-                    signals['stoch_signal'] = '中立'
+                codes['stoch_signal'] = (SIGNAL_SELL if stoch_k > 80 and stoch_d > 80
+                                         else SIGNAL_BUY if stoch_k < 20 and stoch_d < 20 else SIGNAL_NEUTRAL)
+            
+            # 表示名への変換と同じループで買い・売りシグナルを数える
+            buy_signals = sell_signals = 0
+            for key, code in codes.items():
+                signals[key] = (_BB_SIGNAL_LABELS if key == 'bb_signal' else _SIGNAL_LABELS)[code]
+                if key == 'rsi_signal':
+                    signals['rsi_strength'] = '弱い' if code == SIGNAL_NEUTRAL else '強い'
+                if code == SIGNAL_BUY:
+                    buy_signals += 1
+                elif code == SIGNAL_SELL:
+                    sell_signals += 1
             
             # 総合評価
-            buy_signals = sum(1 for signal in signals.values() if '買い' in str(signal))
-            sell_signals = sum(1 for signal in signals.values() if '売り' in str(signal))
-            
-            if buy_signals > sell_signals:
-                signals['overall_signal'] = '買い推奨'
-            elif sell_signals > buy_signals:
-                signals['overall_signal'] = '売り推奨'
-            else:
-                signals['overall_signal'] = '中立'
-            
+            overall = (SIGNAL_BUY if buy_signals > sell_signals
+                       else SIGNAL_SELL if sell_signals > buy_signals else SIGNAL_NEUTRAL)
+            signals['overall_signal'] = _OVERALL_SIGNAL_LABELS[overall]
             signals['buy_count'] = buy_signals
             signals['sell_count'] = sell_signals
             
@@ -219,8 +588,13 @@ class StockAnalyzer:
             logger.error(f"トレードシグナル生成中にエラー: {e}")
             return {}
     
-    def analyze_stock_by_style(self, stock_data: Dict, investment_style: str) -> Dict:
-        """投資スタイル別に銘柄分析を実行"""
+    def analyze_stock_by_style(self, stock_data: Dict, investment_style: str,
+                               save_to_database: bool = True) -> Dict:
+        """投資スタイル別に銘柄分析を実行
+        
+        Args:
+            save_to_database: Falseの場合は分析結果をDBに保存しない（呼び出し側で一括保存する場合）
+        """
         try:
             stock_code = stock_data['stock_code']
             price_history = stock_data['price_history']
@@ -240,30 +614,275 @@ class StockAnalyzer:
             # 投資スタイル別のトレードシグナルを生成
             signals = self.generate_trading_signals_by_style(indicators, current_price, investment_style)
             
-            # AI分析による総合判断
-            ai_analysis = self.generate_ai_analysis(indicators, signals, investment_style)
-            
-            # 分析結果をまとめる
-            analysis_result = {
-                'stock_code': stock_code,
-                'current_price': current_price,
-                'indicators': indicators,
-                'signals': signals,
-                'ai_analysis': ai_analysis,
-                'investment_style': investment_style,
-                'analysis_date': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            }
+            # AI分析による総合判断を加えて分析結果をまとめる
+            analysis_result = self._build_style_analysis_result(
+                stock_code, current_price, indicators, signals, investment_style
+            )
             
             # データベースに保存
-            self._save_analysis_to_database(analysis_result)
+            if save_to_database:
+                self._save_analysis_to_database(analysis_result)
             
-            logger.info(f"銘柄 {stock_code} の{self.db_manager.get_investment_style_display_name(investment_style)}分析完了")
+            logger.info(f"銘柄 {stock_code} の{INVESTMENT_STYLES.get(investment_style, investment_style)}分析完了")
             return analysis_result
             
         except Exception as e:
             logger.error(f"銘柄 {stock_code} の{investment_style}分析中にエラー: {e}")
             return {}
     
+    def _build_style_analysis_result(self, stock_code: str, current_price, indicators: Dict,
+                                     signals: Dict, investment_style: str) -> Dict:
+        """投資スタイル別の分析結果を組み立て"""
+        ai_analysis = self.generate_ai_analysis(indicators, signals, investment_style)
+        
+        return {
+            'stock_code': stock_code,
+            'current_price': current_price,
+            'indicators': indicators,
+            'signals': signals,
+            'ai_analysis': ai_analysis,
+            'investment_style': investment_style,
+            'analysis_date': current_timestamp()
+        }
+    
+    def analyze_batch(self, stock_data_dict: Dict[str, Dict],
+                      investment_style: str) -> Dict[str, Optional[AnalysisResult]]:
+        """複数銘柄の投資スタイル別分析を一括で実行
+        
+        全銘柄の株価を「日付位置×銘柄コード」の2次元DataFrameに並べ、
+        テクニカル指標と基本シグナルを全銘柄まとめて計算する。
+        欠損値を含む銘柄やデータ不足の銘柄は銘柄単位の分析にフォールバックする。
+        分析結果はDBに保存しない（呼び出し側で一括保存する）。
+        
+        Args:
+            stock_data_dict: 銘柄コードをキーとするget_all_stock_dataの結果
+            investment_style: 投資スタイル
+        
+        Returns:
+            銘柄コードをキーとする分析結果（失敗した銘柄はNone）
+        """
+        results = {}
+        batch_data = {}
+        
+        for stock_code, stock_data in stock_data_dict.items():
+            price_history = stock_data.get('price_history') if stock_data else None
+            if price_history is None or price_history.empty:
+                logger.warning(f"銘柄 {stock_code} の株価データがありません")
+                results[stock_code] = None
+                continue
+            
+            if len(price_history) >= 20 and not price_history[list(PRICE_COLUMNS)].isna().values.any():
+                batch_data[stock_code] = stock_data
+            else:
+                results[stock_code] = self._analyze_single_for_batch(stock_data, investment_style)
+        
+        if not batch_data:
+            return results
+        
+        try:
+            price_histories = {code: data['price_history'] for code, data in batch_data.items()}
+            latest = self._calculate_latest_indicators_batch(price_histories)
+            current_prices = latest['close_price']
+            base_signals = self._generate_trading_signals_batch(latest, current_prices)
+        except Exception as e:
+            logger.error(f"一括指標計算中にエラー（銘柄単位の分析に切り替えます）: {e}")
+            for stock_code, stock_data in batch_data.items():
+                results[stock_code] = self._analyze_single_for_batch(stock_data, investment_style)
+            return results
+        
+        indicator_names = [name for name in latest.columns if name != 'close_price']
+        for stock_code, stock_data in batch_data.items():
+            try:
+                base_indicators = latest.loc[stock_code, indicator_names].to_dict()
+                indicators = self._enhance_indicators_by_style(
+                    base_indicators, stock_data['price_history'], investment_style
+                )
+                signals = self._adjust_signals_by_style(
+                    base_signals[stock_code], indicators, investment_style
+                )
+                ai_analysis = self.generate_ai_analysis(indicators, signals, investment_style)
+                results[stock_code] = AnalysisResult(
+                    stock_code=stock_code,
+                    investment_style=investment_style,
+                    current_price=current_prices[stock_code],
+                    indicators=indicators,
+                    signals=TradingSignals.from_dict(signals),
+                    confidence_score=ai_analysis.get('confidence_score'),
+                    ai_reasoning=ai_analysis.get('reasoning'),
+                    risk_assessment=ai_analysis.get('risk_assessment')
+                )
+            except Exception as e:
+                logger.error(f"銘柄 {stock_code} の{investment_style}分析中にエラー: {e}")
+                results[stock_code] = None
+        
+        logger.info(f"{len(batch_data)}銘柄の{INVESTMENT_STYLES.get(investment_style, investment_style)}一括分析完了")
+        return results
+    
+    def _analyze_single_for_batch(self, stock_data: Dict, investment_style: str) -> Optional[AnalysisResult]:
+        """一括計算できない銘柄を銘柄単位で分析"""
+        analysis_result = self.analyze_stock_by_style(stock_data, investment_style, save_to_database=False)
+        return AnalysisResult.from_dict(analysis_result) if analysis_result else None
+    
+    def _calculate_latest_indicators_batch(self, price_histories: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+        """全銘柄のテクニカル指標の最新値を一括計算
+        
+        Numbaが利用可能な場合は、末尾（最新日）を揃えた「銘柄×日付位置」の行列から
+        銘柄ごとの最新値を並列に計算する（Numbaが利用できない場合は2次元DataFrameで計算）。
+        
+        Returns:
+            銘柄コードを行、指標名を列とするDataFrame（close_price列に現在価格を含む、
+            FLOAT32_INDICATORSの列はfloat32）
+        """
+        if latest_indicators_matrix is None:
+            return self._downcast_latest(self._calculate_latest_indicators_wide(price_histories))
+        
+        stock_codes = list(price_histories)
+        lengths = np.array([len(price_histories[code]) for code in stock_codes], dtype=np.int64)
+        width = int(lengths.max())
+        matrices = {column: np.full((len(stock_codes), width), np.nan) for column in PRICE_COLUMNS}
+        for row, stock_code in enumerate(stock_codes):
+            values = price_histories[stock_code][list(PRICE_COLUMNS)].to_numpy(dtype=float)
+            for column, column_values in zip(PRICE_COLUMNS, values.T):
+                matrices[column][row, width - lengths[row]:] = column_values
+        
+        out = latest_indicators_matrix(matrices['close_price'], matrices['high_price'],
+                                       matrices['low_price'], matrices['volume'], lengths)
+        latest = pd.DataFrame(out, index=stock_codes, columns=list(LATEST_INDICATOR_NAMES))
+        latest['close_price'] = matrices['close_price'][:, -1]
+        return self._downcast_latest(latest)
+    
+    def _downcast_latest(self, latest: pd.DataFrame) -> pd.DataFrame:
+        """全銘柄分の結果表のうち、精度を必要としない指標の列をfloat32に変換"""
+        return latest.astype(dict.fromkeys(FLOAT32_INDICATORS, np.float32))
+    
+    def _calculate_latest_indicators_wide(self, price_histories: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+        """全銘柄のテクニカル指標の最新値を2次元DataFrameで一括計算
+        
+        各銘柄の系列は末尾（最新日）を揃えて配置するため、
+        履歴の短い銘柄は先頭が欠損となり、ローリング計算の結果は銘柄単位の計算と一致する。
+        全期間の系列を計算するのは全履歴に依存するRSI・MACDのみとし、
+        移動平均などのウィンドウ指標は最新値に必要な末尾STREAMING_TAIL_LENGTH本だけで計算する。
+        """
+        length = max(len(history) for history in price_histories.values())
+        index = pd.RangeIndex(length)
+        
+        def to_wide(column: str) -> pd.DataFrame:
+            return pd.DataFrame({
+                stock_code: pd.Series(history[column].to_numpy(dtype=float),
+                                      index=pd.RangeIndex(length - len(history), length))
+                for stock_code, history in price_histories.items()
+            }, index=index)
+        
+        close_prices = to_wide('close_price')
+        
+        # 末尾のみの表（ウィンドウ指標の最新値はこの範囲だけで決まる）
+        close_tail = close_prices.iloc[-STREAMING_TAIL_LENGTH:]
+        high_prices = to_wide('high_price').iloc[-STREAMING_TAIL_LENGTH:]
+        low_prices = to_wide('low_price').iloc[-STREAMING_TAIL_LENGTH:]
+        volumes = to_wide('volume').iloc[-STREAMING_TAIL_LENGTH:]
+        
+        indicators = {}
+        
+        # 1. 移動平均
+        indicators['sma_5'] = self._calculate_sma(close_tail, 5)
+        indicators['sma_10'] = self._calculate_sma(close_tail, 10)
+        indicators['sma_20'] = self._calculate_sma(close_tail, 20)
+        indicators['sma_50'] = self._calculate_sma(close_tail, 50)
+        
+        # 2. RSI (相対力指数、全期間)
+        indicators['rsi_14'] = self._calculate_rsi(close_prices, 14)
+        
+        # 3. MACD (移動平均収束拡散、全期間)
+        macd_line, macd_signal, macd_histogram = self._calculate_macd(close_prices)
+        indicators['macd_line'] = macd_line
+        indicators['macd_signal'] = macd_signal
+        indicators['macd_histogram'] = macd_histogram
+        
+        # 4. ボリンジャーバンド
+        bb_upper, bb_middle, bb_lower = self._calculate_bollinger_bands(close_tail, 20)
+        indicators['bb_upper'] = bb_upper
+        indicators['bb_middle'] = bb_middle
+        indicators['bb_lower'] = bb_lower
+        
+        # 5. ストキャスティクス
+        stoch_k, stoch_d = self._calculate_stochastic(high_prices, low_prices, close_tail, 14, 3)
+        indicators['stoch_k'] = stoch_k
+        indicators['stoch_d'] = stoch_d
+        
+        # 6. 出来高分析
+        indicators['volume_sma_20'] = self._calculate_sma(volumes, 20)
+        indicators['volume_ratio'] = self._calculate_volume_ratio(volumes, 20)
+        
+        # 7. 価格変動分析
+        indicators['price_change_1d'] = self._calculate_price_change(close_tail, 1)
+        indicators['price_change_5d'] = self._calculate_price_change(close_tail, 5)
+        indicators['price_change_20d'] = self._calculate_price_change(close_tail, 20)
+        
+        # 最新値（最終行）のみを銘柄×指標の表にまとめる
+        latest = pd.DataFrame({key: values.iloc[-1] for key, values in indicators.items()})
+        
+        # 8. ボラティリティ（リターンの系列は作らず、末尾21本の終値から銘柄ごとに計算）
+        latest['volatility_20d'] = self._latest_volatility_wide(close_tail, 20)
+        latest['close_price'] = close_prices.iloc[-1]
+        return latest
+    
+    def _generate_trading_signals_batch(self, latest: pd.DataFrame, current_prices: pd.Series) -> Dict[str, Dict]:
+        """全銘柄のトレードシグナルを一括生成（generate_trading_signalsのベクトル版）"""
+        rsi = latest['rsi_14'].to_numpy()
+        macd_line = latest['macd_line'].to_numpy()
+        macd_signal = latest['macd_signal'].to_numpy()
+        bb_upper = latest['bb_upper'].to_numpy()
+        bb_lower = latest['bb_lower'].to_numpy()
+        stoch_k = latest['stoch_k'].to_numpy()
+        stoch_d = latest['stoch_d'].to_numpy()
+        prices = current_prices.to_numpy()
+        
+        # RSIシグナル
+        rsi_sell = rsi > 70
+        rsi_buy = rsi < 30
+        rsi_signals = np.where(rsi_sell, '売り', np.where(rsi_buy, '買い', '中立'))
+        rsi_strengths = np.where(rsi_sell | rsi_buy, '強い', '弱い')
+        
+        # MACDシグナル
+        macd_buy = macd_line > macd_signal
+        macd_sell = macd_line < macd_signal
+        macd_signals = np.where(macd_buy, '買い', np.where(macd_sell, '売り', '中立'))
+        
+        # ボリンジャーバンドシグナル（現在価格が0の銘柄は判定しない）
+        has_bb = prices != 0
+        bb_sell = has_bb & (prices >= bb_upper)
+        bb_buy = has_bb & ~bb_sell & (prices <= bb_lower)
+        bb_signals = np.where(bb_sell, '売り（上方ブレイクアウト）',
+                              np.where(bb_buy, '買い（下方ブレイクアウト）', '中立'))
+        
+        # ストキャスティクスシグナル
+        stoch_sell = (stoch_k > 80) & (stoch_d > 80)
+        stoch_buy = ~stoch_sell & (stoch_k < 20) & (stoch_d < 20)
+        stoch_signals = np.where(stoch_sell, '売り', np.where(stoch_buy, '買い', '中立'))
+        
+        # 総合評価
+        buy_counts = rsi_buy.astype(int) + macd_buy + bb_buy + stoch_buy
+        sell_counts = rsi_sell.astype(int) + macd_sell + bb_sell + stoch_sell
+        overall_signals = np.where(buy_counts > sell_counts, '買い推奨',
+                                   np.where(sell_counts > buy_counts, '売り推奨', '中立'))
+        
+        signals_by_stock = {}
+        for i, stock_code in enumerate(latest.index):
+            signals = {
+                'rsi_signal': str(rsi_signals[i]),
+                'rsi_strength': str(rsi_strengths[i]),
+                'macd_signal': str(macd_signals[i]),
+            }
+            if has_bb[i]:
+                signals['bb_signal'] = str(bb_signals[i])
+            signals['stoch_signal'] = str(stoch_signals[i])
+            signals['overall_signal'] = str(overall_signals[i])
+            signals['buy_count'] = int(buy_counts[i])
+            signals['sell_count'] = int(sell_counts[i])
+            signals_by_stock[stock_code] = signals
+        
+        return signals_by_stock
+    
     def analyze_stock(self, stock_data: Dict) -> Dict:
         """銘柄の総合分析を実行（従来の方法 - 互換性維持）"""
         try:
@@ -291,7 +910,7 @@ class StockAnalyzer:
                 'current_price': current_price,
                 'indicators': indicators,
                 'signals': signals,
-                'analysis_date': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                'analysis_date': current_timestamp()
             }
             
             logger.info(f"銘柄 {stock_code} の分析完了")
@@ -302,25 +921,63 @@ class StockAnalyzer:
             return {}
     
     def calculate_technical_indicators_by_style(self, price_data: pd.DataFrame, investment_style: str) -> Dict:
-        """投資スタイル別にテクニカル指標を計算"""
-        base_indicators = self.calculate_technical_indicators(price_data)
+        """投資スタイル別にテクニカル指標を計算（株価データは配列へ一度だけ変換し、基本指標と共有する）"""
+        if price_data is None or price_data.empty:
+            return {}
+        
+        try:
+            prices = self._price_arrays(price_data)
+        except Exception as e:
+            logger.error(f"テクニカル指標計算中にエラー: {e}")
+            return {}
+        
+        base_indicators = self._indicators_from_prices(prices)
+        return self._enhance_indicators_from_closes(base_indicators, prices.close, investment_style)
+    
+    def _enhance_indicators_by_style(self, base_indicators: Dict, price_data: pd.DataFrame,
+                                     investment_style: str) -> Dict:
+        """基本指標に投資スタイル別の指標を追加"""
+        if investment_style not in ('day_trading', 'swing_trading', 'long_term'):
+            return base_indicators
+        
+        try:
+            closes = price_data['close_price'].to_numpy(dtype=float)
+        except Exception as e:
+            logger.warning(f"終値データの取得中にエラー: {e}")
+            return base_indicators.copy()
+        return self._enhance_indicators_from_closes(base_indicators, closes, investment_style)
+    
+    def _enhance_indicators_from_closes(self, base_indicators: Dict, closes: np.ndarray,
+                                        investment_style: str) -> Dict:
+        """終値配列から基本指標に投資スタイル別の指標を追加"""
+        if investment_style not in ('day_trading', 'swing_trading', 'long_term'):
+            return base_indicators
+        
+        # 欠損値を除いた終値配列は一度だけ作成し、各指標の計算で共有する
+        closes = self._close_values(closes)
         
         if investment_style == 'day_trading':
             # デイトレード: 短期指標を重視
-            return self._enhance_for_day_trading(base_indicators, price_data)
+            return self._enhance_for_day_trading(base_indicators, closes)
         elif investment_style == 'swing_trading':
             # スイングトレード: 中期指標を重視
-            return self._enhance_for_swing_trading(base_indicators, price_data)
-        elif investment_style == 'long_term':
-            # 長期投資: 長期指標とファンダメンタルを重視
-            return self._enhance_for_long_term(base_indicators, price_data)
+            return self._enhance_for_swing_trading(base_indicators, closes)
         else:
-            return base_indicators
+            # 長期投資: 長期指標とファンダメンタルを重視
+            return self._enhance_for_long_term(base_indicators, closes)
+    
+    @staticmethod
+    def _close_values(closes: np.ndarray) -> np.ndarray:
+        """欠損値を除いた終値の配列（close_price.dropna()と同じ値をSeriesを作らずに取得）"""
+        return closes[~np.isnan(closes)]
     
     def generate_trading_signals_by_style(self, indicators: Dict, current_price: float, investment_style: str) -> Dict:
         """投資スタイル別にトレードシグナルを生成"""
         base_signals = self.generate_trading_signals(indicators, current_price)
-        
+        return self._adjust_signals_by_style(base_signals, indicators, investment_style)
+    
+    def _adjust_signals_by_style(self, base_signals: Dict, indicators: Dict, investment_style: str) -> Dict:
+        """基本シグナルを投資スタイル別に調整"""
         if investment_style == 'day_trading':
             # デイトレード: 短期シグナルを重視
             return self._adjust_signals_for_day_trading(base_signals, indicators)
@@ -333,23 +990,18 @@ class StockAnalyzer:
         else:
             return base_signals
     
-    def _enhance_for_day_trading(self, base_indicators: Dict, price_data: pd.DataFrame) -> Dict:
-        """デイトレード用に指標を強化"""
+    def _enhance_for_day_trading(self, base_indicators: Dict, closes: np.ndarray) -> Dict:
+        """デイトレード用に指標を強化（closesは欠損値を除いた終値配列）"""
         enhanced = base_indicators.copy()
         
         try:
             # 短期ボラティリティの追加
-            close_prices = price_data['close_price'].dropna()
-            if len(close_prices) >= 5:
-                volatility_5d = self._calculate_volatility(close_prices, 5)
-                if volatility_5d is not None and len(volatility_5d) > 0:
-                    enhanced['volatility_5d'] = volatility_5d.iloc[-1] if hasattr(volatility_5d, 'iloc') else volatility_5d[-1]
+            if len(closes) >= 5:
+                enhanced['volatility_5d'] = self._latest_volatility(closes, 5)
             
             # 短期RSIの追加
-            if len(close_prices) >= 7:
-                rsi_7 = self._calculate_rsi(close_prices, 7)
-                if rsi_7 is not None and len(rsi_7) > 0:
-                    enhanced['rsi_7'] = rsi_7.iloc[-1] if hasattr(rsi_7, 'iloc') else rsi_7[-1]
+            if len(closes) >= 7:
+                enhanced['rsi_7'] = self._latest_rsi(closes, 7)
             
             # 価格変動の短期指標
             enhanced['price_change_1h'] = None  # 1時間足データがあれば計算
@@ -360,41 +1012,40 @@ class StockAnalyzer:
         
         return enhanced
     
-    def _enhance_for_swing_trading(self, base_indicators: Dict, price_data: pd.DataFrame) -> Dict:
-        """スイングトレード用に指標を強化"""
+    def _enhance_for_swing_trading(self, base_indicators: Dict, closes: np.ndarray) -> Dict:
+        """スイングトレード用に指標を強化（closesは欠損値を除いた終値配列）"""
         enhanced = base_indicators.copy()
         
         try:
-            # 中期トレンド指標の追加
-            close_prices = price_data['close_price'].dropna()
-            if len(close_prices) >= 50:
-                enhanced['sma_100'] = self._calculate_sma(close_prices, 100)
-                enhanced['trend_strength'] = self._calculate_trend_strength(close_prices)
+            # 中期トレンド指標の追加（トレンド強度に使う移動平均も末尾の累積和からまとめて計算）
+            if len(closes) >= 50:
+                sma_10, sma_50, sma_100 = latest_smas(closes, (10, 50, 100)).tolist()
+                enhanced['sma_100'] = sma_100
+                enhanced['trend_strength'] = self._calculate_trend_strength(sma_10, sma_50)
             
             # サポート/レジスタンスレベルの特定
-            enhanced['support_level'] = self._identify_support_level(close_prices)
-            enhanced['resistance_level'] = self._identify_resistance_level(close_prices)
+            enhanced['support_level'] = self._identify_support_level(closes)
+            enhanced['resistance_level'] = self._identify_resistance_level(closes)
             
         except Exception as e:
             logger.warning(f"スイングトレード指標強化中にエラー: {e}")
         
         return enhanced
     
-    def _enhance_for_long_term(self, base_indicators: Dict, price_data: pd.DataFrame) -> Dict:
-        """長期投資用に指標を強化"""
+    def _enhance_for_long_term(self, base_indicators: Dict, closes: np.ndarray) -> Dict:
+        """長期投資用に指標を強化（closesは欠損値を除いた終値配列）"""
         enhanced = base_indicators.copy()
         
         try:
             # 長期トレンドとボラティリティ
-            close_prices = price_data['close_price'].dropna()
-            if len(close_prices) >= 200:
-                enhanced['sma_200'] = self._calculate_sma(close_prices, 200)
-                enhanced['volatility_1y'] = self._calculate_volatility(close_prices, min(252, len(close_prices)))
+            if len(closes) >= 200:
+                enhanced['sma_200'] = self._latest_sma(closes, 200)
+                enhanced['volatility_1y'] = self._latest_volatility(closes, min(252, len(closes)))
             
             # 長期リターン指標
-            if len(close_prices) >= 252:
-                enhanced['annual_return'] = self._calculate_annual_return(close_prices)
-                enhanced['max_drawdown_1y'] = self._calculate_max_drawdown(close_prices)
+            if len(closes) >= 252:
+                enhanced['annual_return'] = self._calculate_annual_return(closes)
+                enhanced['max_drawdown_1y'] = self._calculate_max_drawdown(closes)
             
         except Exception as e:
             logger.warning(f"長期投資指標強化中にエラー: {e}")
@@ -586,8 +1237,15 @@ class StockAnalyzer:
         else:
             return "不明"
     
-    def _save_analysis_to_database(self, analysis_result: Dict):
-        """分析結果をデータベースに保存"""
+    def _save_analysis_to_database(self, analysis_result: Dict, conn: Optional[Connection] = None) -> bool:
+        """分析結果をデータベースに保存
+        
+        テクニカル指標と投資判断は1つのセーブポイントで保存し、どちらかが失敗した場合は両方を取り消す。
+        connが指定された場合は呼び出し側のトランザクションに参加し、指定がない場合は単独でコミットする。
+        
+        Returns:
+            両方の保存に成功した場合はTrue
+        """
         try:
             stock_code = analysis_result['stock_code']
             investment_style = analysis_result['investment_style']
@@ -595,12 +1253,7 @@ class StockAnalyzer:
             signals = analysis_result['signals']
             ai_analysis = analysis_result['ai_analysis']
             
-            # テクニカル指標を保存
-            self.db_manager.save_technical_indicators(
-                stock_code, indicators, investment_style
-            )
-            
-            # 投資判断を保存
+            # 保存する投資判断データ
             decision_data = {
                 'decision_type': 'analyze',
                 'target_price': None,  # 必要に応じて設定
@@ -617,31 +1270,39 @@ class StockAnalyzer:
                 'risk_assessment': ai_analysis.get('risk_assessment')
             }
             
-            self.db_manager.save_investment_decision(
-                stock_code, decision_data, investment_style
-            )
+            transaction = self.db_manager.transaction() if conn is None else nullcontext(conn)
+            with transaction as conn:
+                # 各保存メソッドはエラーを捕捉してFalseを返すため、戻り値で成否を判定して両方をまとめて取り消す
+                savepoint = conn.begin_nested()
+                saved = (
+                    self.db_manager.save_technical_indicators(
+                        stock_code, indicators, investment_style, conn=conn
+                    )
+                    and self.db_manager.save_investment_decision(
+                        stock_code, decision_data, investment_style, conn=conn
+                    )
+                )
+                if saved:
+                    savepoint.commit()
+                else:
+                    savepoint.rollback()
             
+            if not saved:
+                logger.error(f"銘柄 {stock_code} の分析結果の保存に失敗したため取り消しました")
+                return False
             logger.info(f"銘柄 {stock_code} の分析結果をデータベースに保存しました")
+            return True
             
         except Exception as e:
             logger.error(f"分析結果のデータベース保存中にエラー: {e}")
+            return False
     
-    def _calculate_trend_strength(self, prices: pd.Series) -> float:
-        """トレンドの強さを計算"""
+    def _calculate_trend_strength(self, sma_short: float, sma_long: float) -> float:
+        """短期（10日）と長期（50日）の移動平均の最新値の差からトレンドの強さを計算"""
         try:
-            if len(prices) < 20:
-                return 0.0
-            
-            # 短期と長期の移動平均の差でトレンド強度を計算
-            sma_short = prices.rolling(window=10).mean()
-            sma_long = prices.rolling(window=50).mean()
-            
-            if len(sma_short) < 1 or len(sma_long) < 1:
-                return 0.0
-            
             # 最新値の差を正規化
-            diff = abs(sma_short.iloc[-1] - sma_long.iloc[-1])
-            avg_price = (sma_short.iloc[-1] + sma_long.iloc[-1]) / 2
+            diff = abs(sma_short - sma_long)
+            avg_price = (sma_short + sma_long) / 2
             
             if avg_price == 0:
                 return 0.0
@@ -652,40 +1313,40 @@ class StockAnalyzer:
             logger.warning(f"トレンド強度計算中にエラー: {e}")
             return 0.0
     
-    def _identify_support_level(self, prices: pd.Series) -> Optional[float]:
+    def _identify_support_level(self, prices: np.ndarray) -> Optional[float]:
         """サポートレベルを特定"""
         try:
             if len(prices) < 20:
                 return None
             
             # 単純化: 直近20日間の最安値
-            return prices.tail(20).min()
+            return prices[-20:].min()
             
         except Exception as e:
             logger.warning(f"サポートレベル特定中にエラー: {e}")
             return None
     
-    def _identify_resistance_level(self, prices: pd.Series) -> Optional[float]:
+    def _identify_resistance_level(self, prices: np.ndarray) -> Optional[float]:
         """レジスタンスレベルを特定"""
         try:
             if len(prices) < 20:
                 return None
             
             # 単純化: 直近20日間の最高値
-            return prices.tail(20).max()
+            return prices[-20:].max()
             
         except Exception as e:
             logger.warning(f"レジスタンスレベル特定中にエラー: {e}")
             return None
     
-    def _calculate_annual_return(self, prices: pd.Series) -> Optional[float]:
+    def _calculate_annual_return(self, prices: np.ndarray) -> Optional[float]:
         """年率リターンを計算"""
         try:
             if len(prices) < 252:
                 return None
             
-            start_price = prices.iloc[0]
-            end_price = prices.iloc[-1]
+            start_price = prices[0]
+            end_price = prices[-1]
             
             if start_price == 0:
                 return None
@@ -703,15 +1364,18 @@ class StockAnalyzer:
             logger.warning(f"年率リターン計算中にエラー: {e}")
             return None
     
-    def _calculate_max_drawdown(self, prices: pd.Series) -> Optional[float]:
+    def _calculate_max_drawdown(self, prices: np.ndarray) -> Optional[float]:
         """最大ドローダウンを計算"""
         try:
             if len(prices) < 2:
                 return None
             
-            cumulative_max = prices.expanding().max()
-            drawdown = (prices - cumulative_max) / cumulative_max
-            max_drawdown = drawdown.min()
+            # 高値更新後の下落率を、累積最大値との差の配列をその場で割って求める（中間配列は1つだけ）
+            cumulative_max = np.maximum.accumulate(prices)
+            drawdown = prices - cumulative_max
+            with np.errstate(divide='ignore', invalid='ignore'):
+                np.divide(drawdown, cumulative_max, out=drawdown)
+            max_drawdown = np.nanmin(drawdown)
             
             return abs(max_drawdown) if max_drawdown < 0 else 0.0
             
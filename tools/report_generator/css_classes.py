@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+CSSクラス判定モジュール
+レポートの数値項目を符号・しきい値に応じたシグナル用CSSクラスに一括変換
+シグナル文字列はキーワードからCSSクラスを判定
+"""
+
+import re
+from typing import Dict, Iterable, List, Sequence, Union
+
+import numpy as np
+
+# 符号（-1, 0, 1）に対応するCSSクラス
+_SIGN_CLASSES = np.array(['signal-sell', 'signal-neutral', 'signal-buy'])
+
+def _to_float_array(values: Iterable) -> np.ndarray:
+    """数値以外（文字列・None等）をNaNとしてfloat配列に変換"""
+    return np.fromiter(
+        (value if isinstance(value, (int, float)) else np.nan for value in values),
+        dtype=float
+    )
+
+def sign_classes(values: Iterable) -> List[str]:
+    """数値の符号からCSSクラスを一括判定（正: 買い、負: 売り、0・数値以外: 中立）"""
+    signs = np.nan_to_num(np.sign(_to_float_array(values))).astype(int)
+    return _SIGN_CLASSES[signs + 1].tolist()
+
+def threshold_classes(values: Iterable, lower: Union[float, Sequence[float]],
+                      upper: Union[float, Sequence[float]]) -> List[str]:
+    """オシレーター値をしきい値からCSSクラスに一括判定
+    
+    upper超: 買われ過ぎで売り、lower未満: 売られ過ぎで買い、それ以外・数値以外: 中立。
+    lower/upperは値ごとに指定することもできる。
+    """
+    array = _to_float_array(values)
+    codes = (array < np.asarray(lower, dtype=float)).astype(int) - (array > np.asarray(upper, dtype=float))
+    return _SIGN_CLASSES[codes + 1].tolist()
+
+class SignalClassifier:
+    """シグナル文字列をキーワードからCSSクラスに判定
+    
+    シグナル文字列は種類が限られるため判定結果を文字列ごとに保持し、
+    2回目以降は辞書の参照だけで判定する。買い・売りの両方を含む場合は買いを優先。
+    """
+    
+    def __init__(self, buy_pattern: str = '買い', sell_pattern: str = '売り'):
+        """
+        Args:
+            buy_pattern: 買いと判定するキーワード（正規表現）
+            sell_pattern: 売りと判定するキーワード（正規表現）
+        """
+        self._buy_re = re.compile(buy_pattern)
+        self._sell_re = re.compile(sell_pattern)
+        self._classes: Dict[str, str] = {}
+    
+    def __call__(self, value) -> str:
+        """シグナルのCSSクラスを取得（文字列以外は文字列に変換して判定）"""
+        text = value if isinstance(value, str) else str(value)
+        css_class = self._classes.get(text)
+        if css_class is None:
+            if self._buy_re.search(text):
+                css_class = 'signal-buy'
+            elif self._sell_re.search(text):
+                css_class = 'signal-sell'
+            else:
+                css_class = 'signal-neutral'
+            self._classes[text] = css_class
+        return css_class
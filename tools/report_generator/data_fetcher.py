@@ -7,19 +7,53 @@ portfolio_holdingsとtrading_plansから対象銘柄を取得し、関連デー
 import logging
 import pandas as pd
 import os
-from typing import List, Dict, Optional
-from sqlalchemy import create_engine, text
-from sqlalchemy.orm import sessionmaker
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Iterator, List, Dict, Optional, Tuple
+from sqlalchemy import Engine, create_engine, text, bindparam
+from sqlalchemy.orm import scoped_session, sessionmaker
 
 logger = logging.getLogger(__name__)
 
+# 一括取得時に1クエリのIN句へ渡す銘柄コード数の上限
+BULK_FETCH_CHUNK_SIZE = 500
+
+def prefetch_chunks(fetch: Callable[[List[str]], Dict],
+                    chunks: List[List[str]]) -> Iterator[Tuple[List[str], Dict]]:
+    """銘柄チャンクのデータを1チャンク先行して取得しながら順に返す
+    
+    次のチャンクの取得（DB待ち）をバックグラウンドスレッドで行い、
+    呼び出し側の分析・チャート描画と重ねる。
+    
+    Args:
+        fetch: 銘柄チャンク → 銘柄コードごとのデータ（DataFetcherの一括取得メソッド等）
+        chunks: 銘柄コードのチャンク
+    
+    Yields:
+        (銘柄チャンク, 取得したデータ)
+    """
+    if not chunks:
+        return
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix='prefetch') as executor:
+        future = executor.submit(fetch, chunks[0])
+        for index, chunk in enumerate(chunks):
+            bulk_data = future.result()
+            if index + 1 < len(chunks):
+                future = executor.submit(fetch, chunks[index + 1])
+            yield chunk, bulk_data
+
 class DataFetcher:
     """データ取得クラス"""
     
-    def __init__(self):
+    def __init__(self, engine: Optional[Engine] = None):
+        """
+        Args:
+            engine: 共有するエンジン（Noneの場合は独自に作成）
+        """
         self.target_stocks = []
-        self.engine = self._get_database_engine()
-        self.SessionLocal = sessionmaker(bind=self.engine)
+        self.engine = engine if engine is not None else self._get_database_engine()
+        # スレッドごとに独立したセッションを払い出す（並列取得時のスレッド安全性確保）
+        self.SessionLocal = scoped_session(sessionmaker(bind=self.engine))
     
     def _get_database_engine(self):
         """データベース接続エンジンを取得"""
@@ -130,6 +164,31 @@ class DataFetcher:
             logger.error(f"銘柄 {stock_code} の株価履歴取得中にエラー: {e}")
             return None
     
+    def has_sufficient_price_data(self, stock_code: str, min_rows: int = 1) -> bool:
+        """株価履歴がmin_rows件以上あるかを確認（全データ取得前の軽量な事前確認）
+        
+        確認に失敗した場合は取得処理側の判定に任せるためTrueを返す。
+        """
+        try:
+            session = self.SessionLocal()
+            
+            query = text("""
+            SELECT COUNT(*) FROM (
+                SELECT 1 FROM stock_prices_history
+                WHERE stock_code = :stock_code
+                LIMIT :min_rows
+            ) AS probe
+            """)
+            
+            row_count = session.execute(query, {"stock_code": stock_code, "min_rows": min_rows}).scalar()
+            
+            session.close()
+            return row_count >= min_rows
+                
+        except Exception as e:
+            logger.error(f"銘柄 {stock_code} の株価履歴件数確認中にエラー: {e}")
+            return True
+    
     def get_long_term_stock_price_history(self, stock_code: str, years: int = 5) -> Optional[pd.DataFrame]:
         """長期分析用の株価履歴を取得（複数年分）"""
         try:
@@ -234,3 +293,148 @@ class DataFetcher:
             "portfolio_info": portfolio_info,
             "trading_plans": trading_plans
         }
+    
+    def get_last_price_updates(self, stock_codes: List[str],
+                               chunk_size: int = BULK_FETCH_CHUNK_SIZE) -> Dict[str, datetime]:
+        """銘柄ごとの株価履歴の最終登録日時を一括取得
+        
+        Returns:
+            銘柄コード → max(created_at)（登録日時が取得できない銘柄は含まない）
+        """
+        query = text("""
+        SELECT stock_code, MAX(created_at) AS last_update
+        FROM stock_prices_history
+        WHERE stock_code IN :stock_codes
+        GROUP BY stock_code
+        """).bindparams(bindparam("stock_codes", expanding=True))
+        
+        last_updates = {}
+        try:
+            session = self.SessionLocal()
+            try:
+                for start in range(0, len(stock_codes), chunk_size):
+                    chunk = list(stock_codes[start:start + chunk_size])
+                    for row in session.execute(query, {"stock_codes": chunk}):
+                        if row.last_update is not None:
+                            last_updates[row.stock_code] = pd.Timestamp(row.last_update).to_pydatetime()
+            finally:
+                session.close()
+        except Exception as e:
+            logger.error(f"株価履歴の最終登録日時取得中にエラー: {e}")
+        return last_updates
+    
+    def get_all_stocks_data_bulk(self, stock_codes: List[str], days: int = 365,
+                                 chunk_size: int = BULK_FETCH_CHUNK_SIZE) -> Dict[str, Dict]:
+        """複数銘柄の全データを一括取得
+        
+        銘柄ごとに4回ずつ発行していたクエリを、chunk_size件ごとのIN句クエリ4回にまとめる。
+        
+        Args:
+            stock_codes: 取得対象の銘柄コード
+            days: 銘柄ごとに取得する株価履歴の日数
+            chunk_size: 1クエリで扱う銘柄コード数
+        
+        Returns:
+            銘柄コードをキーとするget_all_stock_dataと同じ形式の辞書
+        """
+        all_data = {}
+        for start in range(0, len(stock_codes), chunk_size):
+            chunk = list(stock_codes[start:start + chunk_size])
+            all_data.update(self._fetch_stocks_data_chunk(chunk, days))
+        return all_data
+    
+    def _fetch_stocks_data_chunk(self, stock_codes: List[str], days: int) -> Dict[str, Dict]:
+        """銘柄コードのチャンク単位で全データを取得"""
+        logger.info(f"{len(stock_codes)}銘柄のデータ一括取得開始")
+        
+        all_data = {
+            stock_code: {
+                "stock_code": stock_code,
+                "basic_info": None,
+                "price_history": None,
+                "portfolio_info": [],
+                "trading_plans": []
+            }
+            for stock_code in stock_codes
+        }
+        
+        try:
+            session = self.SessionLocal()
+            params = {"stock_codes": stock_codes}
+            
+            # 基本情報
+            query = text("""
+            SELECT stock_code, stock_name, industry, market, description, 
+                   listed_date, website, industry_code_33, industry_code_17,
+                   scale_code, scale_category
+            FROM stocks 
+            WHERE stock_code IN :stock_codes
+            """).bindparams(bindparam("stock_codes", expanding=True))
+            for row in session.execute(query, params):
+                all_data[row.stock_code]["basic_info"] = dict(row._mapping)
+            
+            # 株価履歴（銘柄ごとに直近days件）
+            query = text("""
+            SELECT stock_code, price_date, open_price, high_price, low_price, close_price, volume
+            FROM (
+                SELECT stock_code, price_date, open_price, high_price, low_price, close_price, volume,
+                       ROW_NUMBER() OVER (PARTITION BY stock_code ORDER BY price_date DESC) AS rn
+                FROM stock_prices_history 
+                WHERE stock_code IN :stock_codes
+            ) recent
+            WHERE rn <= :days
+            ORDER BY stock_code, price_date
+            """).bindparams(bindparam("stock_codes", expanding=True))
+            rows = session.execute(query, {**params, "days": days}).fetchall()
+            
+            # ポートフォリオ保有情報
+            query = text("""
+            SELECT stock_code, holding_id, holding_type, broker, purchase_date, 
+                   purchase_price, quantity, current_price, notes
+            FROM portfolio_holdings 
+            WHERE stock_code IN :stock_codes
+            """).bindparams(bindparam("stock_codes", expanding=True))
+            for row in session.execute(query, params):
+                holding = dict(row._mapping)
+                all_data[holding.pop("stock_code")]["portfolio_info"].append(holding)
+            
+            # 取引計画情報
+            query = text("""
+            SELECT stock_code, plan_id, analysis_date, analysis_type, 
+                   allocation_percentage, notes
+            FROM trading_plans 
+            WHERE stock_code IN :stock_codes
+            """).bindparams(bindparam("stock_codes", expanding=True))
+            for row in session.execute(query, params):
+                plan = dict(row._mapping)
+                all_data[plan.pop("stock_code")]["trading_plans"].append(plan)
+            
+            session.close()
+            
+            if rows:
+                # データをDataFrameに変換し、銘柄ごとに分割
+                df = pd.DataFrame([dict(row._mapping) for row in rows])
+                df['price_date'] = pd.to_datetime(df['price_date'])
+                
+                # 数値型に変換
+                numeric_cols = ['open_price', 'high_price', 'low_price', 'close_price', 'volume']
+                for col in numeric_cols:
+                    df[col] = pd.to_numeric(df[col], errors='coerce')
+                
+                for stock_code, group in df.groupby('stock_code', sort=False):
+                    all_data[stock_code]["price_history"] = (
+                        group.drop(columns='stock_code')
+                        .sort_values('price_date')
+                        .reset_index(drop=True)
+                    )
+            
+            missing = [code for code, data in all_data.items() if data["price_history"] is None]
+            if missing:
+                logger.warning(f"株価履歴が見つからない銘柄: {missing}")
+            
+            logger.info(f"{len(stock_codes)}銘柄のデータ一括取得完了: 株価履歴{len(rows)}件")
+            return all_data
+            
+        except Exception as e:
+            logger.error(f"銘柄データ一括取得中にエラー: {e}")
+            return all_data
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+レポートファイル書き出しモジュール
+HTMLレポートをバッファ層を介さずに書き出し、複数ファイルはスレッドで並行に書き出す
+"""
+
+import logging
+import os
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+# レポートファイルを並行に書き出すスレッド数
+FILE_WRITE_WORKERS = 8
+
+def write_bytes_file(file_path: str, data: bytes) -> None:
+    """バイト列をバッファ層を介さずos.writeで書き出し（通常は1回のシステムコール）"""
+    fd = os.open(file_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        view = memoryview(data)
+        while view:
+            written = os.write(fd, view)
+            view = view[written:]
+    finally:
+        os.close(fd)
+
+def write_text_file(file_path: str, content: str) -> None:
+    """テキストをUTF-8にまとめてエンコードして書き出し"""
+    write_bytes_file(file_path, content.encode('utf-8'))
+
+def find_fresh_reports(output_dir: str, last_updates: Dict[str, datetime]) -> Set[str]:
+    """データ更新より後に生成済みのレポートを持つ銘柄コードを返す
+    
+    出力ディレクトリは1回のos.scandirで走査し、銘柄ごとのstatは行わない。
+    
+    Args:
+        output_dir: {銘柄コード}.htmlが出力されるディレクトリ
+        last_updates: 銘柄コード → データの最終更新日時
+    """
+    fresh = set()
+    try:
+        with os.scandir(output_dir) as entries:
+            for entry in entries:
+                stock_code, ext = os.path.splitext(entry.name)
+                last_update = last_updates.get(stock_code)
+                if ext != '.html' or last_update is None or not entry.is_file():
+                    continue
+                if entry.stat().st_mtime > last_update.timestamp():
+                    fresh.add(stock_code)
+    except OSError as e:
+        logger.warning(f"レポートの更新確認中にエラー: {e}")
+    return fresh
+
+def is_report_fresh(file_path: str, last_update: Optional[datetime]) -> bool:
+    """レポートファイルがデータ更新より後に生成済みか（未生成・更新日時不明の場合はFalse）"""
+    if last_update is None:
+        return False
+    try:
+        return os.stat(file_path).st_mtime > last_update.timestamp()
+    except OSError:
+        return False
+
+class ReportFileWriter:
+    """レポートファイルをバックグラウンドのスレッドで書き出すクラス
+
+    withブロックを抜ける時点ですべての書き出しの完了を待つ。
+    """
+
+    def __init__(self, max_workers: int = FILE_WRITE_WORKERS):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='report-writer')
+
+    def submit(self, file_path: str, content: str) -> Future:
+        """ファイルの書き出しを予約"""
+        return self._executor.submit(write_text_file, file_path, content)
+
+    def close(self):
+        """予約済みの書き出しの完了を待って終了"""
+        self._executor.shutdown(wait=True)
+
+    def __enter__(self) -> 'ReportFileWriter':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
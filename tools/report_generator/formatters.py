@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+表示用フォーマットモジュール
+レポートの数値・パーセンテージを文字列に変換（桁数ごとのフォーマッタを使い回す）
+"""
+
+import time
+from datetime import datetime
+from functools import lru_cache
+from typing import Callable, Dict, Iterable, Tuple
+
+# 値がない・数値に変換できない場合の表示
+UNKNOWN_TEXT = '不明'
+
+# 分析日時の表示形式
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# 直近にフォーマットした（UNIX時刻の秒, 文字列）
+_timestamp_cache: Tuple[int, str] = (-1, '')
+
+def current_timestamp() -> str:
+    """現在日時をTIMESTAMP_FORMATの文字列で返す
+    
+    表示は秒単位のため、同じ秒の間は前回フォーマットした文字列を使い回す
+    （一括分析で銘柄ごとにstrftimeを繰り返さない）。
+    """
+    global _timestamp_cache
+    second = int(time.time())
+    cached_second, text = _timestamp_cache
+    if second != cached_second:
+        text = datetime.fromtimestamp(second).strftime(TIMESTAMP_FORMAT)
+        _timestamp_cache = (second, text)
+    return text
+
+@lru_cache(maxsize=None)
+def _number_formatter(decimals: int) -> Callable[[object], str]:
+    """小数桁数に特化した数値フォーマッタを作成（桁数ごとに一度だけ作成）"""
+    if decimals == 0:
+        return lambda value: f"{int(value):,}"
+    spec = f".{decimals}f"
+    return lambda value: format(float(value), spec)
+
+@lru_cache(maxsize=None)
+def _percentage_formatter(decimals: int) -> Callable[[object], str]:
+    """小数桁数に特化したパーセンテージフォーマッタを作成"""
+    spec = f".{decimals}f"
+    return lambda value: format(float(value), spec) + '%'
+
+def format_number(value, decimals: int = 0) -> str:
+    """数値をフォーマット（0桁の場合は3桁区切りの整数）"""
+    if value is None:
+        return UNKNOWN_TEXT
+    try:
+        return _number_formatter(decimals)(value)
+    except (ValueError, TypeError, OverflowError):
+        return UNKNOWN_TEXT
+
+def format_percentage(value, decimals: int = 2) -> str:
+    """パーセンテージをフォーマット"""
+    if value is None:
+        return UNKNOWN_TEXT
+    try:
+        return _percentage_formatter(decimals)(value)
+    except (ValueError, TypeError):
+        return UNKNOWN_TEXT
+
+# 表示項目定義の書式種別 → フォーマット関数
+_FIELD_FORMATTERS = {'number': format_number, 'percentage': format_percentage}
+
+def format_fields(values: Dict, fields: Iterable[Tuple[str, str, int]]) -> Dict[str, str]:
+    """表示項目定義に従って複数の値をまとめてフォーマット
+    
+    Args:
+        values: キー → 値（指標値など）
+        fields: (キー, 書式種別 'number'/'percentage', 小数桁数)の定義
+    """
+    return {key: _FIELD_FORMATTERS[kind](values.get(key), decimals) for key, kind, decimals in fields}
@@ -0,0 +1,606 @@
+#!/usr/bin/env python3
+"""
+テクニカル指標の計算カーネルモジュール
+EMA系・RSI・移動平均/標準偏差の系列を、Numbaでコンパイルした1パスのループで計算
+移動最小・最大はbottleneckのC実装で計算
+それ以外の移動集計はsliding_window_viewのビューに対するNumPyの軸方向の集計で計算
+"""
+
+import logging
+import math
+from typing import Tuple
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+try:
+    from numba import njit, prange
+except ImportError:
+    njit = None
+    prange = range
+
+try:
+    import bottleneck as bn
+except ImportError:
+    bn = None
+
+logger = logging.getLogger(__name__)
+
+# Numbaが利用できない場合、呼び出し側はpandasの系列計算を使う（Pythonのループは系列計算より遅いため）
+NUMBA_AVAILABLE = njit is not None
+
+# 日次リターンの標準偏差を年率換算する係数（年間営業日数252の平方根、呼び出しごとに計算しない）
+ANNUALIZATION_FACTOR = math.sqrt(252)
+
+# ボリンジャーバンドの幅（移動平均から標準偏差の何倍か）
+BB_SIGMA = 2.0
+
+# advance_macdの状態配列の長さ（短期・長期・シグナルEMAそれぞれの重み付き和と重みの和）
+MACD_STATE_SIZE = 6
+
+def _advance_macd(closes: np.ndarray, fast: int, slow: int, signal: int, state: np.ndarray):
+    """状態配列に保持したEMAの重み付き和・重みの和を新しい終値で進め、MACDの最新値を返す
+
+    状態配列（長さMACD_STATE_SIZE、初期値0）はその場で更新するため、
+    以降の終値は追加分だけを渡して続きから計算できる。
+    pandasのewm(span=..., adjust=True).mean()と同じ重み付け平均を、
+    重み付き和と重みの和の逐次更新で求める（系列は作成しない）。
+    """
+    fast_decay = 1.0 - 2.0 / (fast + 1.0)
+    slow_decay = 1.0 - 2.0 / (slow + 1.0)
+    signal_decay = 1.0 - 2.0 / (signal + 1.0)
+
+    fast_sum, fast_weight, slow_sum, slow_weight, signal_sum, signal_weight = (
+        state[0], state[1], state[2], state[3], state[4], state[5]
+    )
+    macd_line = np.nan
+    macd_signal = np.nan
+    for i in range(closes.shape[0]):
+        price = closes[i]
+        fast_sum = price + fast_decay * fast_sum
+        fast_weight = 1.0 + fast_decay * fast_weight
+        slow_sum = price + slow_decay * slow_sum
+        slow_weight = 1.0 + slow_decay * slow_weight
+        macd_line = fast_sum / fast_weight - slow_sum / slow_weight
+
+        signal_sum = macd_line + signal_decay * signal_sum
+        signal_weight = 1.0 + signal_decay * signal_weight
+        macd_signal = signal_sum / signal_weight
+
+    state[0], state[1], state[2], state[3], state[4], state[5] = (
+        fast_sum, fast_weight, slow_sum, slow_weight, signal_sum, signal_weight
+    )
+    return macd_line, macd_signal, macd_line - macd_signal
+
+# wilder_rsi_arraysの状態配列の長さ（直前の値・平均上昇幅・平均下落幅・処理した差分の数）
+RSI_STATE_SIZE = 4
+
+def new_rsi_state() -> np.ndarray:
+    """wilder_rsi_arraysの初期状態"""
+    return np.array([np.nan, 0.0, 0.0, 0.0])
+
+def _wilder_rsi(values: np.ndarray, period: int, state: np.ndarray) -> np.ndarray:
+    """Wilderの平滑化によるRSIの系列を計算
+
+    最初のperiod個の差分の上昇幅・下落幅の単純平均を初期値とし、以降は
+    (平均 * (period - 1) + 値) / period で更新する。欠損値を含む差分は除外してその位置はNaNとする。
+    状態配列（長さRSI_STATE_SIZE、初期値はnew_rsi_state()）はその場で更新するため、
+    以降の値は追加分だけを渡して続きから計算できる。
+    """
+    result = np.full(values.shape[0], np.nan)
+    previous, avg_gain, avg_loss, count = state[0], state[1], state[2], state[3]
+    for i in range(values.shape[0]):
+        value = values[i]
+        delta = value - previous
+        previous = value
+        if np.isnan(delta):
+            continue
+        gain = max(delta, 0.0)
+        loss = max(-delta, 0.0)
+        count += 1
+        if count < period:
+            avg_gain += gain
+            avg_loss += loss
+            continue
+        if count == period:
+            avg_gain = (avg_gain + gain) / period
+            avg_loss = (avg_loss + loss) / period
+        else:
+            avg_gain = (avg_gain * (period - 1) + gain) / period
+            avg_loss = (avg_loss * (period - 1) + loss) / period
+        # pandasの除算と同様に、値動きがない場合はNaN、下落がない場合は100
+        if avg_loss > 0.0:
+            result[i] = 100.0 - 100.0 / (1.0 + avg_gain / avg_loss)
+        elif avg_gain > 0.0:
+            result[i] = 100.0
+    state[0], state[1], state[2], state[3] = previous, avg_gain, avg_loss, count
+    return result
+
+def _ema_series(values: np.ndarray, span: int) -> np.ndarray:
+    """pandasのewm(span=span, adjust=True).mean()と同じ指数移動平均の系列を計算
+
+    欠損値はpandasと同様に平均に含めず、重みの減衰のみを進める。
+    """
+    decay = 1.0 - 2.0 / (span + 1.0)
+    result = np.empty(values.shape[0])
+    weighted_sum = weight = 0.0
+    for i in range(values.shape[0]):
+        weighted_sum *= decay
+        weight *= decay
+        if not np.isnan(values[i]):
+            weighted_sum += values[i]
+            weight += 1.0
+        result[i] = weighted_sum / weight if weight > 0.0 else np.nan
+    return result
+
+def _macd_series(values: np.ndarray, fast: int, slow: int, signal: int):
+    """MACD・シグナル・ヒストグラムの系列を終値の1回の走査で計算
+
+    短期・長期・シグナルの3つのEMAを同じループで更新する。各EMAは_ema_seriesと同じく
+    pandasのewm(span=..., adjust=True).mean()と同じ値で、欠損値は平均に含めない。
+    """
+    fast_decay = 1.0 - 2.0 / (fast + 1.0)
+    slow_decay = 1.0 - 2.0 / (slow + 1.0)
+    signal_decay = 1.0 - 2.0 / (signal + 1.0)
+
+    length = values.shape[0]
+    macd_line = np.empty(length)
+    macd_signal = np.empty(length)
+    fast_sum = fast_weight = 0.0
+    slow_sum = slow_weight = 0.0
+    signal_sum = signal_weight = 0.0
+    for i in range(length):
+        fast_sum *= fast_decay
+        fast_weight *= fast_decay
+        slow_sum *= slow_decay
+        slow_weight *= slow_decay
+        price = values[i]
+        if not np.isnan(price):
+            fast_sum += price
+            fast_weight += 1.0
+            slow_sum += price
+            slow_weight += 1.0
+        line = fast_sum / fast_weight - slow_sum / slow_weight if fast_weight > 0.0 else np.nan
+        macd_line[i] = line
+
+        signal_sum *= signal_decay
+        signal_weight *= signal_decay
+        if not np.isnan(line):
+            signal_sum += line
+            signal_weight += 1.0
+        macd_signal[i] = signal_sum / signal_weight if signal_weight > 0.0 else np.nan
+    return macd_line, macd_signal, macd_line - macd_signal
+
+def _rolling_mean_std(values: np.ndarray, window: int) -> Tuple[np.ndarray, np.ndarray]:
+    """移動平均と移動標準偏差（ddof=1）を1回の走査で計算
+
+    ウィンドウに入る値・出る値で和と二乗和を更新する。桁落ちを抑えるため先頭の値を引いてから集計し、
+    分散が丸め誤差で負になる場合は0とする。pandasのrollingと同様に欠損値を含むウィンドウはNaN、
+    同じ値が続くウィンドウの標準偏差は0とする。
+    """
+    length = values.shape[0]
+    means = np.full(length, np.nan)
+    stds = np.full(length, np.nan)
+    shift = 0.0
+    for i in range(length):
+        if not np.isnan(values[i]):
+            shift = values[i]
+            break
+
+    total = total_sq = 0.0
+    nan_count = 0
+    same_count = 0
+    for i in range(length):
+        value = values[i]
+        if np.isnan(value):
+            nan_count += 1
+            same_count = 0
+        else:
+            deviation = value - shift
+            total += deviation
+            total_sq += deviation * deviation
+            same_count = same_count + 1 if i > 0 and value == values[i - 1] else 1
+        if i >= window:
+            old = values[i - window]
+            if np.isnan(old):
+                nan_count -= 1
+            else:
+                deviation = old - shift
+                total -= deviation
+                total_sq -= deviation * deviation
+        if i >= window - 1 and nan_count == 0:
+            means[i] = total / window + shift
+            if window > 1:
+                if same_count >= window:
+                    stds[i] = 0.0
+                else:
+                    variance = (total_sq - total * total / window) / (window - 1)
+                    stds[i] = np.sqrt(max(variance, 0.0))
+    return means, stds
+
+# Numbaが利用できない場合はNone
+ema_series = njit(cache=True)(_ema_series) if NUMBA_AVAILABLE else None
+macd_series = njit(cache=True)(_macd_series) if NUMBA_AVAILABLE else None
+rolling_mean_std_arrays = njit(cache=True)(_rolling_mean_std) if NUMBA_AVAILABLE else None
+
+# 逐次更新は追加分の数本だけを処理するため、Numbaが利用できない場合もPythonのループで計算
+advance_macd = njit(cache=True)(_advance_macd) if NUMBA_AVAILABLE else _advance_macd
+wilder_rsi_arrays = njit(cache=True)(_wilder_rsi) if NUMBA_AVAILABLE else _wilder_rsi
+
+def latest_macd(closes: np.ndarray, fast: int, slow: int, signal: int) -> Tuple[float, float, float]:
+    """MACD・シグナル・ヒストグラムの最新値を終値の1回の走査で計算（状態を0から始めたadvance_macd）"""
+    return advance_macd(closes, fast, slow, signal, np.zeros(MACD_STATE_SIZE))
+
+# latest_indicators_matrixが出力する指標の列順（StockAnalyzer.calculate_technical_indicatorsと同じ指標）
+LATEST_INDICATOR_NAMES = (
+    'sma_5', 'sma_10', 'sma_20', 'sma_50', 'rsi_14',
+    'macd_line', 'macd_signal', 'macd_histogram',
+    'bb_upper', 'bb_middle', 'bb_lower', 'stoch_k', 'stoch_d',
+    'volume_sma_20', 'volume_ratio',
+    'price_change_1d', 'price_change_5d', 'price_change_20d', 'volatility_20d'
+)
+
+def _tail_mean(values: np.ndarray, period: int) -> float:
+    """末尾period本の平均（期間に満たない場合はNaN）"""
+    if values.shape[0] < period:
+        return np.nan
+    return values[values.shape[0] - period:].mean()
+
+def _tail_std(values: np.ndarray, period: int) -> float:
+    """末尾period本の標準偏差（ddof=1、期間に満たない場合はNaN）"""
+    if values.shape[0] < period:
+        return np.nan
+    window = values[values.shape[0] - period:]
+    deviations = window - window.mean()
+    return np.sqrt((deviations * deviations).sum() / (period - 1))
+
+def _latest_indicators_row(closes: np.ndarray, highs: np.ndarray, lows: np.ndarray,
+                           volumes: np.ndarray, out: np.ndarray) -> None:
+    """1銘柄のテクニカル指標の最新値をLATEST_INDICATOR_NAMESの順にoutへ書き込む"""
+    length = closes.shape[0]
+    out[0] = _tail_mean(closes, 5)
+    out[1] = _tail_mean(closes, 10)
+    sma_20 = _tail_mean(closes, 20)
+    out[2] = sma_20
+    out[3] = _tail_mean(closes, 50)
+    # latest_wilder_rsiと同じく、差分が14個に満たない（14本以下の）場合はNaN
+    rsi_state = np.zeros(RSI_STATE_SIZE)
+    rsi_state[0] = np.nan
+    out[4] = wilder_rsi_arrays(closes, 14, rsi_state)[length - 1] if length > 14 else np.nan
+
+    macd_line, macd_signal, macd_histogram = advance_macd(closes, 12, 26, 9, np.zeros(MACD_STATE_SIZE))
+    out[5] = macd_line
+    out[6] = macd_signal
+    out[7] = macd_histogram
+
+    std_20 = _tail_std(closes, 20)
+    out[8] = sma_20 + std_20 * BB_SIGMA
+    out[9] = sma_20
+    out[10] = sma_20 - std_20 * BB_SIGMA
+
+    # ストキャスティクス（%Dは末尾3本の%Kの平均）
+    stoch_k = np.nan
+    stoch_sum = 0.0
+    stoch_count = 0
+    for offset in range(3):
+        end = length - offset
+        if end < 14:
+            break
+        lowest_low = lows[end - 14:end].min()
+        highest_high = highs[end - 14:end].max()
+        k_value = 100 * ((closes[end - 1] - lowest_low) / (highest_high - lowest_low))
+        if offset == 0:
+            stoch_k = k_value
+        stoch_sum += k_value
+        stoch_count += 1
+    out[11] = stoch_k
+    out[12] = stoch_sum / 3 if stoch_count == 3 else np.nan
+
+    volume_sma_20 = _tail_mean(volumes, 20)
+    out[13] = volume_sma_20
+    out[14] = volumes[length - 1] / volume_sma_20
+
+    for column, period in ((15, 1), (16, 5), (17, 20)):
+        out[column] = (closes[length - 1] / closes[length - 1 - period] - 1) * 100 if length > period else np.nan
+
+    if length > 20:
+        tail = closes[length - 21:]
+        out[18] = _tail_std(tail[1:] / tail[:-1] - 1, 20) * ANNUALIZATION_FACTOR
+    else:
+        out[18] = np.nan
+
+def _latest_indicators_matrix(close_mat: np.ndarray, high_mat: np.ndarray, low_mat: np.ndarray,
+                              volume_mat: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    """末尾揃えで並べた全銘柄の株価行列から、銘柄ごとのテクニカル指標の最新値を並列に計算
+
+    各行は末尾のlengths[s]本が有効な値（先頭は埋め草）で、欠損値を含まないこと。
+
+    Returns:
+        銘柄×LATEST_INDICATOR_NAMESの行列
+    """
+    stock_count, width = close_mat.shape
+    out = np.empty((stock_count, len(LATEST_INDICATOR_NAMES)))
+    for s in prange(stock_count):
+        start = width - lengths[s]
+        _latest_indicators_row(close_mat[s, start:], high_mat[s, start:], low_mat[s, start:],
+                               volume_mat[s, start:], out[s])
+    return out
+
+# 全銘柄の一括計算は銘柄ごとに独立しているため、Numbaのスレッドで並列に計算する
+# （0除算はNumPyと同様にinf/NaNとする）。Numbaが利用できない場合はNone
+if NUMBA_AVAILABLE:
+    _tail_mean = njit(cache=True)(_tail_mean)
+    _tail_std = njit(cache=True)(_tail_std)
+    _latest_indicators_row = njit(cache=True, error_model='numpy')(_latest_indicators_row)
+    latest_indicators_matrix = njit(cache=True, parallel=True, error_model='numpy')(_latest_indicators_matrix)
+else:
+    latest_indicators_matrix = None
+
+def compile_kernels() -> bool:
+    """全カーネルを小さな配列で一度ずつ呼び出してコンパイルし、ディスクキャッシュに保存
+
+    カーネルはcache=Trueのため、以降のプロセス（spawnしたワーカーを含む）はコンパイルせずに
+    キャッシュを読み込むだけで済む。ワーカーごとのJITコンパイルを避けるため、並列実行の前に親プロセスで呼び出す。
+
+    Returns:
+        コンパイルした場合はTrue（Numbaが利用できない・エラーの場合はFalse）
+    """
+    if not NUMBA_AVAILABLE:
+        return False
+    try:
+        # 実際の呼び出しと同じ型（float64の連続配列・int64）で呼び出し、同じ特殊化をキャッシュさせる
+        values = np.linspace(1.0, 2.0, 64)
+        advance_macd(values, 12, 26, 9, np.zeros(MACD_STATE_SIZE))
+        ema_series(values, 12)
+        macd_series(values, 12, 26, 9)
+        rolling_mean_std_arrays(values, 20)
+        wilder_rsi_arrays(values, 14, new_rsi_state())
+        matrix = values.reshape(1, -1).copy()
+        latest_indicators_matrix(matrix, matrix, matrix, matrix, np.array([len(values)], dtype=np.int64))
+        return True
+    except Exception as e:
+        logger.warning(f"指標カーネルのコンパイル中にエラー: {e}")
+        return False
+
+def ewm_mean(prices: pd.Series, span: int) -> pd.Series:
+    """prices.ewm(span=span).mean()と同じ指数移動平均（Numbaが利用可能な場合はカーネルで計算）"""
+    if ema_series is None or not isinstance(prices, pd.Series):
+        return prices.ewm(span=span).mean()
+    return pd.Series(ema_series(prices.to_numpy(dtype=float), span), index=prices.index, name=prices.name)
+
+def macd(prices: pd.Series, fast: int = 12, slow: int = 26,
+         signal: int = 9) -> Tuple[pd.Series, pd.Series, pd.Series]:
+    """MACD・シグナル・ヒストグラムの系列を計算
+
+    Seriesの場合は3つのEMAを1回の走査でまとめて計算する（DataFrameの場合は列ごとにpandasで計算）。
+    """
+    if macd_series is not None and isinstance(prices, pd.Series):
+        return tuple(pd.Series(values, index=prices.index, name=prices.name)
+                     for values in macd_series(prices.to_numpy(dtype=float), fast, slow, signal))
+    macd_line = ewm_mean(prices, fast) - ewm_mean(prices, slow)
+    macd_signal = ewm_mean(macd_line, signal)
+    return macd_line, macd_signal, macd_line - macd_signal
+
+def _moving_reduce(values: np.ndarray, window: int, reducer) -> np.ndarray:
+    """rolling(window)の集計を、ウィンドウのビュー（コピーなし）に対する軸方向の集計で計算
+
+    2次元配列の場合は列ごとに集計する。pandasのrollingと同様に、
+    期間に満たない先頭と欠損値を含むウィンドウはNaNとする。
+    """
+    result = np.full(values.shape, np.nan, dtype=values.dtype)
+    if len(values) >= window:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            result[window - 1:] = reducer(sliding_window_view(values, window, axis=0), axis=-1)
+    return result
+
+def _float_values(prices) -> np.ndarray:
+    """Series・DataFrameの値を配列で取得（float32の系列はfloat32のまま、それ以外はfloat64に変換）
+
+    NumPy・bottleneckの集計は入力と同じ精度で計算するため、チャート用にfloat32へ変換した系列は
+    倍精度に戻さずに集計する（メモリ帯域が半分で済む）。
+    """
+    values = prices.to_numpy()
+    if values.dtype == np.float32:
+        return values
+    return prices.to_numpy(dtype=float)
+
+def _like(values: np.ndarray, prices):
+    """計算結果の配列を元のSeries・DataFrameと同じラベルで包む"""
+    if isinstance(prices, pd.DataFrame):
+        return pd.DataFrame(values, index=prices.index, columns=prices.columns)
+    return pd.Series(values, index=prices.index, name=prices.name)
+
+def _moving_mean_std(values: np.ndarray, window: int) -> Tuple[np.ndarray, np.ndarray]:
+    """移動平均と移動標準偏差（ddof=1）を同じウィンドウのビューからまとめて計算
+
+    標準偏差は求めた平均からの偏差で計算し、平均をもう一度集計しない。
+    """
+    means = np.full(values.shape, np.nan, dtype=values.dtype)
+    stds = np.full(values.shape, np.nan, dtype=values.dtype)
+    if len(values) >= window:
+        windows = sliding_window_view(values, window, axis=0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            window_means = windows.mean(axis=-1)
+            deviations = windows - window_means[..., np.newaxis]
+            means[window - 1:] = window_means
+            stds[window - 1:] = np.sqrt((deviations * deviations).sum(axis=-1) / (window - 1))
+    return means, stds
+
+def rolling_mean(prices: pd.Series, window: int) -> pd.Series:
+    """rolling(window).mean()と同じ単純移動平均を計算
+
+    Seriesの場合は均等な重みとの畳み込みで全ウィンドウを一度に計算する
+    （欠損値を含むウィンドウはpandasと同じくNaN）。DataFrameの場合は列ごとにウィンドウのビューで計算。
+    float32の系列はfloat32のまま計算する。
+    """
+    values = _float_values(prices)
+    if not isinstance(prices, pd.Series):
+        return _like(_moving_reduce(values, window, np.mean), prices)
+    means = np.full(len(values), np.nan, dtype=values.dtype)
+    if len(values) >= window:
+        means[window - 1:] = np.convolve(values, np.full(window, 1.0 / window, dtype=values.dtype), mode='valid')
+    return pd.Series(means, index=prices.index, name=prices.name)
+
+def rolling_mean_std(prices: pd.Series, window: int) -> Tuple[pd.Series, pd.Series]:
+    """rolling(window).mean()・rolling(window).std()と同じ移動平均・移動標準偏差を計算
+
+    Numbaが利用できない場合・DataFrameの場合はウィンドウのビューで計算する（float32の系列はfloat32のまま）。
+    """
+    if rolling_mean_std_arrays is None or not isinstance(prices, pd.Series):
+        means, stds = _moving_mean_std(_float_values(prices), window)
+        return _like(means, prices), _like(stds, prices)
+    means, stds = rolling_mean_std_arrays(prices.to_numpy(dtype=float), window)
+    return (pd.Series(means, index=prices.index, name=prices.name),
+            pd.Series(stds, index=prices.index, name=prices.name))
+
+def latest_ewm_mean(values: np.ndarray, span: int) -> float:
+    """ewm(span=span).mean()の最新値を計算"""
+    if ema_series is None:
+        return float(pd.Series(values).ewm(span=span).mean().iloc[-1])
+    return float(ema_series(values, span)[-1])
+
+def latest_macd_values(closes: np.ndarray, fast: int = 12, slow: int = 26,
+                       signal: int = 9) -> Tuple[float, float, float]:
+    """MACD・シグナル・ヒストグラムの最新値を計算（Numbaが利用できない場合はpandasの系列から取得）"""
+    if NUMBA_AVAILABLE:
+        return latest_macd(closes, fast, slow, signal)
+    return tuple(float(series.iloc[-1]) for series in macd(pd.Series(closes), fast, slow, signal))
+
+def _latest_wilder_rsi_numpy(values: np.ndarray, period: int) -> float:
+    """Wilderの平滑化によるRSIの最新値をNumPyのベクトル演算で計算（欠損値を含まない配列）
+
+    平滑化 avg = (avg * (period - 1) + x) / period を展開し、初期値（最初のperiod個の単純平均）と
+    以降の上昇幅・下落幅それぞれへの減衰重みの内積として最新の平均を求める。
+    """
+    deltas = np.diff(values)
+    gains = np.maximum(deltas, 0.0)
+    losses = np.maximum(-deltas, 0.0)
+    decay = (period - 1) / period
+    steps = len(deltas) - period
+    # 初期値以降の差分に掛かる重み（最新の差分が1/period）
+    weights = decay ** np.arange(steps - 1, -1, -1) / period
+    seed_weight = decay ** steps
+    avg_gain = gains[:period].mean() * seed_weight + weights @ gains[period:]
+    avg_loss = losses[:period].mean() * seed_weight + weights @ losses[period:]
+    # _wilder_rsiと同様に、値動きがない場合はNaN、下落がない場合は100
+    if avg_loss > 0.0:
+        return 100.0 - 100.0 / (1.0 + avg_gain / avg_loss)
+    return 100.0 if avg_gain > 0.0 else np.nan
+
+def latest_wilder_rsi(values: np.ndarray, period: int = 14) -> float:
+    """Wilderの平滑化によるRSIの最新値を計算（期間に満たない場合はNaN）
+
+    Numbaが利用できない場合、欠損値を含まない配列はPythonのループではなくベクトル演算で計算する。
+    """
+    if len(values) <= period:
+        return np.nan
+    values = np.asarray(values, dtype=float)
+    if not NUMBA_AVAILABLE and not np.isnan(values).any():
+        return float(_latest_wilder_rsi_numpy(values, period))
+    return float(wilder_rsi_arrays(values, period, new_rsi_state())[-1])
+
+def latest_smas(values: np.ndarray, periods: Tuple[int, ...]) -> np.ndarray:
+    """複数期間の単純移動平均の最新値を、末尾から遡る累積和1回でまとめて計算
+
+    各期間の平均は最長期間の末尾を逆順に累積した和から取り出す（データが期間に満たない場合はNaN）。
+    """
+    period_array = np.asarray(periods)
+    tail_sums = np.cumsum(values[:-int(period_array.max()) - 1:-1])
+    available = period_array <= len(values)
+    smas = np.full(len(period_array), np.nan)
+    smas[available] = tail_sums[period_array[available] - 1] / period_array[available]
+    return smas
+
+def latest_volatilities(closes: np.ndarray, periods: Tuple[int, ...]) -> np.ndarray:
+    """複数期間のボラティリティ（年率換算した日次リターンの標準偏差）の最新値をまとめて計算
+
+    日次リターンは最長期間の末尾分だけを一度計算し、各期間はその末尾のビューから集計する
+    （データが期間+1本に満たない場合はNaN）。
+    """
+    period_array = np.asarray(periods)
+    tail = closes[-int(period_array.max()) - 1:]
+    returns = tail[1:] / tail[:-1] - 1
+    volatilities = np.full(len(period_array), np.nan)
+    for i, period in enumerate(period_array.tolist()):
+        if period < len(closes):
+            volatilities[i] = returns[-period:].std(ddof=1) * ANNUALIZATION_FACTOR
+    return volatilities
+
+def latest_price_changes(closes: np.ndarray, periods: Tuple[int, ...]) -> np.ndarray:
+    """複数期間の価格変動率（%）の最新値を終値配列の1回の参照でまとめて計算
+
+    系列版（(prices / prices.shift(period) - 1) * 100）の最新値と同じ値を返し、
+    データが期間に満たない場合はNaNとする。
+    """
+    period_array = np.asarray(periods)
+    available = period_array < len(closes)
+    changes = np.full(len(period_array), np.nan)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        changes[available] = (closes[-1] / closes[-period_array[available] - 1] - 1) * 100
+    return changes
+
+def _wilder_rsi_pandas(prices, period: int):
+    """wilder_rsiと同じRSIをpandasのewm（adjust=False）で計算（Numbaが利用できない場合）"""
+    delta = prices.diff()
+    valid = delta.notna()
+    count = valid.cumsum()
+
+    def smooth(values):
+        # period個目の差分の位置に単純平均を置き、以降をWilderの平滑化（alpha=1/period）で更新
+        seed = values.fillna(0).cumsum() / period
+        values = values.where(count > period).mask(valid & (count == period), seed)
+        return values.ewm(alpha=1 / period, adjust=False, ignore_na=True).mean()
+
+    rs = smooth(delta.clip(lower=0)) / smooth((-delta).clip(lower=0))
+    return (100 - (100 / (1 + rs))).where(valid & (count >= period))
+
+def wilder_rsi(prices, period: int = 14):
+    """Wilderの平滑化によるRSIの系列を計算（DataFrameの場合は列ごと）"""
+    if not NUMBA_AVAILABLE:
+        return _wilder_rsi_pandas(prices, period)
+    if isinstance(prices, pd.DataFrame):
+        return prices.apply(lambda column: wilder_rsi(column, period))
+    return pd.Series(wilder_rsi_arrays(prices.to_numpy(dtype=float), period, new_rsi_state()),
+                     index=prices.index, name=prices.name)
+
+def stochastic(high: pd.Series, low: pd.Series, close: pd.Series, k_period: int = 14,
+               d_period: int = 3) -> Tuple[pd.Series, pd.Series]:
+    """ストキャスティクス（%K・%D）の系列を計算
+
+    3系列のラベルが揃っている場合は、移動最小・最大・平均をbottleneck（DataFrameの場合は列ごと）または
+    ウィンドウのビューで計算する（欠損値を含むウィンドウはpandasのrollingと同様にNaN）。
+    ラベルが揃っていない場合は、位置合わせのためpandasで計算する。float32の系列はfloat32のまま計算する。
+    """
+    if not _same_labels(high, low, close):
+        lowest_low = low.rolling(window=k_period).min()
+        highest_high = high.rolling(window=k_period).max()
+        stoch_k = 100 * ((close - lowest_low) / (highest_high - lowest_low))
+        return stoch_k, stoch_k.rolling(window=d_period).mean()
+
+    low_values = _float_values(low)
+    high_values = _float_values(high)
+    # bottleneckは期間より短いデータを扱えないため、その場合もウィンドウのビューで計算
+    use_bottleneck = bn is not None and len(close) >= max(k_period, d_period)
+    if use_bottleneck:
+        lowest_low = bn.move_min(low_values, window=k_period, axis=0)
+        highest_high = bn.move_max(high_values, window=k_period, axis=0)
+    else:
+        lowest_low = _moving_reduce(low_values, k_period, np.min)
+        highest_high = _moving_reduce(high_values, k_period, np.max)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        stoch_k = 100 * ((_float_values(close) - lowest_low) / (highest_high - lowest_low))
+    if use_bottleneck:
+        stoch_d = bn.move_mean(stoch_k, window=d_period, axis=0)
+    else:
+        stoch_d = _moving_reduce(stoch_k, d_period, np.mean)
+    return _like(stoch_k, close), _like(stoch_d, close)
+
+def _same_labels(*frames) -> bool:
+    """Series・DataFrameの型とインデックス（DataFrameの場合は列も）がすべて一致するか"""
+    first = frames[0]
+    return all(
+        type(frame) is type(first) and frame.index.equals(first.index)
+        and (not isinstance(frame, pd.DataFrame) or frame.columns.equals(first.columns))
+        for frame in frames[1:]
+    )
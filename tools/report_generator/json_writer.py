@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+JSON書き出しモジュール
+サマリーファイル等の書き出し・読み込みを共通化（orjsonが利用可能な場合は高速に処理する）
+"""
+
+import json
+import logging
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any
+
+import numpy as np
+
+from .file_writer import write_bytes_file
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+
+def _json_default(value: Any) -> Any:
+    """標準では直列化できない型を変換"""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps_json(data: Any) -> bytes:
+    """データをインデント付きのUTF-8 JSONバイト列に変換"""
+    if orjson is not None:
+        return orjson.dumps(
+            data,
+            default=_json_default,
+            option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+        )
+    return json.dumps(data, ensure_ascii=False, indent=2, default=_json_default).encode('utf-8')
+
+
+def loads_json(data: bytes) -> Any:
+    """JSONバイト列を読み込み（標準jsonで書き出したNaN等を含む場合は標準jsonで読み込む）"""
+    if orjson is not None:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            pass
+    return json.loads(data)
+
+
+def write_json(file_path: str, data: Any) -> None:
+    """データをJSONファイルに書き出し（datetime・NumPy型はそのまま渡せる）"""
+    write_bytes_file(file_path, dumps_json(data))
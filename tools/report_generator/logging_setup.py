@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+ロギング設定モジュール
+ログ出力をキュー経由でバックグラウンドスレッドに委譲し、処理スレッドをファイル書き込みで止めない
+ファイルへはメモリ上にまとめたログを一括で書き出す
+ワーカープロセスのログは親プロセスへ転送し、ファイルへの書き出しは親プロセスだけが行う
+"""
+
+import atexit
+import logging
+import logging.handlers
+import multiprocessing
+import queue
+import sys
+from typing import Optional
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+# ファイルへ書き出すまでメモリに溜めるログ件数（WARNING以上は即時に書き出す）
+# 異常終了時に失われるのは直近のINFO以下のログに限られるよう小さめにする
+LOG_BUFFER_CAPACITY = 100
+
+
+def _stop_listener(listener: logging.handlers.QueueListener) -> None:
+    """キューに残ったログを処理してスレッドを停止し、バッファのログを書き出す"""
+    listener.stop()
+    for handler in listener.handlers:
+        handler.flush()
+
+
+def setup_queue_logging(log_file: str, level: int = logging.INFO) -> Optional[logging.handlers.QueueListener]:
+    """QueueHandler/QueueListenerでルートロガーを設定
+
+    logging.basicConfigと同様に、ルートロガーが設定済みの場合は何もしない。
+    multiprocessingのワーカープロセス（spawnでスクリプトが再importされる場合を含む）でも何もせず、
+    ログはinit_worker_loggingで親プロセスへ転送する。
+
+    Args:
+        log_file: ログファイルのパス
+        level: ルートロガーのログレベル
+
+    Returns:
+        開始したQueueListener（設定済みの場合はNone）
+    """
+    root = logging.getLogger()
+    if root.handlers or multiprocessing.parent_process() is not None:
+        return None
+
+    formatter = logging.Formatter(LOG_FORMAT)
+    stream_handler = logging.StreamHandler(sys.stdout)
+    file_handler = logging.FileHandler(log_file, encoding='utf-8')
+    for handler in (stream_handler, file_handler):
+        handler.setFormatter(formatter)
+    
+    # 1件ごとのファイル書き込みを避け、LOG_BUFFER_CAPACITY件ごとにまとめて書き出す
+    # （残りのログは終了時のlogging.shutdownで書き出される）
+    buffered_file_handler = logging.handlers.MemoryHandler(
+        LOG_BUFFER_CAPACITY, flushLevel=logging.WARNING, target=file_handler
+    )
+
+    log_queue = queue.Queue(-1)
+    root.setLevel(level)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+
+    listener = logging.handlers.QueueListener(
+        log_queue, stream_handler, buffered_file_handler, respect_handler_level=True
+    )
+    listener.start()
+    # 終了時に残りのログを書き出してからスレッドを停止
+    atexit.register(_stop_listener, listener)
+    return listener
+
+
+class _LoggerDispatchHandler(logging.Handler):
+    """ワーカープロセスから届いたログを、このプロセスの同名のロガーで処理する"""
+
+    def emit(self, record: logging.LogRecord) -> None:
+        logging.getLogger(record.name).handle(record)
+
+
+def start_worker_log_listener(context) -> logging.handlers.QueueListener:
+    """ワーカープロセスのログを受け取るQueueListenerを開始
+
+    ワーカーはinit_worker_loggingでlistener.queueへログを送り、
+    このプロセスのハンドラー（画面・ファイル）で出力する。プール終了後にstop()で停止する。
+
+    Args:
+        context: ワーカープロセスを起動するmultiprocessingのコンテキスト
+    """
+    listener = logging.handlers.QueueListener(context.Queue(-1), _LoggerDispatchHandler())
+    listener.start()
+    return listener
+
+
+def init_worker_logging(log_queue, level: int = logging.INFO) -> None:
+    """ワーカープロセスのルートロガーを、親プロセスへログを送るQueueHandlerだけにする"""
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.setLevel(level)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
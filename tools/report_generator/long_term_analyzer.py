@@ -8,10 +8,20 @@ import logging
 import pandas as pd
 import numpy as np
 from typing import Dict, Optional, Tuple, List
-from datetime import datetime, timedelta
+
+from .analyzer import StockAnalyzer
+from .formatters import current_timestamp
+from .indicator_kernels import (BB_SIGMA, latest_ewm_mean, latest_macd_values, latest_price_changes, latest_smas,
+                                latest_volatilities, latest_wilder_rsi)
 
 logger = logging.getLogger(__name__)
 
+# 価格変動率の指標名と期間（長期分析・データ不足時の基本分析）
+_LONG_TERM_PRICE_CHANGE_PERIODS = (
+    ('price_change_50d', 50), ('price_change_100d', 100), ('price_change_200d', 200), ('price_change_1y', 252)
+)
+_SHORT_TERM_PRICE_CHANGE_PERIODS = (('price_change_5d', 5), ('price_change_10d', 10), ('price_change_20d', 20))
+
 class LongTermStockAnalyzer:
     """長期株式分析クラス"""
     
@@ -19,354 +29,241 @@ class LongTermStockAnalyzer:
         self.indicators = {}
     
     def calculate_long_term_indicators(self, price_data: pd.DataFrame) -> Dict:
-        """長期トレード向けテクニカル指標を計算"""
+        """長期トレード向けテクニカル指標を計算
+        
+        最新値のみが必要なため、pandasからNumPy配列への変換は最初の1回だけ行い、
+        各指標は配列の末尾（EMA系・RSIは全期間の走査）から直接計算する。
+        """
         if price_data is None or price_data.empty:
             logger.warning("株価データが空です")
             return {}
         
         try:
-            # 終値データを取得
-            close_prices = price_data['close_price'].dropna()
-            high_prices = price_data['high_price'].dropna()
-            low_prices = price_data['low_price'].dropna()
-            volumes = price_data['volume'].dropna()
+            # 終値・高値・安値・出来高を取得（いずれかが欠損した足は全列から除外し、列間で足の位置を揃える）
+            closes, highs, lows, volumes = StockAnalyzer._complete_bars(StockAnalyzer._price_arrays(price_data))
             
             # データ不足時の動的対応
-            data_length = len(close_prices)
+            data_length = len(closes)
             logger.info(f"利用可能なデータ日数: {data_length}日")
             
             if data_length < 50:
                 logger.warning("長期分析には最低50日以上の株価データが必要です")
-                return self._calculate_limited_indicators(close_prices, high_prices, low_prices, volumes, data_length)
+                return self._calculate_limited_indicators(closes, highs, lows, volumes, data_length)
             
             # データ期間に応じた指標計算
             indicators = {}
             
-            # 1. 長期移動平均（利用可能な期間で計算）
-            if data_length >= 50:
-                indicators['sma_50'] = self._calculate_sma(close_prices, 50)
-            if data_length >= 100:
-                indicators['sma_100'] = self._calculate_sma(close_prices, 100)
-            if data_length >= 200:
-                indicators['sma_200'] = self._calculate_sma(close_prices, 200)
+            # 1. 長期移動平均（利用可能な期間で、末尾の累積和からまとめて計算）
+            for period, sma in zip((50, 100, 200), latest_smas(closes, (50, 100, 200)).tolist()):
+                if data_length >= period:
+                    indicators[f'sma_{period}'] = sma
             
             # 2. 指数移動平均（利用可能な期間で計算）
-            if data_length >= 50:
-                indicators['ema_50'] = self._calculate_ema(close_prices, 50)
-            if data_length >= 100:
-                indicators['ema_100'] = self._calculate_ema(close_prices, 100)
-            if data_length >= 200:
-                indicators['ema_200'] = self._calculate_ema(close_prices, 200)
+            for period in (50, 100, 200):
+                if data_length >= period:
+                    indicators[f'ema_{period}'] = latest_ewm_mean(closes, period)
             
             # 3. 長期RSI（利用可能な期間で計算）
             if data_length >= 26:
-                indicators['rsi_26'] = self._calculate_rsi(close_prices, 26)
+                indicators['rsi_26'] = latest_wilder_rsi(closes, 26)
             if data_length >= 52:
-                indicators['rsi_52'] = self._calculate_rsi(close_prices, 52)
+                indicators['rsi_52'] = latest_wilder_rsi(closes, 52)
             
             # 4. 長期ボリンジャーバンド（利用可能な期間で計算）
             if data_length >= 50:
-                bb_upper_50, bb_middle_50, bb_lower_50 = self._calculate_bollinger_bands(close_prices, 50)
+                bb_upper_50, bb_middle_50, bb_lower_50 = self._latest_bollinger_bands(closes, 50)
                 indicators['bb_upper_50'] = bb_upper_50
                 indicators['bb_middle_50'] = bb_middle_50
                 indicators['bb_lower_50'] = bb_lower_50
             
             # 5. 長期MACD（利用可能な期間で計算）
             if data_length >= 26:
-                macd_line_26, macd_signal_26, macd_histogram_26 = self._calculate_macd_long_term(close_prices)
+                macd_line_26, macd_signal_26, macd_histogram_26 = latest_macd_values(closes, 12, 26, 9)
                 indicators['macd_line_26'] = macd_line_26
                 indicators['macd_signal_26'] = macd_signal_26
                 indicators['macd_histogram_26'] = macd_histogram_26
             
             # 6. 長期ストキャスティクス（利用可能な期間で計算）
             if data_length >= 26:
-                stoch_k_26, stoch_d_26 = self._calculate_stochastic(high_prices, low_prices, close_prices, 26, 9)
+                stoch_k_26, stoch_d_26 = self._latest_stochastic(highs, lows, closes, 26, 9)
                 indicators['stoch_k_26'] = stoch_k_26
                 indicators['stoch_d_26'] = stoch_d_26
             
             # 7. 長期価格変動分析（利用可能な期間で計算）
-            if data_length >= 50:
-                indicators['price_change_50d'] = self._calculate_price_change(close_prices, 50)
-            if data_length >= 100:
-                indicators['price_change_100d'] = self._calculate_price_change(close_prices, 100)
-            if data_length >= 200:
-                indicators['price_change_200d'] = self._calculate_price_change(close_prices, 200)
-            if data_length >= 252:
-                indicators['price_change_1y'] = self._calculate_price_change(close_prices, 252)
-            
-            # 8. 長期ボラティリティ（利用可能な期間で計算）
-            if data_length >= 50:
-                indicators['volatility_50d'] = self._calculate_volatility(close_prices, 50)
-            if data_length >= 100:
-                indicators['volatility_100d'] = self._calculate_volatility(close_prices, 100)
-            if data_length >= 200:
-                indicators['volatility_200d'] = self._calculate_volatility(close_prices, 200)
+            self._add_price_changes(indicators, closes, data_length, _LONG_TERM_PRICE_CHANGE_PERIODS)
+            
+            # 8. 長期ボラティリティ（利用可能な期間で、日次リターンは一度だけ計算）
+            for period, volatility in zip((50, 100, 200), latest_volatilities(closes, (50, 100, 200)).tolist()):
+                if data_length >= period:
+                    indicators[f'volatility_{period}d'] = volatility
             
             # 9. トレンド分析（利用可能な期間で計算）
-            if data_length >= 200:
-                indicators['trend_strength'] = self._calculate_trend_strength(close_prices, 200)
-                indicators['trend_direction'] = self._calculate_trend_direction(close_prices, 200)
-            elif data_length >= 100:
-                indicators['trend_strength'] = self._calculate_trend_strength(close_prices, 100)
-                indicators['trend_direction'] = self._calculate_trend_direction(close_prices, 100)
-            elif data_length >= 50:
-                indicators['trend_strength'] = self._calculate_trend_strength(close_prices, 50)
-                indicators['trend_direction'] = self._calculate_trend_direction(close_prices, 50)
-            
-            # 10. サポート・レジスタンス分析（利用可能な期間で計算）
+            trend_period = 200 if data_length >= 200 else 100 if data_length >= 100 else 50
+            indicators['trend_strength'] = self._calculate_trend_strength(closes, trend_period)
+            indicators['trend_direction'] = self._calculate_trend_direction(closes, trend_period)
+            
+            # 10. サポート・レジスタンス分析（利用可能な期間で計算、各レベルの最後の値のみ保持）
             lookback = min(data_length, 200)
-            support_levels, resistance_levels = self._calculate_support_resistance(close_prices, lookback)
-            indicators['support_levels'] = support_levels
-            indicators['resistance_levels'] = resistance_levels
+            support_levels, resistance_levels = self._calculate_support_resistance(closes, lookback)
+            indicators['support_levels'] = support_levels[-1] if support_levels else None
+            indicators['resistance_levels'] = resistance_levels[-1] if resistance_levels else None
             
             # 11. 長期出来高分析（利用可能な期間で計算）
             if data_length >= 50:
-                indicators['volume_sma_50'] = self._calculate_sma(volumes, 50)
-                indicators['volume_ratio_50'] = self._calculate_volume_ratio(volumes, 50)
-            
-            # 最新値のみを返す
-            latest_indicators = {}
-            for key, values in indicators.items():
-                try:
-                    if values is not None:
-                        # デバッグ情報
-                        logger.debug(f"処理中: {key}, 型: {type(values)}, 値: {values}")
-                        
-                        if hasattr(values, 'iloc'):
-                            # pandas Seriesの場合
-                            if len(values) > 0:
-                                latest_value = values.iloc[-1]
-                                # NaNチェックと型変換
-                                if pd.isna(latest_value):
-                                    latest_indicators[key] = None
-                                else:
-                                    latest_indicators[key] = float(latest_value) if isinstance(latest_value, (int, float, np.number)) else latest_value
-                            else:
-                                latest_indicators[key] = None
-                        elif isinstance(values, (list, tuple)):
-                            # リストまたはタプルの場合
-                            if len(values) > 0:
-                                latest_value = values[-1]
-                                # NaNチェックと型変換
-                                if pd.isna(latest_value):
-                                    latest_indicators[key] = None
-                                else:
-                                    latest_indicators[key] = float(latest_value) if isinstance(latest_value, (int, float, np.number)) else latest_value
-                            else:
-                                latest_indicators[key] = None
-                        elif isinstance(values, (int, float, str, bool, np.number)):
-                            # スカラー値の場合
-                            if pd.isna(values):
-                                latest_indicators[key] = None
-                            else:
-                                latest_indicators[key] = float(values) if isinstance(values, (int, float, np.number)) else values
-                        else:
-                            # その他の型
-                            latest_indicators[key] = values
-                    else:
-                        latest_indicators[key] = None
-                except Exception as e:
-                    logger.warning(f"指標 {key} の処理中にエラー: {e}")
-                    latest_indicators[key] = None
-            
-            return latest_indicators
+                indicators['volume_sma_50'] = self._latest_sma(volumes, 50)
+                indicators['volume_ratio_50'] = self._latest_volume_ratio(volumes, 50)
+            
+            # 数値はfloatに揃え、NaNはNoneとして返す
+            return {key: self._to_indicator_value(value) for key, value in indicators.items()}
             
         except Exception as e:
             logger.error(f"長期テクニカル指標計算中にエラー: {e}")
             return {}
     
-    def _calculate_limited_indicators(self, close_prices: pd.Series, high_prices: pd.Series, 
-                                    low_prices: pd.Series, volumes: pd.Series, data_length: int) -> Dict:
+    def _calculate_limited_indicators(self, closes: np.ndarray, highs: np.ndarray,
+                                      lows: np.ndarray, volumes: np.ndarray, data_length: int) -> Dict:
         """データ不足時の限定的な指標計算"""
         indicators = {}
         
         try:
             # 利用可能な期間で基本指標を計算
             if data_length >= 20:
-                indicators['sma_20'] = self._calculate_sma(close_prices, 20)
-                indicators['ema_20'] = self._calculate_ema(close_prices, 20)
-                indicators['rsi_14'] = self._calculate_rsi(close_prices, 14)
+                indicators['sma_20'] = self._latest_sma(closes, 20)
+                indicators['ema_20'] = latest_ewm_mean(closes, 20)
+                indicators['rsi_14'] = latest_wilder_rsi(closes, 14)
                 
                 # 短期ボリンジャーバンド
-                bb_upper_20, bb_middle_20, bb_lower_20 = self._calculate_bollinger_bands(close_prices, 20)
+                bb_upper_20, bb_middle_20, bb_lower_20 = self._latest_bollinger_bands(closes, 20)
                 indicators['bb_upper_20'] = bb_upper_20
                 indicators['bb_middle_20'] = bb_middle_20
                 indicators['bb_lower_20'] = bb_lower_20
             
             if data_length >= 14:
                 # 短期ストキャスティクス
-                stoch_k_14, stoch_d_14 = self._calculate_stochastic(high_prices, low_prices, close_prices, 14, 3)
+                stoch_k_14, stoch_d_14 = self._latest_stochastic(highs, lows, closes, 14, 3)
                 indicators['stoch_k_14'] = stoch_k_14
                 indicators['stoch_d_14'] = stoch_d_14
             
             # 価格変動率（利用可能な期間で計算）
-            if data_length >= 5:
-                indicators['price_change_5d'] = self._calculate_price_change(close_prices, 5)
-            if data_length >= 10:
-                indicators['price_change_10d'] = self._calculate_price_change(close_prices, 10)
-            if data_length >= 20:
-                indicators['price_change_20d'] = self._calculate_price_change(close_prices, 20)
+            self._add_price_changes(indicators, closes, data_length, _SHORT_TERM_PRICE_CHANGE_PERIODS)
             
             # トレンド分析（利用可能な期間で計算）
             if data_length >= 20:
-                indicators['trend_strength'] = self._calculate_trend_strength(close_prices, 20)
-                indicators['trend_direction'] = self._calculate_trend_direction(close_prices, 20)
+                indicators['trend_strength'] = self._calculate_trend_strength(closes, 20)
+                indicators['trend_direction'] = self._calculate_trend_direction(closes, 20)
             
-            # サポート・レジスタンス分析
+            # サポート・レジスタンス分析（各レベルの最後の値のみ保持）
             lookback = min(data_length, 50)
-            support_levels, resistance_levels = self._calculate_support_resistance(close_prices, lookback)
-            indicators['support_levels'] = support_levels
-            indicators['resistance_levels'] = resistance_levels
-            
-            # 最新値のみを返す
-            latest_indicators = {}
-            for key, values in indicators.items():
-                try:
-                    if values is not None:
-                        if hasattr(values, 'iloc'):
-                            # pandas Seriesの場合
-                            if len(values) > 0:
-                                latest_indicators[key] = values.iloc[-1]
-                            else:
-                                latest_indicators[key] = None
-                        elif isinstance(values, (list, tuple)):
-                            # リストまたはタプルの場合
-                            if len(values) > 0:
-                                latest_indicators[key] = values[-1]
-                            else:
-                                latest_indicators[key] = None
-                        elif isinstance(values, (int, float, str, bool)):
-                            # スカラー値の場合
-                            latest_indicators[key] = values
-                        else:
-                            # その他の型
-                            latest_indicators[key] = values
-                    else:
-                        latest_indicators[key] = None
-                except Exception as e:
-                    logger.warning(f"限定的指標 {key} の処理中にエラー: {e}")
-                    latest_indicators[key] = None
-            
-            return latest_indicators
+            support_levels, resistance_levels = self._calculate_support_resistance(closes, lookback)
+            indicators['support_levels'] = support_levels[-1] if support_levels else None
+            indicators['resistance_levels'] = resistance_levels[-1] if resistance_levels else None
+            
+            return indicators
             
         except Exception as e:
             logger.error(f"限定的指標計算中にエラー: {e}")
             return {}
     
-    def _calculate_sma(self, prices: pd.Series, period: int) -> pd.Series:
-        """単純移動平均を計算"""
-        return prices.rolling(window=period).mean()
-    
-    def _calculate_ema(self, prices: pd.Series, period: int) -> pd.Series:
-        """指数移動平均を計算"""
-        return prices.ewm(span=period).mean()
+    @staticmethod
+    def _to_indicator_value(value):
+        """指標の最新値を返却用に変換（数値はfloat、NaNはNone）"""
+        if isinstance(value, (int, float, np.number)) and not isinstance(value, bool):
+            return None if np.isnan(value) else float(value)
+        return value
     
-    def _calculate_rsi(self, prices: pd.Series, period: int = 14) -> pd.Series:
-        """RSIを計算"""
-        delta = prices.diff()
-        gain = (delta.where(delta > 0, 0)).rolling(window=period).mean()
-        loss = (-delta.where(delta < 0, 0)).rolling(window=period).mean()
-        rs = gain / loss
-        rsi = 100 - (100 / (1 + rs))
-        return rsi
+    # 以下は最新値のみを返す版（期間に満たない場合はNaN）
     
-    def _calculate_macd_long_term(self, prices: pd.Series) -> Tuple[pd.Series, pd.Series, pd.Series]:
-        """長期MACDを計算（26週、12週）"""
-        ema_12 = prices.ewm(span=12).mean()  # 12週EMA
-        ema_26 = prices.ewm(span=26).mean()  # 26週EMA
-        macd_line = ema_12 - ema_26
-        macd_signal = macd_line.ewm(span=9).mean()
-        macd_histogram = macd_line - macd_signal
-        return macd_line, macd_signal, macd_histogram
+    def _latest_sma(self, values: np.ndarray, period: int) -> float:
+        """単純移動平均の最新値を計算"""
+        if len(values) < period:
+            return np.nan
+        return float(values[-period:].mean())
     
-    def _calculate_bollinger_bands(self, prices: pd.Series, period: int = 20) -> Tuple[pd.Series, pd.Series, pd.Series]:
-        """ボリンジャーバンドを計算"""
-        sma = prices.rolling(window=period).mean()
-        std = prices.rolling(window=period).std()
-        bb_upper = sma + (std * 2)
-        bb_lower = sma - (std * 2)
-        return bb_upper, sma, bb_lower
+    def _latest_bollinger_bands(self, values: np.ndarray, period: int = 20) -> Tuple[float, float, float]:
+        """ボリンジャーバンドの最新値を計算"""
+        if len(values) < period:
+            return np.nan, np.nan, np.nan
+        window = values[-period:]
+        sma = float(window.mean())
+        std = float(window.std(ddof=1))
+        return sma + (std * BB_SIGMA), sma, sma - (std * BB_SIGMA)
     
-    def _calculate_stochastic(self, high: pd.Series, low: pd.Series, close: pd.Series, 
-                            k_period: int = 14, d_period: int = 3) -> Tuple[pd.Series, pd.Series]:
-        """ストキャスティクスを計算"""
-        lowest_low = low.rolling(window=k_period).min()
-        highest_high = high.rolling(window=k_period).max()
-        stoch_k = 100 * ((close - lowest_low) / (highest_high - lowest_low))
-        stoch_d = stoch_k.rolling(window=d_period).mean()
-        return stoch_k, stoch_d
+    def _latest_stochastic(self, high: np.ndarray, low: np.ndarray, close: np.ndarray,
+                           k_period: int = 14, d_period: int = 3) -> Tuple[float, float]:
+        """ストキャスティクス（%K・%D）の最新値を計算"""
+        length = min(len(high), len(low), len(close))
+        if length < k_period:
+            return np.nan, np.nan
+        # %Dの計算に必要な末尾d_period本分の%Kを計算
+        count = min(d_period, length - k_period + 1)
+        window = k_period + count - 1
+        lowest_low = np.lib.stride_tricks.sliding_window_view(low[-window:], k_period).min(axis=1)
+        highest_high = np.lib.stride_tricks.sliding_window_view(high[-window:], k_period).max(axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            stoch_k = 100 * ((close[-count:] - lowest_low) / (highest_high - lowest_low))
+        stoch_d = float(stoch_k.mean()) if count == d_period else np.nan
+        return float(stoch_k[-1]), stoch_d
     
-    def _calculate_volume_ratio(self, volumes: pd.Series, period: int = 20) -> pd.Series:
-        """出来高比率を計算"""
-        volume_sma = volumes.rolling(window=period).mean()
-        return volumes / volume_sma
+    def _latest_volume_ratio(self, volumes: np.ndarray, period: int = 20) -> float:
+        """出来高比率の最新値を計算"""
+        if len(volumes) < period:
+            return np.nan
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return float(np.float64(volumes[-1]) / volumes[-period:].mean())
     
-    def _calculate_price_change(self, prices: pd.Series, period: int) -> pd.Series:
-        """価格変動率を計算"""
-        return ((prices / prices.shift(period)) - 1) * 100
+    def _add_price_changes(self, indicators: Dict, closes: np.ndarray, data_length: int,
+                           periods: Tuple[Tuple[str, int], ...]):
+        """データ期間を満たす価格変動率の最新値をまとめて計算して指標に追加"""
+        available = [(key, period) for key, period in periods if data_length >= period]
+        if not available:
+            return
+        changes = latest_price_changes(closes, tuple(period for _, period in available))
+        for (key, _), change in zip(available, changes):
+            indicators[key] = change
     
-    def _calculate_volatility(self, prices: pd.Series, period: int) -> pd.Series:
-        """ボラティリティ（標準偏差）を計算"""
-        returns = prices.pct_change()
-        return returns.rolling(window=period).std() * np.sqrt(252)  # 年率換算
-    
-    def _calculate_trend_strength(self, prices: pd.Series, period: int) -> float:
+    def _calculate_trend_strength(self, prices: np.ndarray, period: int) -> float:
         """トレンドの強さを計算（ADX風）"""
         if len(prices) < period:
             return 0.0
         
-        # 簡易的なトレンド強度計算
-        sma_short = prices.rolling(window=20).mean()
-        sma_long = prices.rolling(window=period).mean()
-        
-        # NaN値を除外して有効なデータを確認
-        sma_short_valid = sma_short.dropna()
-        sma_long_valid = sma_long.dropna()
-        
-        if len(sma_short_valid) > 0 and len(sma_long_valid) > 0:
-            trend_strength = abs((sma_short_valid.iloc[-1] - sma_long_valid.iloc[-1]) / sma_long_valid.iloc[-1]) * 100
-            return min(trend_strength, 100)  # 最大100%に制限
-        return 0.0
+        # 簡易的なトレンド強度計算（20日と期間の移動平均の乖離率）
+        sma_short = prices[-20:].mean()
+        sma_long = prices[-period:].mean()
+        trend_strength = abs((sma_short - sma_long) / sma_long) * 100
+        return min(trend_strength, 100)  # 最大100%に制限
     
-    def _calculate_trend_direction(self, prices: pd.Series, period: int) -> str:
+    def _calculate_trend_direction(self, prices: np.ndarray, period: int) -> str:
         """トレンド方向を判定"""
         if len(prices) < period:
             return "不明"
         
-        sma_short = prices.rolling(window=20).mean()
-        sma_long = prices.rolling(window=period).mean()
-        
-        # NaN値を除外して有効なデータを確認
-        sma_short_valid = sma_short.dropna()
-        sma_long_valid = sma_long.dropna()
-        
-        if len(sma_short_valid) > 0 and len(sma_long_valid) > 0:
-            if sma_short_valid.iloc[-1] > sma_long_valid.iloc[-1]:
-                return "上昇トレンド"
-            elif sma_short_valid.iloc[-1] < sma_long_valid.iloc[-1]:
-                return "下降トレンド"
-            else:
-                return "横ばい"
-        return "不明"
+        sma_short = prices[-20:].mean()
+        sma_long = prices[-period:].mean()
+        if sma_short > sma_long:
+            return "上昇トレンド"
+        elif sma_short < sma_long:
+            return "下降トレンド"
+        else:
+            return "横ばい"
     
-    def _calculate_support_resistance(self, prices: pd.Series, lookback: int) -> Tuple[List[float], List[float]]:
+    def _calculate_support_resistance(self, prices: np.ndarray, lookback: int) -> Tuple[List[float], List[float]]:
         """サポート・レジスタンスレベルを計算"""
         if len(prices) < lookback:
             return [], []
         
-        recent_prices = prices.tail(lookback)
+        recent_prices = prices[-lookback:]
         
         # 簡易的なサポート・レジスタンス計算
         support_levels = [
             float(recent_prices.min()),
-            float(recent_prices.quantile(0.25)),
-            float(recent_prices.quantile(0.33))
+            float(np.quantile(recent_prices, 0.25)),
+            float(np.quantile(recent_prices, 0.33))
         ]
         
         resistance_levels = [
             float(recent_prices.max()),
-            float(recent_prices.quantile(0.75)),
-            float(recent_prices.quantile(0.67))
+            float(np.quantile(recent_prices, 0.75)),
+            float(np.quantile(recent_prices, 0.67))
         ]
         
         return support_levels, resistance_levels
@@ -467,7 +364,7 @@ class LongTermStockAnalyzer:
                 'current_price': current_price,
                 'indicators': indicators,
                 'signals': signals,
-                'analysis_date': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                'analysis_date': current_timestamp(),
                 'data_points': len(price_data) if price_data is not None else 0
             }
             
@@ -478,5 +375,5 @@ class LongTermStockAnalyzer:
             return {
                 'stock_info': stock_info,
                 'error': str(e),
-                'analysis_date': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                'analysis_date': current_timestamp()
             }
@@ -4,7 +4,7 @@
 SQLAlchemy ORMを使用してテーブル構造を定義
 """
 
-from sqlalchemy import Column, Integer, String, Numeric, Date, DateTime, Text, BigInteger
+from sqlalchemy import Column, Integer, String, Numeric, Date, DateTime, Text, BigInteger, UniqueConstraint
 from sqlalchemy.ext.declarative import declarative_base
 
 Base = declarative_base()
@@ -84,3 +84,15 @@ class BacktestResult(Base):
     avg_trade_return = Column(Numeric(8, 4))
     benchmark_return = Column(Numeric(8, 4))
     created_at = Column(DateTime)
+
+class AnalysisCache(Base):
+    """分析結果キャッシュテーブルモデル（株価データのフィンガープリントごとに最新の結果を保持）"""
+    __tablename__ = 'analysis_cache'
+    __table_args__ = (UniqueConstraint('stock_code', 'investment_style'),)
+    
+    cache_id = Column(Integer, primary_key=True)
+    stock_code = Column(String(10), nullable=False)
+    investment_style = Column(String(20), nullable=False)
+    data_fingerprint = Column(String(64), nullable=False)
+    result_json = Column(Text, nullable=False)
+    updated_at = Column(DateTime)
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+レポート分析結果キャッシュモジュール
+レポート生成時の分析結果をディスクに保存し、一覧ページ生成時・再実行時の再分析を省略する
+"""
+
+import logging
+import os
+import pickle
+from typing import Dict, Optional
+
+import pandas as pd
+
+from .analyzer import compute_data_fingerprint
+from .json_writer import dumps_json, loads_json
+
+logger = logging.getLogger(__name__)
+
+# 短期・長期レポートと一覧ページで共有するキャッシュの保存先
+REPORT_CACHE_DIR = os.path.join("reports", ".cache")
+
+# 一覧ページが読み込む株価履歴の件数（DataFetcher.get_all_stock_dataの取得件数）
+# 長期レポートは5年分のデータで分析するため、一覧ページと共有するキーはこの件数の末尾から計算する
+SUMMARY_PRICE_ROWS = 365
+
+class ReportCache:
+    """銘柄・分析種別ごとの分析結果キャッシュ
+
+    株価データ全体（日付・OHLCV）から計算したキーが一致する場合のみ有効とし、
+    最新の足の追加だけでなく過去の足の修正・株式分割の調整があった銘柄も再分析させる。
+    """
+
+    def __init__(self, cache_dir: str = REPORT_CACHE_DIR):
+        self.cache_dir = cache_dir
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def price_key(price_history: pd.DataFrame, key_rows: Optional[int] = None) -> str:
+        """株価データからキャッシュキーを計算
+        
+        分析キャッシュ（DB）と同じcompute_data_fingerprintを使い、2つのキャッシュの判定を一致させる。
+        
+        Args:
+            key_rows: 指定した場合は末尾key_rows件（最新の足から遡った件数）だけからキーを計算する
+        """
+        if key_rows is not None:
+            price_history = price_history.iloc[-key_rows:]
+        return compute_data_fingerprint(price_history)
+
+    def _cache_path(self, stock_code: str, kind: str, ext: str = 'json') -> str:
+        return os.path.join(self.cache_dir, f"{stock_code}_{kind}.{ext}")
+
+    def load(self, stock_code: str, kind: str, price_history: pd.DataFrame,
+             key_rows: Optional[int] = None) -> Optional[Dict]:
+        """キャッシュ済みの分析結果を取得（未保存・株価更新済みの場合はNone）
+        
+        Args:
+            key_rows: 保存時と同じくキーの計算に使う末尾の件数（price_keyを参照）
+        """
+        try:
+            with open(self._cache_path(stock_code, kind), 'rb') as f:
+                entry = loads_json(f.read())
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"銘柄 {stock_code} の分析キャッシュ読み込み中にエラー: {e}")
+            return None
+
+        try:
+            if entry.get('price_key') != self.price_key(price_history, key_rows):
+                return None
+        except Exception as e:
+            logger.warning(f"銘柄 {stock_code} のキャッシュキー計算中にエラー: {e}")
+            return None
+        return entry.get('data')
+
+    def save(self, stock_code: str, kind: str, price_history: pd.DataFrame, data: Dict,
+             key_rows: Optional[int] = None) -> bool:
+        """分析結果を保存（一時ファイルからの置き換えで読み込み中の破損を防ぐ）"""
+        try:
+            payload = dumps_json({'price_key': self.price_key(price_history, key_rows), 'data': data})
+        except Exception as e:
+            logger.warning(f"銘柄 {stock_code} の分析キャッシュ保存中にエラー: {e}")
+            return False
+        return self._write_entry(stock_code, self._cache_path(stock_code, kind), payload)
+
+    def load_analysis(self, stock_code: str, kind: str, price_history: pd.DataFrame,
+                      version: str) -> Optional[Dict]:
+        """キャッシュ済みの分析結果全体（指標値を含む）を取得
+
+        NaNやNumPy型をそのまま復元できるようpickleで保存する。
+        未保存・株価更新済み・分析ロジックのバージョン違いの場合はNone。
+        """
+        try:
+            with open(self._cache_path(stock_code, kind, 'pkl'), 'rb') as f:
+                entry = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"銘柄 {stock_code} の分析キャッシュ読み込み中にエラー: {e}")
+            return None
+
+        try:
+            if entry.get('version') != version or entry.get('price_key') != self.price_key(price_history):
+                return None
+        except Exception as e:
+            logger.warning(f"銘柄 {stock_code} のキャッシュキー計算中にエラー: {e}")
+            return None
+        return entry.get('data')
+
+    def save_analysis(self, stock_code: str, kind: str, price_history: pd.DataFrame,
+                      version: str, data: Dict) -> bool:
+        """分析結果全体を保存（load_analysisで読み込む）"""
+        try:
+            entry = {'price_key': self.price_key(price_history), 'version': version, 'data': data}
+            payload = pickle.dumps(entry, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception as e:
+            logger.warning(f"銘柄 {stock_code} の分析キャッシュ保存中にエラー: {e}")
+            return False
+        return self._write_entry(stock_code, self._cache_path(stock_code, kind, 'pkl'), payload)
+
+    def _write_entry(self, stock_code: str, path: str, payload: bytes) -> bool:
+        """キャッシュファイルを一時ファイル経由で置き換え"""
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(payload)
+            os.replace(tmp_path, path)
+            return True
+        except Exception as e:
+            logger.warning(f"銘柄 {stock_code} の分析キャッシュ保存中にエラー: {e}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return False
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+HTMLテンプレート環境モジュール
+各レポート生成器で共通のJinja2環境を作成（コンパイル済みテンプレートをディスクにキャッシュ）
+"""
+
+import logging
+import os
+
+import jinja2
+
+logger = logging.getLogger(__name__)
+
+# テンプレートの配置先（このモジュールと同じディレクトリ）
+TEMPLATE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# コンパイル済みテンプレートのキャッシュ先（実行ごとのパース・コンパイルを省略）
+JINJA_CACHE_DIR = '.jinja_cache'
+
+def create_template_env(cache_dir: str = JINJA_CACHE_DIR) -> jinja2.Environment:
+    """レポート用のJinja2環境を作成
+
+    Args:
+        cache_dir: バイトコードキャッシュの保存先（作成できない場合はキャッシュなし）
+    """
+    bytecode_cache = None
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        bytecode_cache = jinja2.FileSystemBytecodeCache(cache_dir)
+    except OSError as e:
+        logger.warning(f"テンプレートキャッシュを作成できないため無効化します: {e}")
+
+    # テンプレートは実行中に変更しないため、get_templateごとの更新確認（stat）を行わない
+    return jinja2.Environment(
+        loader=jinja2.FileSystemLoader(TEMPLATE_DIR),
+        autoescape=True,
+        bytecode_cache=bytecode_cache,
+        auto_reload=False,
+        cache_size=-1,
+        optimized=True
+    )
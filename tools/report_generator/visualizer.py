@@ -5,28 +5,77 @@
 """
 
 import logging
-import matplotlib.pyplot as plt
+import matplotlib
+
+# GUIを使わないAggバックエンドで描画（pyplotより先に設定し、spawnしたワーカーでもimport時に適用）
+matplotlib.use('Agg')
+
+from matplotlib.figure import Figure
 import matplotlib.dates as mdates
 import pandas as pd
 import numpy as np
 import os
 from datetime import datetime, timedelta
-from typing import Dict, Optional, List
+from typing import Dict, Optional, List, Tuple
 import io
 import base64
 
+from .indicator_kernels import BB_SIGMA, macd, rolling_mean, rolling_mean_std, stochastic, wilder_rsi
+
 # 日本語フォント設定
-plt.rcParams['font.family'] = ['MS Gothic', 'DejaVu Sans']
-plt.rcParams['axes.unicode_minus'] = False
+matplotlib.rcParams['font.family'] = ['MS Gothic', 'DejaVu Sans']
+matplotlib.rcParams['axes.unicode_minus'] = False
+
+# 長い系列の線は10000頂点ごとに分割して描画し、表示上区別できない頂点は間引く
+matplotlib.rcParams['agg.path.chunksize'] = 10000
+matplotlib.rcParams['path.simplify'] = True
 
 logger = logging.getLogger(__name__)
 
+# チャート用に株価・指標の系列を保持する精度（描画には単精度で十分なため、集計のメモリ帯域を半分にする）
+# 分析結果の指標値はanalyzerで倍精度のまま計算する
+CHART_DTYPE = np.float32
+
 class StockVisualizer:
-    """株式可視化クラス"""
+    """株式可視化クラス
     
-    def __init__(self, output_dir: str = "reports/images"):
+    pyplotのグローバル状態を使わずFigureを直接生成するため、
+    インスタンスが異なれば複数スレッドから同時にチャートを作成できる。
+    Figureはチャート種別ごとに1つ作成して銘柄間で再利用するため、
+    1つのインスタンスを複数スレッドで共有しないこと。
+    """
+    
+    def __init__(self, output_dir: str = "reports/images", base_dir: Optional[str] = None):
+        """
+        Args:
+            output_dir: チャート画像の出力先
+            base_dir: generate_all_chartsが返す相対パスの基準（Noneの場合はoutput_dirの親ディレクトリ）
+        """
         self.output_dir = output_dir
+        self.base_dir = base_dir if base_dir is not None else os.path.dirname(os.path.normpath(output_dir))
         os.makedirs(self.output_dir, exist_ok=True)
+        # チャートのパス変換用に、base_dirからoutput_dirへの相対パスを一度だけ計算
+        relative_dir = os.path.relpath(output_dir, self.base_dir).replace(os.sep, '/')
+        self._relative_prefix = '' if relative_dir == '.' else f"{relative_dir}/"
+        # チャート種別 → (Figure, Axesの配列)
+        self._figures: Dict[str, Tuple[Figure, np.ndarray]] = {}
+    
+    def _reuse_figure(self, name: str, figsize: Tuple[float, float], nrows: int = 1, ncols: int = 1,
+                      **subplots_kwargs) -> Tuple[Figure, np.ndarray]:
+        """チャート種別ごとのFigureを取得（2回目以降は各Axesをクリアして再利用）"""
+        entry = self._figures.get(name)
+        if entry is None:
+            fig = Figure(figsize=figsize)
+            axes = fig.subplots(nrows, ncols, squeeze=False, **subplots_kwargs).ravel()
+            entry = self._figures[name] = (fig, axes)
+        else:
+            fig, axes = entry
+            for ax in axes:
+                ax.cla()
+            # 前の銘柄のtight_layoutによる余白調整を既定値に戻す
+            fig.subplots_adjust(**{k: matplotlib.rcParams[f'figure.subplot.{k}']
+                                   for k in ('left', 'bottom', 'right', 'top', 'wspace', 'hspace')})
+        return entry
     
     def create_price_chart(self, stock_data: Dict, analysis_result: Dict) -> Optional[str]:
         """価格チャートを作成"""
@@ -40,16 +89,15 @@ class StockVisualizer:
             stock_name = basic_info.get('stock_name', stock_code) if basic_info else stock_code
             
             # チャート作成
-            fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(12, 10), 
-                                          gridspec_kw={'height_ratios': [3, 1]})
+            fig, (ax1, ax2) = self._reuse_figure('price', (12, 10), 2, 1, gridspec_kw={'height_ratios': [3, 1]})
             
             # 価格チャート
             dates = price_history['price_date']
-            close_prices = price_history['close_price']
+            close_prices = price_history['close_price'].astype(CHART_DTYPE)
             
             # 移動平均を計算
-            sma_20 = close_prices.rolling(window=20).mean()
-            sma_50 = close_prices.rolling(window=50).mean()
+            sma_20 = rolling_mean(close_prices, 20)
+            sma_50 = rolling_mean(close_prices, 50)
             
             # 価格と移動平均をプロット
             ax1.plot(dates, close_prices, label='終値', color='black', linewidth=1)
@@ -86,12 +134,11 @@ class StockVisualizer:
             ax2.xaxis.set_major_formatter(mdates.DateFormatter('%m/%d'))
             ax2.xaxis.set_major_locator(mdates.MonthLocator())
             
-            plt.tight_layout()
+            fig.tight_layout()
             
             # 画像を保存
             filename = f"{self.output_dir}/{stock_code}_price_chart.png"
-            plt.savefig(filename, dpi=150, bbox_inches='tight', facecolor='white')
-            plt.close()
+            fig.savefig(filename, dpi=150, bbox_inches='tight', facecolor='white')
             
             logger.info(f"価格チャートを保存: {filename}")
             return filename
@@ -112,12 +159,12 @@ class StockVisualizer:
             stock_name = basic_info.get('stock_name', stock_code) if basic_info else stock_code
             
             # 4つのサブプロットを作成
-            fig, ((ax1, ax2), (ax3, ax4)) = plt.subplots(2, 2, figsize=(15, 10))
+            fig, (ax1, ax2, ax3, ax4) = self._reuse_figure('technical', (15, 10), 2, 2)
             
             dates = price_history['price_date']
-            close_prices = price_history['close_price']
-            high_prices = price_history['high_price']
-            low_prices = price_history['low_price']
+            close_prices, high_prices, low_prices = (
+                price_history[column].astype(CHART_DTYPE) for column in ('close_price', 'high_price', 'low_price')
+            )
             volumes = price_history['volume']
             
             # 1. RSIチャート
@@ -172,13 +219,12 @@ class StockVisualizer:
                 ax.xaxis.set_major_formatter(mdates.DateFormatter('%m/%d'))
                 ax.xaxis.set_major_locator(mdates.MonthLocator())
             
-            plt.suptitle(f'{stock_name} ({stock_code}) - テクニカル指標', fontsize=16, fontweight='bold')
-            plt.tight_layout()
+            fig.suptitle(f'{stock_name} ({stock_code}) - テクニカル指標', fontsize=16, fontweight='bold')
+            fig.tight_layout()
             
             # 画像を保存
             filename = f"{self.output_dir}/{stock_code}_technical_chart.png"
-            plt.savefig(filename, dpi=150, bbox_inches='tight', facecolor='white')
-            plt.close()
+            fig.savefig(filename, dpi=150, bbox_inches='tight', facecolor='white')
             
             logger.info(f"テクニカルチャートを保存: {filename}")
             return filename
@@ -188,39 +234,25 @@ class StockVisualizer:
             return None
     
     def _calculate_rsi(self, prices: pd.Series, period: int = 14) -> pd.Series:
-        """RSIを計算"""
-        delta = prices.diff()
-        gain = (delta.where(delta > 0, 0)).rolling(window=period).mean()
-        loss = (-delta.where(delta < 0, 0)).rolling(window=period).mean()
-        rs = gain / loss
-        rsi = 100 - (100 / (1 + rs))
-        return rsi
+        """RSIを計算（Wilderの平滑化）"""
+        return wilder_rsi(prices, period)
     
     def _calculate_macd(self, prices: pd.Series) -> tuple:
         """MACDを計算"""
-        ema_12 = prices.ewm(span=12).mean()
-        ema_26 = prices.ewm(span=26).mean()
-        macd_line = ema_12 - ema_26
-        macd_signal = macd_line.ewm(span=9).mean()
-        macd_histogram = macd_line - macd_signal
-        return macd_line, macd_signal, macd_histogram
+        return macd(prices, 12, 26, 9)
     
     def _calculate_bollinger_bands(self, prices: pd.Series, period: int = 20) -> tuple:
         """ボリンジャーバンドを計算"""
-        sma = prices.rolling(window=period).mean()
-        std = prices.rolling(window=period).std()
-        bb_upper = sma + (std * 2)
-        bb_lower = sma - (std * 2)
+        # 移動平均・標準偏差は1回の走査でまとめて計算
+        sma, std = rolling_mean_std(prices, period)
+        bb_upper = sma + (std * BB_SIGMA)
+        bb_lower = sma - (std * BB_SIGMA)
         return bb_upper, sma, bb_lower
     
     def _calculate_stochastic(self, high: pd.Series, low: pd.Series, close: pd.Series, 
                             k_period: int = 14, d_period: int = 3) -> tuple:
         """ストキャスティクスを計算"""
-        lowest_low = low.rolling(window=k_period).min()
-        highest_high = high.rolling(window=k_period).max()
-        stoch_k = 100 * ((close - lowest_low) / (highest_high - lowest_low))
-        stoch_d = stoch_k.rolling(window=d_period).mean()
-        return stoch_k, stoch_d
+        return stochastic(high, low, close, k_period, d_period)
     
     def create_signal_summary_chart(self, analysis_result: Dict, stock_code: str = None) -> Optional[str]:
         """シグナルサマリーチャートを作成"""
@@ -272,7 +304,7 @@ class StockVisualizer:
                 signal_counts = {'買い': 0, '売り': 0, '中立': 0}
             
             # 円グラフを作成
-            fig, ax = plt.subplots(figsize=(8, 6))
+            fig, (ax,) = self._reuse_figure('signal_summary', (8, 6))
             
             colors = ['green', 'red', 'gray']
             explode = (0.1, 0.1, 0)  # 買いと売りを強調
@@ -293,16 +325,17 @@ class StockVisualizer:
             
             ax.set_title(f'{stock_code} - トレードシグナル分布', fontsize=14, fontweight='bold')
             
-            # 総合評価を追加
+            # 総合評価を追加（前の銘柄の表示は削除）
+            for text in list(fig.texts):
+                text.remove()
             overall_signal = signals.get('overall_signal', '不明')
-            plt.figtext(0.5, 0.01, f'総合評価: {overall_signal}', 
+            fig.text(0.5, 0.01, f'総合評価: {overall_signal}', 
                        ha='center', fontsize=12, fontweight='bold',
                        bbox=dict(boxstyle='round,pad=0.3', facecolor='lightblue', alpha=0.7))
             
             # 画像を保存
             filename = f"{self.output_dir}/{stock_code}_signal_summary.png"
-            plt.savefig(filename, dpi=150, bbox_inches='tight', facecolor='white')
-            plt.close()
+            fig.savefig(filename, dpi=150, bbox_inches='tight', facecolor='white')
             
             logger.info(f"シグナルサマリーチャートを保存: {filename}")
             return filename
@@ -312,7 +345,11 @@ class StockVisualizer:
             return None
     
     def generate_all_charts(self, stock_data: Dict, analysis_result: Dict) -> Dict:
-        """すべてのチャートを生成"""
+        """すべてのチャートを生成
+        
+        Returns:
+            チャート名 → base_dirからの相対パス（HTMLからそのまま参照できる'/'区切り）
+        """
         try:
             stock_code = stock_data['stock_code']
             
@@ -322,8 +359,11 @@ class StockVisualizer:
                 'signal_summary': self.create_signal_summary_chart(analysis_result, stock_code)
             }
             
-            # None値を除去
-            charts = {k: v for k, v in charts.items() if v is not None}
+            # None値を除去し、レポートから参照する相対パスに変換
+            charts = {
+                k: f"{self._relative_prefix}{os.path.basename(v)}"
+                for k, v in charts.items() if v is not None
+            }
             
             logger.info(f"銘柄 {stock_code} のチャート生成完了: {len(charts)}個")
             return charts
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+銘柄チャンクの並列処理モジュール
+銘柄をチャンクに分け、spawnで起動したワーカープロセスで生成器のメソッドを実行する
+（短期・長期レポート生成と一覧ページ生成で共有）
+"""
+
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from .data_fetcher import prefetch_chunks
+from .file_writer import ReportFileWriter
+from .indicator_kernels import compile_kernels
+from .logging_setup import init_worker_logging, start_worker_log_listener
+
+logger = logging.getLogger(__name__)
+
+# 一括取得・ワーカーへの割り当てを行う銘柄数
+STOCK_CHUNK_SIZE = 50
+
+# ワーカープロセス内で使い回す生成器（_init_workerで初期化）
+_worker_instance: Any = None
+
+def _init_worker(factory: Callable[..., Any], factory_kwargs: Dict, log_queue):
+    """ワーカープロセスの初期化（DB接続・分析器・描画器はプロセスごとに作成）
+
+    ログは親プロセスへ転送する。matplotlibのバックエンド・描画設定はvisualizerのimport時に適用される。
+    """
+    global _worker_instance
+    init_worker_logging(log_queue)
+    _worker_instance = factory(**factory_kwargs)
+
+def _run_in_worker(method_name: str, stock_codes: List[str]) -> Dict:
+    """ワーカープロセスの生成器で銘柄チャンクを処理"""
+    return getattr(_worker_instance, method_name)(stock_codes)
+
+def split_chunks(stock_codes: List[str], chunk_size: int = STOCK_CHUNK_SIZE) -> List[List[str]]:
+    """銘柄コードをchunk_size件ずつのチャンクに分割"""
+    return [stock_codes[i:i + chunk_size] for i in range(0, len(stock_codes), chunk_size)]
+
+def run_chunks_in_processes(factory: Callable[..., Any], factory_kwargs: Dict, method_name: str,
+                            chunks: List[List[str]], workers: int) -> Iterator[Tuple[List[str], Dict]]:
+    """銘柄チャンクをワーカープロセスで処理し、完了した順に結果を返す
+
+    ログ出力用のスレッドが動いているため、fork時のロック競合を避けてspawnでワーカーを起動する。
+    各ワーカーはfactory(**factory_kwargs)で作成した生成器のmethod_name(銘柄チャンク)を実行する。
+
+    Args:
+        factory: ワーカーごとに1つ作成する生成器のクラス
+        factory_kwargs: 生成器の引数
+        method_name: 銘柄チャンク → 銘柄コードごとの結果を返すメソッド名
+        chunks: 銘柄コードのチャンク
+        workers: ワーカープロセス数
+
+    Yields:
+        (銘柄チャンク, 銘柄コードごとの結果)。チャンクの処理に失敗した場合は全銘柄の結果をNoneとする
+    """
+    # 各ワーカーが同じカーネルをJITコンパイルしないよう、先にコンパイルしてキャッシュを作成
+    compile_kernels()
+
+    context = multiprocessing.get_context('spawn')
+    log_listener = start_worker_log_listener(context)
+    try:
+        with ProcessPoolExecutor(max_workers=workers,
+                                 mp_context=context,
+                                 initializer=_init_worker,
+                                 initargs=(factory, factory_kwargs, log_listener.queue)) as executor:
+            futures = {executor.submit(_run_in_worker, method_name, chunk): chunk for chunk in chunks}
+            for future in as_completed(futures):
+                chunk = futures[future]
+                try:
+                    results = future.result()
+                except Exception as e:
+                    logger.error(f"ワーカープロセスでの処理中にエラー（銘柄: {chunk}）: {e}")
+                    results = dict.fromkeys(chunk)
+                yield chunk, results
+    finally:
+        log_listener.stop()
+
+def generate_reports(generator, target_stocks: List[str], worker_kwargs: Dict,
+                     fetch_bulk: Callable[[List[str]], Dict],
+                     generate_single: Callable[[str, Optional[Dict]], bool],
+                     label: str = 'レポート') -> Dict[str, bool]:
+    """銘柄をSTOCK_CHUNK_SIZE件ずつワーカープロセスに割り当ててレポートを生成し、銘柄ごとの成否を返す
+
+    ワーカーは生成器の_build_reports（銘柄チャンク → (ファイル名, HTML)）でHTMLを返すだけにし、
+    ファイルの書き出しは書き出し用スレッドでまとめて行う。
+    ワーカーが1つ以下の場合は、次のチャンクを先行取得しながらこのプロセスで逐次生成する。
+
+    Args:
+        generator: レポート生成器（max_workersでプロセス数を指定）
+        target_stocks: 対象銘柄コード
+        worker_kwargs: ワーカーで生成器を作成する際の引数
+        fetch_bulk: 逐次生成時に銘柄チャンクのデータを一括取得する関数
+        generate_single: 逐次生成時の1銘柄分のレポート生成（銘柄コード, 一括取得済みのデータ → 成否）
+        label: ログに表示するレポート名
+    """
+    chunks = split_chunks(target_stocks)
+
+    workers = min(generator.max_workers, len(chunks))
+    if workers <= 1:
+        results = {}
+        # 次のチャンクのデータ取得を現在のチャンクのレポート作成と並行して行う
+        for chunk, bulk_data in prefetch_chunks(fetch_bulk, chunks):
+            for code in chunk:
+                results[code] = generate_single(code, bulk_data.get(code))
+        return results
+
+    results = {}
+    write_futures = {}
+    with ReportFileWriter() as writer:
+        for _, reports in run_chunks_in_processes(type(generator), worker_kwargs, '_build_reports', chunks, workers):
+            for stock_code, report in reports.items():
+                if report is None:
+                    results[stock_code] = False
+                else:
+                    write_futures[stock_code] = (report[0], writer.submit(*report))
+
+    for stock_code, (report_filename, write_future) in write_futures.items():
+        try:
+            write_future.result()
+            logger.info(f"銘柄 {stock_code} の{label}を保存: {report_filename}")
+            results[stock_code] = True
+        except Exception as e:
+            logger.error(f"銘柄 {stock_code} の{label}保存中にエラー: {e}")
+            results[stock_code] = False
+    return results